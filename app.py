@@ -125,6 +125,84 @@ def suggest_codes(query: str, top_k: int = 5, use_reranking: bool = True):
         return None
 
 
+def suggest_codes_stream(query: str, top_k: int = 5, use_reranking: bool = True):
+    """Yield (event, data) pairs from the server-sent events endpoint."""
+    try:
+        headers = {
+            "Authorization": f"Bearer {st.session_state.token}",
+            "Content-Type": "application/json"
+        }
+        
+        with requests.post(
+            f"{API_URL}/suggest-codes/stream",
+            json={
+                "query": query,
+                "top_k": top_k,
+                "use_reranking": use_reranking
+            },
+            headers=headers,
+            stream=True,
+            timeout=30
+        ) as response:
+            
+            if response.status_code == 401:
+                st.error("🔒 Session expirée. Veuillez vous reconnecter.")
+                logout()
+                return
+            
+            response.raise_for_status()
+            
+            event = None
+            for line in response.iter_lines(decode_unicode=True):
+                if line.startswith("event: "):
+                    event = line[len("event: "):]
+                elif line.startswith("data: ") and event:
+                    yield event, json.loads(line[len("data: "):])
+    
+    except requests.exceptions.RequestException as e:
+        st.error(f"Erreur API: {str(e)}")
+
+
+def render_streamed_suggestions(query: str, top_k: int, use_reranking: bool):
+    """Show candidates, re-ranked order and each suggestion as the API sends them."""
+    status = st.empty()
+    candidates_area = st.empty()
+    suggestions_area = st.container()
+    
+    status.info("🔎 Recherche des candidats...")
+    result = None
+    count = 0
+    
+    for event, data in suggest_codes_stream(query, top_k, use_reranking):
+        if event == 'candidates':
+            codes = ", ".join(f"`{c['code']}`" for c in data)
+            candidates_area.markdown(f"**Candidats (recherche hybride):** {codes}")
+            status.info("🤖 Re-ranking en cours..." if use_reranking else "🤖 Rédaction des explications...")
+        
+        elif event == 'reranked':
+            codes = ", ".join(f"`{c['code']}`" for c in data)
+            candidates_area.markdown(f"**Ordre après re-ranking:** {codes}")
+            status.info("🤖 Rédaction des explications...")
+        
+        elif event == 'suggestion':
+            count += 1
+            with suggestions_area:
+                display_suggestion(data, count)
+        
+        elif event == 'done':
+            result = data
+        
+        elif event == 'error':
+            st.error(f"Erreur API: {data.get('detail')}")
+    
+    if result:
+        status.success(f"✅ {len(result['suggestions'])} suggestions trouvées")
+    else:
+        status.empty()
+    
+    return result
+
+
 def lookup_code(code: str):
     try:
         headers = {
@@ -276,6 +354,7 @@ def main_app():
         st.subheader("Paramètres de recherche")
         top_k = st.slider("Nombre de suggestions", 1, 10, 5)
         use_reranking = st.checkbox("Utiliser le re-ranking LLM", value=True, help="Plus précis mais plus lent")
+        progressive = st.checkbox("Affichage progressif", value=True, help="Afficher les résultats au fur et à mesure")
         
         st.markdown("---")
         
@@ -324,24 +403,30 @@ def main_app():
                 st.rerun()
         
         if search_button and query.strip():
-            with st.spinner("🤖 Analyse en cours..."):
-                start_time = time.time()
-                result = suggest_codes(query, top_k, use_reranking)
-                elapsed_time = time.time() - start_time
+            start_time = time.time()
+            
+            if progressive:
+                result = render_streamed_suggestions(query, top_k, use_reranking)
+            else:
+                with st.spinner("🤖 Analyse en cours..."):
+                    result = suggest_codes(query, top_k, use_reranking)
                 
                 if result:
-                    st.session_state.total_queries += 1
-                    st.session_state.query_history.append({
-                        'query': query,
-                        'time': elapsed_time,
-                        'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                        'suggestions': len(result['suggestions'])
-                    })
-                    
                     st.success(f"✅ {len(result['suggestions'])} suggestions trouvées")
                     
                     for i, suggestion in enumerate(result['suggestions'], 1):
                         display_suggestion(suggestion, i)
+            
+            elapsed_time = time.time() - start_time
+            
+            if result:
+                st.session_state.total_queries += 1
+                st.session_state.query_history.append({
+                    'query': query,
+                    'time': elapsed_time,
+                    'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                    'suggestions': len(result['suggestions'])
+                })
         
         elif search_button:
             st.warning("⚠️ Veuillez entrer une requête")
@@ -0,0 +1,122 @@
+"""
+Two-pass (rerank, then explain) versus single-pass (rank and explain in
+one call) LLM modes: latency, token cost and agreement.
+
+    python scripts/benchmark_llm_modes.py --repeat 3
+
+Every query runs through the full pipeline in both modes, alternating
+which mode goes first, with the result and semantic caches off. Cost uses
+the per-million-token prices given on the command line (defaults:
+gpt-4o-mini) and ignores prompt-cache discounts; the cached column shows
+how many prompt tokens the provider served from its cache. Agreement
+compares the suggested codes of the two modes for the same query.
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.infrastructure.vector_store_factory import create_vector_store
+from src.infrastructure.embeddings import EmbeddingGenerator
+from src.infrastructure.llm_client import LLMClient
+from src.application.rag_pipeline import RAGPipeline
+from src.config import settings
+
+
+QUERIES = [
+    "Dyspnée à l'effort et à la parole",
+    "Toux purulente",
+    "Fièvre",
+    "Pneumopathie à Haemophilus influenzae",
+    "Insuffisance respiratoire aiguë hypoxémique",
+    "Sepsis à staphylocoques",
+    "Infection urinaire compliquée",
+    "Fracture du col du fémur",
+]
+
+MODES = RAGPipeline.LLM_MODES
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Two-pass vs single-pass LLM mode benchmark")
+    parser.add_argument("--repeat", type=int, default=1, help="Runs of the query set per mode")
+    parser.add_argument("--input-price", type=float, default=0.15, help="USD per 1M prompt tokens")
+    parser.add_argument("--output-price", type=float, default=0.60, help="USD per 1M completion tokens")
+    return parser.parse_args()
+
+
+def run(pipeline: RAGPipeline, query: str, mode: str) -> dict:
+    result = pipeline.suggest_codes(query, use_reranking=True, llm_mode=mode)
+    usage = result.retrieval_metadata.get('llm_usage') or {}
+    return {
+        'latency_ms': result.processing_time_ms,
+        'calls': usage.get('calls', 0),
+        'prompt_tokens': usage.get('prompt_tokens', 0),
+        'completion_tokens': usage.get('completion_tokens', 0),
+        'cached_prompt_tokens': usage.get('cached_prompt_tokens', 0),
+        'codes': [s.code for s in result.suggestions]
+    }
+
+
+def agreement(runs_a, runs_b):
+    top1, overlap = [], []
+    for a, b in zip(runs_a, runs_b):
+        if not a['codes'] or not b['codes']:
+            continue
+        top1.append(a['codes'][0] == b['codes'][0])
+        k = max(len(a['codes']), len(b['codes']))
+        overlap.append(len(set(a['codes']) & set(b['codes'])) / k)
+    return (np.mean(top1) if top1 else float("nan")), (np.mean(overlap) if overlap else float("nan"))
+
+
+def main():
+    args = parse_args()
+
+    vector_store = create_vector_store()
+    pipeline = RAGPipeline(vector_store, EmbeddingGenerator(), LLMClient())
+    # Every call must reach the LLM
+    pipeline.result_cache = None
+    pipeline.semantic_cache = None
+
+    runs = {mode: [] for mode in MODES}
+    for r in range(args.repeat):
+        for i, query in enumerate(QUERIES):
+            order = MODES if (i + r) % 2 == 0 else MODES[::-1]
+            for mode in order:
+                runs[mode].append(run(pipeline, query, mode))
+
+    print("\n" + "=" * 80)
+    print("LLM MODES: TWO-PASS VS SINGLE-PASS")
+    print("=" * 80)
+    print(f"{len(QUERIES)} queries x {args.repeat}, model {settings.openai_model}, "
+          f"top_k_retrieval {settings.top_k_retrieval}, top_k_rerank {settings.top_k_rerank}\n")
+    print(f"{'mode':<12} {'p50 ms':>9} {'p95 ms':>9} {'calls':>6} {'prompt':>8} {'cached':>8} {'compl.':>8} {'$/1k q':>8}")
+
+    for mode in MODES:
+        latencies = np.array([x['latency_ms'] for x in runs[mode]])
+        prompt = np.mean([x['prompt_tokens'] for x in runs[mode]])
+        cached = np.mean([x['cached_prompt_tokens'] for x in runs[mode]])
+        completion = np.mean([x['completion_tokens'] for x in runs[mode]])
+        calls = np.mean([x['calls'] for x in runs[mode]])
+        cost = (prompt * args.input_price + completion * args.output_price) / 1e6 * 1000
+        print(
+            f"{mode:<12}"
+            f"{np.percentile(latencies, 50):>10.0f}"
+            f"{np.percentile(latencies, 95):>10.0f}"
+            f"{calls:>7.1f}"
+            f"{prompt:>9.0f}"
+            f"{cached:>9.0f}"
+            f"{completion:>9.0f}"
+            f"{cost:>9.3f}"
+        )
+
+    top1, overlap = agreement(runs['two_pass'], runs['single_pass'])
+    print(f"\nAgreement: top-1 {top1:.0%}, code overlap {overlap:.0%}")
+
+
+if __name__ == "__main__":
+    main()
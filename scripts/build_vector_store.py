@@ -1,20 +1,107 @@
 """
 Build the vector store from CoCoA PDF.
 To RUN ONCE to create the database.
+
+With --incremental, chunks are matched to the stored ones by content
+key: only new or changed chunks are embedded and upserted, chunks that
+only moved get their page number updated, and chunks no longer in the
+PDF are deleted.
 """
 
+import argparse
+import asyncio
 import sys
+from datetime import datetime, timezone
 from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from src.infrastructure.pdf_processor import process_cocoa_pdf
 from src.infrastructure.embeddings import EmbeddingGenerator
-from src.infrastructure.vector_store import VectorStore
+from src.infrastructure.vector_store import diff_chunks, unique_chunk_ids
+from src.infrastructure.lexical_index import LexicalIndex, lexical_index_path
+from src.infrastructure.vector_store_factory import create_vector_store
+from src.infrastructure.result_cache import ResultCache
 from src.config import settings
 
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Build the CoCoA vector store")
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=settings.embedding_max_concurrency,
+        help="Number of embedding requests in flight"
+    )
+    parser.add_argument(
+        "--sequential",
+        action="store_true",
+        help="Send one embedding request at a time (no asyncio)"
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Embed and upsert only new or changed chunks, delete removed ones"
+    )
+    return parser.parse_args()
+
+
+def embed_texts(embedding_gen: EmbeddingGenerator, texts, args):
+    if args.sequential:
+        return embedding_gen.generate_embeddings_batch(texts)
+    return asyncio.run(
+        embedding_gen.generate_embeddings_batch_async(
+            texts,
+            max_concurrency=args.concurrency
+        )
+    )
+
+
+def save_lexical_index(vector_store):
+    """Build BM25 once here so API workers only load it."""
+    all_docs = vector_store.get_all()
+    index = LexicalIndex.build(all_docs['ids'], all_docs['documents'])
+    path = index.save(lexical_index_path(vector_store.persist_directory))
+    print(f"BM25 index saved to {path}")
+
+
+def publish_index_version(vector_store):
+    """New index version, so cached query results from the previous index are not served."""
+    version = datetime.now(timezone.utc).isoformat()
+    vector_store.set_index_version(version)
+    print(f"Index version: {version}")
+    if settings.result_cache_enabled:
+        ResultCache().clear()
+
+
+def incremental_update(vector_store, embedding_gen: EmbeddingGenerator, chunks, args):
+    # Chunk ids are positional, so match on content: a revision that only
+    # shifts pagination moves chunks instead of re-embedding them
+    moved, changed, removed = diff_chunks(vector_store.get_content_keys(), chunks)
+    
+    print(f"{len(changed)} new or changed, {len(removed)} removed, {len(moved)} moved, "
+          f"{len(chunks) - len(changed) - len(moved)} unchanged")
+    
+    if removed:
+        vector_store.delete_chunks(removed)
+    
+    if moved:
+        vector_store.update_page_numbers(moved)
+    
+    if changed:
+        print("\n Generating embeddings for new and changed chunks...")
+        embeddings = embed_texts(embedding_gen, [chunk.content for chunk in changed], args)
+        if embedding_gen.cache is not None:
+            print(f"Embedding cache: {embedding_gen.cache.stats()}")
+        
+        for chunk, embedding in zip(changed, embeddings):
+            chunk.embedding = embedding
+        vector_store.upsert_chunks(changed, embeddings)
+
+
 def main():
+    args = parse_args()
+    
     print("="*80)
     print("BUILDING VECTOR STORE FROM COCOA PDF")
     print("="*80)
@@ -24,31 +111,61 @@ def main():
     chunks = process_cocoa_pdf(settings.cocoa_pdf_path)
     print(f"Created {len(chunks)} chunks")
     
+    # Stable unique ids so rebuilds can be diffed against the stored chunks
+    for chunk, chunk_id in zip(chunks, unique_chunk_ids(chunks)):
+        chunk.chunk_id = chunk_id
+    
+    embedding_gen = EmbeddingGenerator()
+    
+    if args.incremental:
+        vector_store = create_vector_store()
+        if vector_store.count() and vector_store.get_embedding_signature() == embedding_gen.signature:
+            print(f"\n Step 2: Updating vector store incrementally ({settings.vector_store_backend})...")
+            incremental_update(vector_store, embedding_gen, chunks, args)
+            save_lexical_index(vector_store)
+            publish_index_version(vector_store)
+            
+            print("\n" + "="*80)
+            print("VECTOR STORE UPDATE COMPLETE!")
+            print("="*80)
+            print(f"\nLocation: {vector_store.persist_directory}")
+            print(f"Total documents: {vector_store.count()}")
+            return
+        print("\nStore is empty or was built with another embedding model: doing a full build")
+    
     # 2. Generate embeddings
     print("\n Step 2: Generating embeddings...")
-    embedding_gen = EmbeddingGenerator()
     
     texts = [chunk.content for chunk in chunks]
-    embeddings = embedding_gen.generate_embeddings_batch(texts, batch_size=100)
+    embeddings = embed_texts(embedding_gen, texts, args)
     print(f"Generated {len(embeddings)} embeddings")
+    if embedding_gen.cache is not None:
+        print(f"Embedding cache: {embedding_gen.cache.stats()}")
     
     # 3. Add to embeddings to chunks
     for chunk, embedding in zip(chunks, embeddings):
         chunk.embedding = embedding
     
     # 4. Store in vector database
-    print("\n Step 3: Storing in ChromaDB...")
-    vector_store = VectorStore()
+    print(f"\n Step 3: Storing in vector store ({settings.vector_store_backend})...")
+    vector_store = create_vector_store()
     
     vector_store.clear()
+    vector_store.set_embedding_signature(embedding_gen.signature)
+    print(f"Embedding backend: {embedding_gen.signature}")
     
     vector_store.add_chunks(chunks, embeddings)
     print(f"Vector store built with {vector_store.count()} documents")
     
+    # 5. Keyword index
+    print("\n Step 4: Building BM25 index...")
+    save_lexical_index(vector_store)
+    publish_index_version(vector_store)
+    
     print("\n" + "="*80)
     print("VECTOR STORE BUILD COMPLETE!")
     print("="*80)
-    print(f"\nLocation: {settings.chroma_persist_dir}")
+    print(f"\nLocation: {vector_store.persist_directory}")
     print(f"Total documents: {vector_store.count()}")
     print("\nYou can now run the API: python -m src.api.main")
 
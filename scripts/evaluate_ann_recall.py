@@ -0,0 +1,139 @@
+"""
+Recall versus latency report for the IVF index and the compressed
+first-pass modes (int8 / truncated dimensions) against exact search.
+Compressed modes also report the time of the first-pass scan alone next
+to a full float32 scan of the same rows.
+
+Queries are stored embeddings with a little gaussian noise, so no API
+calls are needed. Run after building with VECTOR_STORE_BACKEND=ivf.
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.infrastructure.mmap_vector_store import MmapVectorStore
+from src.infrastructure.ivf_vector_store import IVFVectorStore
+from src.config import settings
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="ANN and compressed search recall/latency report")
+    parser.add_argument("--store-dir", default=settings.mmap_store_dir)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--noise", type=float, default=0.05, help="Std of noise added to sampled vectors")
+    parser.add_argument("--nprobe", default="1,2,4,8,16,32,64", help="Comma-separated nprobe values")
+    parser.add_argument(
+        "--coarse",
+        default="int8:0,none:256,int8:256,none:128",
+        help="Comma-separated quantization:dimensions first-pass modes (0 = all dimensions)"
+    )
+    parser.add_argument("--min-recall", type=float, default=0.95, help="Flag modes below this recall@k")
+    return parser.parse_args()
+
+
+def sample_queries(store: MmapVectorStore, n: int, noise: float) -> np.ndarray:
+    rng = np.random.default_rng(42)
+    rows = rng.choice(store.count(), size=min(n, store.count()), replace=False)
+    queries = np.asarray(store.embeddings[np.sort(rows)], dtype=np.float32)
+    queries += rng.normal(0, noise, size=queries.shape).astype(np.float32)
+    return queries
+
+
+def timed_search(search, queries: np.ndarray, top_k: int, **params):
+    results = []
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        hits = search(query, top_k=top_k, **params)
+        latencies.append((time.perf_counter() - start) * 1000)
+        results.append([h['id'] for h in hits])
+    return results, np.array(latencies)
+
+
+def scan_ms(scan, queries: np.ndarray) -> float:
+    """Mean time of one full scan per query, in milliseconds."""
+    start = time.perf_counter()
+    for query in queries:
+        scan(query)
+    return (time.perf_counter() - start) * 1000 / len(queries)
+
+
+def recall(approx, exact) -> float:
+    return float(np.mean([len(set(a) & set(e)) / len(e) for a, e in zip(approx, exact) if e]))
+
+
+def report(name: str, results, latency, exact_results, exact_latency, min_recall: float):
+    value = recall(results, exact_results)
+    print(
+        f"{name:<14}"
+        f"{value:>10.3f}"
+        f"{latency.mean():>10.2f}"
+        f"{np.percentile(latency, 95):>10.2f}"
+        f"{exact_latency.mean() / latency.mean():>10.1f}"
+        f"{'  < min recall' if value < min_recall else ''}"
+    )
+
+
+def main():
+    args = parse_args()
+
+    print("="*80)
+    print("VECTOR SEARCH RECALL VS LATENCY")
+    print("="*80)
+
+    exact_store = MmapVectorStore(args.store_dir, quantization="none", coarse_dimensions=0)
+    ivf_store = IVFVectorStore(args.store_dir, quantization="none", coarse_dimensions=0)
+
+    if ivf_store.centroids is None:
+        print("No IVF index found, building it...")
+        ivf_store.build_index()
+
+    queries = sample_queries(exact_store, args.queries, args.noise)
+    print(f"\n{len(queries)} queries, top-{args.top_k}, {len(ivf_store.centroids)} lists, {exact_store.count()} vectors\n")
+
+    exact_results, exact_latency = timed_search(exact_store.search, queries, args.top_k)
+
+    print(f"{'mode':<14}{'recall@k':>10}{'mean ms':>10}{'p95 ms':>10}{'speedup':>10}")
+    print(f"{'exact':<14}{1.0:>10.3f}{exact_latency.mean():>10.2f}{np.percentile(exact_latency, 95):>10.2f}{1.0:>10.1f}")
+
+    # Whole query set in one search_many call, latency amortized per query
+    start = time.perf_counter()
+    batched = [[h['id'] for h in hits] for hits in exact_store.search_many(queries, top_k=args.top_k)]
+    batched_latency = np.full(len(queries), (time.perf_counter() - start) * 1000 / len(queries))
+    report("exact batched", batched, batched_latency, exact_results, exact_latency, args.min_recall)
+
+    for nprobe in [int(n) for n in args.nprobe.split(",")]:
+        results, latency = timed_search(ivf_store.search, queries, args.top_k, nprobe=nprobe)
+        report(f"nprobe={nprobe}", results, latency, exact_results, exact_latency, args.min_recall)
+
+    print(f"\nCompressed first pass, {settings.vector_rescore_candidates} candidates rescored at full precision:\n")
+    full_scan = scan_ms(lambda query: exact_store.embeddings @ query, queries)
+    scans = []
+    for mode in args.coarse.split(","):
+        quantization, dimensions = mode.split(":")
+        store = MmapVectorStore(args.store_dir, quantization=quantization, coarse_dimensions=int(dimensions))
+        if store.coarse is None:
+            continue
+        results, latency = timed_search(store.search, queries, args.top_k)
+        ratio = exact_store.embeddings.nbytes / store.coarse.nbytes
+        report(f"{mode} ({ratio:.0f}x)", results, latency, exact_results, exact_latency, args.min_recall)
+        scans.append((mode, scan_ms(lambda query: store._coarse_scores_many(query[None, :], None), queries)))
+
+    print("\nFirst-pass scan alone, per query:\n")
+    print(f"{'mode':<14}{'scan ms':>10}{'speedup':>10}")
+    print(f"{'float32 full':<14}{full_scan:>10.2f}{1.0:>10.1f}")
+    for mode, elapsed in scans:
+        print(f"{mode:<14}{elapsed:>10.2f}{full_scan / elapsed:>10.1f}")
+
+    print(f"\nDefault nprobe (ANN_NPROBE): {settings.ann_nprobe}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""
+Throughput versus concurrency for /suggest-codes on a running API.
+
+    python -m src.api.main                      # in another terminal
+    python scripts/run_load.py --concurrency 1,4,16,64 --requests 64
+
+Each level sends `--requests` queries with at most `concurrency` in flight
+and reports requests/s, latency percentiles and how many answers came
+from a cache (`retrieval_metadata['cache']`). By default every query of a
+run is a different combination of clinical descriptions, so neither the
+exact nor the semantic cache should answer it (a unique suffix alone
+leaves queries near-identical in embedding space); pass --allow-cache to
+measure cached traffic instead.
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+import httpx
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.config import settings
+
+
+QUERIES = [
+    "Sepsis à staphylocoques dorés",
+    "Dyspnée d'effort avec toux",
+    "Fièvre chez un patient immunodéprimé",
+    "Insuffisance rénale aiguë",
+    "Douleur thoracique à l'effort",
+    "Pneumopathie communautaire",
+    "Infection urinaire compliquée",
+    "Fracture du col du fémur",
+]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="/suggest-codes load test")
+    parser.add_argument("--url", default=f"http://localhost:{settings.api_port}/api/v1")
+    parser.add_argument("--username", default="admin")
+    parser.add_argument("--password", default="admin123")
+    parser.add_argument("--concurrency", default="1,2,4,8,16,32", help="Comma-separated in-flight request levels")
+    parser.add_argument("--requests", type=int, default=32, help="Requests per level")
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--no-reranking", action="store_true", help="Skip the LLM re-ranking call")
+    parser.add_argument("--allow-cache", action="store_true", help="Reuse queries so caches can answer")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    return parser.parse_args()
+
+
+async def login(client: httpx.AsyncClient, args) -> str:
+    response = await client.post(
+        f"{args.url}/auth/login",
+        json={"username": args.username, "password": args.password}
+    )
+    response.raise_for_status()
+    return response.json()["access_token"]
+
+
+def distinct_query(n: int, run_id: str) -> str:
+    """The n-th query of a run: a different pair or triple of descriptions for each n."""
+    size = len(QUERIES)
+    first, second, third = n % size, (n // size) % size, (n // size ** 2) % size
+    parts = [QUERIES[first], QUERIES[(first + 1 + second) % size].lower()]
+    if n >= size ** 2:
+        parts.append(QUERIES[(first + 2 + third) % size].lower())
+    # The run id keeps exact-cache keys of earlier runs from matching
+    return f"{' et '.join(parts)} ({run_id})"
+
+
+async def run_level(client: httpx.AsyncClient, token: str, concurrency: int, args, run_id: str, offset: int):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = 0
+    cache_hits = {}
+
+    async def one(i: int):
+        nonlocal errors
+        if args.allow_cache:
+            query = QUERIES[i % len(QUERIES)]
+        else:
+            query = distinct_query(offset + i, run_id)
+
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                response = await client.post(
+                    f"{args.url}/suggest-codes",
+                    json={"query": query, "top_k": args.top_k, "use_reranking": not args.no_reranking},
+                    headers={"Authorization": f"Bearer {token}"}
+                )
+                response.raise_for_status()
+                latencies.append(time.perf_counter() - start)
+                tier = (response.json().get("retrieval_metadata") or {}).get("cache")
+                if tier:
+                    cache_hits[tier] = cache_hits.get(tier, 0) + 1
+            except Exception as e:
+                errors += 1
+                print(f" Request failed: {type(e).__name__}: {e}")
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(args.requests)))
+    elapsed = time.perf_counter() - start
+
+    return elapsed, np.asarray(latencies) * 1000, errors, cache_hits
+
+
+async def main():
+    args = parse_args()
+    levels = [int(v) for v in args.concurrency.split(",")]
+    run_id = str(int(time.time()))
+
+    limits = httpx.Limits(max_connections=max(levels), max_keepalive_connections=max(levels))
+    async with httpx.AsyncClient(timeout=args.timeout, limits=limits) as client:
+        token = await login(client, args)
+
+        print("=" * 80)
+        print("SUGGEST-CODES THROUGHPUT VS CONCURRENCY")
+        print("=" * 80)
+        print(f"{args.requests} requests per level, reranking {'off' if args.no_reranking else 'on'}, "
+              f"{'repeated queries, caches allowed' if args.allow_cache else 'distinct queries'}\n")
+        print(f"{'concurrency':>11} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'max ms':>9} {'errors':>7} {'cached':>7}")
+
+        baseline = None
+        total_hits = {}
+        for level, concurrency in enumerate(levels):
+            # Every level gets its own queries
+            elapsed, latencies, errors, cache_hits = await run_level(
+                client, token, concurrency, args, run_id, offset=level * args.requests
+            )
+            throughput = len(latencies) / elapsed if elapsed else 0.0
+            baseline = baseline or throughput
+
+            if len(latencies):
+                p50, p95, worst = np.percentile(latencies, 50), np.percentile(latencies, 95), latencies.max()
+            else:
+                p50 = p95 = worst = float("nan")
+            speedup = f"  x{throughput / baseline:.1f}" if baseline else ""
+            cached = sum(cache_hits.values())
+            print(f"{concurrency:>11} {throughput:>8.2f} {p50:>9.0f} {p95:>9.0f} {worst:>9.0f} {errors:>7} "
+                  f"{cached:>7}{speedup}")
+            for tier, count in cache_hits.items():
+                total_hits[tier] = total_hits.get(tier, 0) + count
+
+        if total_hits and not args.allow_cache:
+            print(f"\nWarning: {sum(total_hits.values())} answers came from a cache ({total_hits}), "
+                  "the numbers above are not all uncached")
+        elif total_hits:
+            print(f"\nCache hits: {total_hits}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
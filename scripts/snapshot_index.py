@@ -0,0 +1,129 @@
+"""
+Export the vector store (with a prebuilt BM25 index) to a single snapshot
+file, verify a snapshot, or import one into a store directory.
+
+    python scripts/snapshot_index.py export data/index.snapshot
+    python scripts/snapshot_index.py verify data/index.snapshot
+    python scripts/snapshot_index.py import data/index.snapshot --backend mmap
+
+Replicas can also serve the copied file directly with
+VECTOR_STORE_SNAPSHOT=data/index.snapshot (read-only, memory-mapped).
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.infrastructure.index_snapshot import (
+    write_snapshot, verify_snapshot, read_section, map_embeddings
+)
+from src.infrastructure.lexical_index import LexicalIndex, lexical_index_path
+from src.infrastructure.mmap_vector_store import MmapVectorStore
+from src.infrastructure.vector_store_factory import create_vector_store
+from src.infrastructure.result_cache import ResultCache
+from src.config import settings
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Index snapshot export/import")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    export = sub.add_parser("export", help="Write the current store to a snapshot file")
+    export.add_argument("path")
+    export.add_argument("--backend", default=None, help="Source backend (default: VECTOR_STORE_BACKEND)")
+    export.add_argument("--no-lexical", action="store_true", help="Skip the BM25 section")
+
+    verify = sub.add_parser("verify", help="Check snapshot checksums and time a cold load")
+    verify.add_argument("path")
+
+    restore = sub.add_parser("import", help="Load a snapshot into a store (replaces its contents)")
+    restore.add_argument("path")
+    restore.add_argument("--backend", default=None, help="Target backend (default: VECTOR_STORE_BACKEND)")
+
+    return parser.parse_args()
+
+
+def export_snapshot(args):
+    store = create_vector_store(args.backend or settings.vector_store_backend)
+    data = store.get_all(include_embeddings=True)
+
+    # Snapshots are served by the mmap store, which expects unit vectors
+    embeddings = MmapVectorStore._normalize(np.asarray(data['embeddings'], dtype=np.float32))
+    columns = {}
+    for row, metadata in enumerate(data['metadatas']):
+        for key, value in (metadata or {}).items():
+            columns.setdefault(key, [None] * len(data['ids']))[row] = value
+
+    lexical = None
+    if not args.no_lexical:
+        lexical = LexicalIndex.build(data['ids'], data['documents']).to_bytes()
+
+    header = write_snapshot(
+        args.path,
+        data['ids'],
+        data['documents'],
+        columns,
+        embeddings,
+        store.get_embedding_signature(),
+        lexical=lexical
+    )
+
+    size_mb = Path(args.path).stat().st_size / 1e6
+    print(f"Snapshot written: {args.path} ({header['count']} documents, {size_mb:.1f} MB)")
+    print(f"Sections: {', '.join(header['sections'])}")
+
+
+def verify(args):
+    start = time.perf_counter()
+    header = verify_snapshot(args.path)
+    print(f"Checksums OK ({time.perf_counter() - start:.2f}s): {header['count']} documents, "
+          f"{header['dimensions']} dims, created {header['created_at']}")
+    print(f"Embedding signature: {header['embedding_signature']}")
+
+    start = time.perf_counter()
+    store = MmapVectorStore.from_snapshot(args.path)
+    print(f"Cold load: {(time.perf_counter() - start) * 1000:.0f} ms "
+          f"(lexical index: {'yes' if store.lexical_index is not None else 'no'})")
+
+
+def import_snapshot(args):
+    header = verify_snapshot(args.path)
+    store = create_vector_store(args.backend or settings.vector_store_backend)
+
+    columns = json.loads(read_section(args.path, header, "columns").decode("utf-8"))
+    metadatas = [
+        {key: values[row] for key, values in columns['metadata'].items() if values[row] is not None}
+        for row in range(len(columns['ids']))
+    ]
+
+    store.import_records(columns['ids'], columns['documents'], metadatas, map_embeddings(args.path, header))
+    store.set_embedding_signature(header['embedding_signature'])
+    store.set_index_version(header['created_at'])
+    if settings.result_cache_enabled:
+        ResultCache().clear()
+    if 'lexical' in header['sections']:
+        path = lexical_index_path(store.persist_directory)
+        LexicalIndex.from_bytes(read_section(args.path, header, "lexical")).save(path)
+        print(f"BM25 index saved to {path}")
+    print(f"Imported {store.count()} documents into {store.persist_directory}")
+
+
+def main():
+    args = parse_args()
+
+    if args.command == "export":
+        export_snapshot(args)
+    elif args.command == "verify":
+        verify(args)
+    else:
+        import_snapshot(args)
+
+
+if __name__ == "__main__":
+    main()
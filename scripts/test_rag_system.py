@@ -3,7 +3,7 @@ from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from src.infrastructure.vector_store import VectorStore
+from src.infrastructure.vector_store_factory import create_vector_store
 from src.infrastructure.embeddings import EmbeddingGenerator
 from src.infrastructure.llm_client import LLMClient
 from src.application.rag_pipeline import RAGPipeline
@@ -24,7 +24,7 @@ def main():
     print("TESTING RAG SYSTEM")
     print("="*80)
     
-    vector_store = VectorStore()
+    vector_store = create_vector_store()
     embedding_gen = EmbeddingGenerator()
     llm_client = LLMClient()
     
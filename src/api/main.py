@@ -3,6 +3,7 @@ from fastapi.middleware.cors import CORSMiddleware
 
 from .routes import router
 from .auth_routes import router as auth_router
+from ..infrastructure import openai_transport
 from ..config import settings
 
 app = FastAPI(
@@ -25,6 +26,11 @@ app.include_router(auth_router, prefix="/api/v1/auth", tags=["authentication"])
 app.include_router(router, prefix="/api/v1", tags=["codes"])
 
 
+@app.on_event("shutdown")
+async def close_openai_transport():
+    await openai_transport.aclose()
+
+
 @app.get("/")
 async def root():
     """Root endpoint."""
@@ -1,5 +1,8 @@
 from fastapi import APIRouter, HTTPException, Depends
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from typing import Dict
+import json
 
 from .schema import (
     CodeSuggestionRequest,
@@ -9,12 +12,13 @@ from .schema import (
     HealthResponse
 )
 from ..application.rag_pipeline import RAGPipeline
-from ..infrastructure.vector_store import VectorStore
+from ..domain.entities import CodeSuggestion, QueryResult
+from ..infrastructure.vector_store_factory import create_vector_store
 from ..infrastructure.embeddings import EmbeddingGenerator
 from ..infrastructure.llm_client import LLMClient
 from ..infrastructure.auth import get_current_user
 
-vector_store = VectorStore()
+vector_store = create_vector_store()
 embedding_generator = EmbeddingGenerator()
 llm_client = LLMClient()
 
@@ -30,37 +34,86 @@ async def suggest_codes(
 ):
 
     try:
-        result = rag_pipeline.suggest_codes(
+        # Awaited on the event loop: LLM/embedding I/O is async, CPU work goes to the retrieval pool
+        result = await rag_pipeline.suggest_codes_async(
             query=request.query,
             top_k=request.top_k,
-            use_reranking=request.use_reranking
+            use_reranking=request.use_reranking,
+            nprobe=request.nprobe,
+            explain=request.explain
         )
         
-        return QueryResponse(
-            query=result.query,
-            suggestions=[
-                {
-                    'code': s.code,
-                    'label': s.label,
-                    'relevance_score': s.relevance_score,
-                    'explanation': s.explanation,
-                    'cocoa_rules': s.cocoa_rules,
-                    'exclusions': s.exclusions,
-                    'inclusions': s.inclusions,
-                    'coding_instructions': s.coding_instructions,
-                    'chapter': s.chapter,
-                    'priority': s.priority
-                }
-                for s in result.suggestions
-            ],
-            processing_time_ms=result.processing_time_ms,
-            retrieval_metadata=result.retrieval_metadata
-        )
+        return QueryResponse(**query_payload(result))
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def suggestion_payload(s: CodeSuggestion) -> Dict:
+    return {
+        'code': s.code,
+        'label': s.label,
+        'relevance_score': s.relevance_score,
+        'explanation': s.explanation,
+        'cocoa_rules': s.cocoa_rules,
+        'exclusions': s.exclusions,
+        'inclusions': s.inclusions,
+        'coding_instructions': s.coding_instructions,
+        'chapter': s.chapter,
+        'priority': s.priority
+    }
+
+
+def query_payload(result: QueryResult) -> Dict:
+    return {
+        'query': result.query,
+        'suggestions': [suggestion_payload(s) for s in result.suggestions],
+        'processing_time_ms': result.processing_time_ms,
+        'retrieval_metadata': result.retrieval_metadata
+    }
+
+
+def sse_event(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@router.post("/suggest-codes/stream")
+async def suggest_codes_stream(
+    request: CodeSuggestionRequest,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Server-sent events version of /suggest-codes.
+    
+    Events, in order: `candidates` (hybrid retrieval, before any LLM call),
+    `reranked` (after LLM re-ranking), one `suggestion` per code as soon as
+    its explanation is complete, then `done` with the full response
+    (same shape as /suggest-codes). Failures are sent as an `error` event.
+    """
+    async def events():
+        try:
+            async for event, payload in rag_pipeline.suggest_codes_stream(
+                query=request.query,
+                top_k=request.top_k,
+                use_reranking=request.use_reranking,
+                nprobe=request.nprobe,
+                explain=request.explain
+            ):
+                if event == 'suggestion':
+                    payload = suggestion_payload(payload)
+                elif event == 'done':
+                    payload = query_payload(payload)
+                yield sse_event(event, payload)
+        except Exception as e:
+            yield sse_event('error', {'detail': str(e)})
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @router.post("/lookup-code", response_model=CodeLookupResponse)
 async def lookup_code(
     request: CodeLookupRequest,
@@ -77,7 +130,7 @@ async def lookup_code(
     ```
     """
     try:
-        result = rag_pipeline.lookup_code(request.code)
+        result = await run_in_threadpool(rag_pipeline.lookup_code, request.code)
         return CodeLookupResponse(**result)
     
     except Exception as e:
@@ -89,5 +142,6 @@ async def health_check():
 
     return HealthResponse(
         status="healthy",
-        vector_store_count=vector_store.count()
+        vector_store_count=vector_store.count(),
+        caches=rag_pipeline.cache_stats()
     )
\ No newline at end of file
@@ -7,6 +7,8 @@ class CodeSuggestionRequest(BaseModel):
     query: str = Field(..., description="Medical symptom or diagnosis description", min_length=3, max_length=500)
     top_k: int = Field(default=5, ge=1, le=10, description="Number of suggestions")
     use_reranking: bool = Field(default=True, description="Use LLM re-ranking")
+    nprobe: Optional[int] = Field(default=None, ge=1, le=1024, description="IVF lists probed (ivf backend only, higher = better recall)")
+    explain: bool = Field(default=False, description="LLM explanations for exact-code queries (otherwise answered from the referential only)")
 
 
 class CodeSuggestionResponse(BaseModel):
@@ -49,4 +51,5 @@ class HealthResponse(BaseModel):
 
     status: str
     vector_store_count: int
+    caches: Optional[Dict] = None
     version: str = "1.0.0"
\ No newline at end of file
@@ -1,11 +1,19 @@
 import re
 from typing import List, Dict
 
+from ..infrastructure.text_analyzer import get_analyzer
+from ..config import settings
+
 
 class QueryProcessor:
     
+    # Analyzed words that may surround codes in a code lookup ("code CIM-10 A41.0")
+    CODE_QUERY_WORDS = {'cod', 'cim', '10', 'cim10'}
+    
     def __init__(self):
         
+        self.analyzer = get_analyzer()
+        
         self.synonyms = {
             'dyspnée': ['essoufflement', 'difficulté respiratoire', 'respiration difficile'],
             'fièvre': ['hyperthermie', 'température élevée', 'pyrexie'],
@@ -24,21 +32,51 @@ class QueryProcessor:
         
         return query.strip()
     
+    def canonical_query(self, query: str) -> str:
+        # Cache key form: "Sepsis à  Staphylocoques" == "sepsis a staphylocoques"
+        return self.analyzer.fold(self.clean_query(query))
+    
     def extract_codes(self, query: str) -> List[str]:
         
         code_pattern = r'\b([A-Z]\d{2}\.?\d?)\b'
         codes = re.findall(code_pattern, query.upper())
         
-        codes = [c for c in codes if c not in ['SAI', 'NCA']]
+        codes = [self.normalize_code(c) for c in codes if c not in ['SAI', 'NCA']]
+        
+        return list(dict.fromkeys(codes))
+    
+    def normalize_code(self, code: str) -> str:
+        # "A410" -> "A41.0", as written in CoCoA
+        code = code.upper()
+        if len(code) == 4 and '.' not in code:
+            code = f"{code[:3]}.{code[3]}"
+        return code
+    
+    def is_code_query(self, query: str, codes: List[str]) -> bool:
+        """
+        True when the query is only CIM-10 codes and lookup words, e.g. "A41.0"
+        or "code CIM-10 J45 ?". "sepsis A41" carries a clinical description
+        and goes through hybrid retrieval.
+        """
+        if not codes:
+            return False
         
-        return codes
+        # Codes may be written without their dot ("A410")
+        code_terms = set(self.analyzer.analyze_query(' '.join(codes + [c.replace('.', '') for c in codes])))
+        other_terms = [
+            t for t in self.analyzer.analyze_query(query)
+            if t not in code_terms and t not in self.CODE_QUERY_WORDS
+        ]
+        return len(other_terms) <= settings.code_fast_path_max_extra_terms
     
     def expand_query(self, query: str) -> str:
 
         expanded = query
         
+        # Match on analyzed terms: "dyspnee" and "dyspnées" both hit "dyspnée"
+        query_terms = set(self.analyzer.analyze_query(query))
         for term, synonyms in self.synonyms.items():
-            if term in query.lower():
+            if set(self.analyzer.analyze_query(term)) <= query_terms:
                 expanded += ' ' + ' '.join(synonyms)
         
         return expanded
@@ -56,5 +94,7 @@ class QueryProcessor:
             'cleaned': cleaned,
             'expanded': expanded,
             'mentioned_codes': mentioned_codes,
+            'code_query': self.is_code_query(query, mentioned_codes),
+            'terms': list(self.analyzer.analyze_query(expanded)),
             'search_query': expanded 
         }
\ No newline at end of file
@@ -1,9 +1,16 @@
-from typing import List, Dict
+from typing import AsyncIterator, List, Dict, Optional, Tuple, Any
+from dataclasses import asdict
 import time
 
 from ..infrastructure.vector_store import VectorStore
 from ..infrastructure.embeddings import EmbeddingGenerator
-from ..infrastructure.llm_client import LLMClient
+from ..infrastructure.llm_client import LLMClient, record_llm_status
+from ..infrastructure.pdf_processor import split_content_fields
+from ..infrastructure.result_cache import ResultCache
+from ..infrastructure.semantic_cache import SemanticResultCache
+from ..infrastructure.single_flight import SingleFlight, AsyncSingleFlight
+from ..infrastructure.json_stream import JSONArrayStreamParser
+from ..infrastructure.prompt_builder import static_prompt
 from .retriever import HybridRetriever
 from .query_processor import QueryProcessor
 from ..domain.entities import CodeSuggestion, QueryResult
@@ -24,60 +31,638 @@ class RAGPipeline:
         
         self.retriever = HybridRetriever(vector_store, embedding_generator)
         self.query_processor = QueryProcessor()
+        self.result_cache = ResultCache() if settings.result_cache_enabled else None
+        self.semantic_cache = (
+            SemanticResultCache(embedding_generator.dimensions) if settings.semantic_cache_enabled else None
+        )
+        self.in_flight = SingleFlight()
+        self.in_flight_async = AsyncSingleFlight()
     
     def suggest_codes(
         self,
         query: str,
         top_k: int = 5,
-        use_reranking: bool = True
+        use_reranking: bool = True,
+        nprobe: Optional[int] = None,
+        explain: bool = False,
+        llm_mode: Optional[str] = None
     ) -> QueryResult:
 
         start_time = time.time()
+        llm_mode = self._llm_mode(llm_mode)
+        
+        cache_key = self._cache_key(query, top_k, use_reranking, nprobe, explain, llm_mode)
+        if self.result_cache is not None:
+            cached, tier = self.result_cache.get(cache_key)
+            if cached is not None:
+                return self._result_from_cache(query, cached, tier, start_time)
+        
+        def compute():
+            result = self._suggest_codes(query, top_k, use_reranking, nprobe, explain, llm_mode, start_time)
+            if self.result_cache is not None and self._is_cacheable(result):
+                self.result_cache.set(cache_key, asdict(result))
+            return result
+        
+        # Identical queries already running wait for that run instead of repeating it
+        result, shared = self.in_flight.do(cache_key, compute)
+        if shared:
+            return self._result_from_cache(query, asdict(result), 'in_flight', start_time)
+        
+        return result
+    
+    async def suggest_codes_async(
+        self,
+        query: str,
+        top_k: int = 5,
+        use_reranking: bool = True,
+        nprobe: Optional[int] = None,
+        explain: bool = False,
+        llm_mode: Optional[str] = None
+    ) -> QueryResult:
+        """
+        `suggest_codes` for the event loop: embedding and LLM calls are awaited
+        on the shared connection pool, while cache, store and BM25 work runs on
+        the retrieval thread pool. Identical queries in flight on the loop are
+        coalesced.
+        """
+        start_time = time.time()
+        llm_mode = self._llm_mode(llm_mode)
+        
+        cache_key = self._cache_key(query, top_k, use_reranking, nprobe, explain, llm_mode)
+        if self.result_cache is not None:
+            cached, tier = await self.retriever.run_blocking(self.result_cache.get, cache_key)
+            if cached is not None:
+                return self._result_from_cache(query, cached, tier, start_time)
+        
+        async def compute():
+            result = await self._suggest_codes_async(query, top_k, use_reranking, nprobe, explain, llm_mode, start_time)
+            if self.result_cache is not None and self._is_cacheable(result):
+                await self.retriever.run_blocking(self.result_cache.set, cache_key, asdict(result))
+            return result
+        
+        result, shared = await self.in_flight_async.do(cache_key, compute)
+        if shared:
+            return self._result_from_cache(query, asdict(result), 'in_flight', start_time)
+        
+        return result
+    
+    async def suggest_codes_stream(
+        self,
+        query: str,
+        top_k: int = 5,
+        use_reranking: bool = True,
+        nprobe: Optional[int] = None,
+        explain: bool = False,
+        llm_mode: Optional[str] = None
+    ) -> AsyncIterator[Tuple[str, Any]]:
+        """
+        Progressive `suggest_codes_async`, as (event, payload) pairs:
+          - "candidates": hybrid retrieval results, before any LLM call
+          - "reranked": candidate order after LLM re-ranking (after the
+            suggestions in single_pass mode, where one call does both)
+          - "suggestion": each CodeSuggestion as soon as its JSON object is
+            complete in the streamed LLM output
+          - "done": the final QueryResult
+        Cache hits and exact-code queries send their suggestions at once.
+        """
+        start_time = time.time()
+        llm_mode = self._llm_mode(llm_mode)
+        
+        cache_key = self._cache_key(query, top_k, use_reranking, nprobe, explain, llm_mode)
+        if self.result_cache is not None:
+            cached, tier = await self.retriever.run_blocking(self.result_cache.get, cache_key)
+            if cached is not None:
+                for event in self._replay(self._result_from_cache(query, cached, tier, start_time)):
+                    yield event
+                return
+        
+        async for event, payload in self._suggest_events(query, top_k, use_reranking, nprobe, explain, llm_mode, start_time):
+            if event == 'done' and self.result_cache is not None and self._is_cacheable(payload):
+                await self.retriever.run_blocking(self.result_cache.set, cache_key, asdict(payload))
+            yield event, payload
+    
+    LLM_MODES = ('two_pass', 'single_pass')
+    
+    def _llm_mode(self, llm_mode: Optional[str]) -> str:
+        llm_mode = llm_mode or settings.llm_mode
+        if llm_mode not in self.LLM_MODES:
+            raise ValueError(f"Unknown LLM mode {llm_mode!r}, expected one of {self.LLM_MODES}")
+        return llm_mode
+    
+    def _cache_key(
+        self,
+        query: str,
+        top_k: int,
+        use_reranking: bool,
+        nprobe: Optional[int],
+        explain: bool,
+        llm_mode: str
+    ) -> str:
+        return ResultCache.make_key(
+            self.query_processor.canonical_query(query),
+            self.vector_store.get_index_version(),
+            top_k=top_k,
+            use_reranking=use_reranking,
+            nprobe=nprobe,
+            explain=explain,
+            llm_mode=llm_mode
+        )
+    
+    @staticmethod
+    def _is_cacheable(result: QueryResult) -> bool:
+        # Degraded answers (a retrieval branch or an LLM call failed) and cache hits are not stored
+        if result.retrieval_metadata.get('cache'):
+            return False
+        if result.retrieval_metadata.get('llm_status') != 'ok':
+            return False
+        timings = result.retrieval_metadata.get('retrieval_timings') or {}
+        return all(v == 'ok' for k, v in timings.items() if k.endswith('_status'))
+    
+    def cache_stats(self) -> Dict:
+        return {
+            'result_cache': self.result_cache.stats() if self.result_cache is not None else None,
+            'semantic_cache': self.semantic_cache.stats() if self.semantic_cache is not None else None,
+            'in_flight': self.in_flight.stats(),
+            'in_flight_async': self.in_flight_async.stats()
+        }
+    
+    @staticmethod
+    def _result_from_cache(
+        query: str,
+        cached: Dict,
+        tier: str,
+        start_time: float,
+        similarity: Optional[float] = None
+    ) -> QueryResult:
+        result = QueryResult(**{
+            **cached,
+            'suggestions': [CodeSuggestion(**s) for s in cached['suggestions']]
+        })
+        result.query = query
+        result.retrieval_metadata = {
+            **result.retrieval_metadata,
+            'cache': tier,
+            'cached_query': cached['query'],
+            'cached_processing_time_ms': cached['processing_time_ms']
+        }
+        if similarity is not None:
+            result.retrieval_metadata['cache_similarity'] = round(similarity, 4)
+        result.processing_time_ms = (time.time() - start_time) * 1000
+        return result
+    
+    def _suggest_codes(
+        self,
+        query: str,
+        top_k: int,
+        use_reranking: bool,
+        nprobe: Optional[int],
+        explain: bool,
+        llm_mode: str,
+        start_time: float
+    ) -> QueryResult:
         
-
         processed_query = self.query_processor.process(query)
         search_query = processed_query['search_query']
         
+        # "A41.0": answer from the store, no embedding or LLM unless explain=True
+        if settings.code_fast_path_enabled and processed_query['code_query']:
+            result = self._suggest_exact_codes(query, processed_query['mentioned_codes'], top_k, explain, start_time)
+            if result is not None:
+                return result
+        
+        # Paraphrases of a recent query reuse its answer; the embedding is reused for retrieval
+        query_embedding, semantic_options = None, None
+        if self.semantic_cache is not None:
+            try:
+                query_embedding = self.embedding_generator.generate_embedding(search_query)
+            except Exception as e:
+                # Leave it to the semantic branch, which degrades to keyword-only results
+                print(f" Query embedding failed, skipping the semantic cache: {e}")
+        if query_embedding is not None:
+            semantic_options = self._semantic_options(processed_query, top_k, use_reranking, nprobe, explain, llm_mode)
+            cached, similarity = self.semantic_cache.get(query_embedding, semantic_options)
+            if cached is not None:
+                return self._result_from_cache(query, cached, 'semantic', start_time, similarity)
+        
+        retrieval_stats = {}
         candidates = self.retriever.retrieve_hybrid(
             search_query,
             top_k=settings.top_k_retrieval,
             semantic_weight=settings.semantic_weight,
-            keyword_weight=settings.keyword_weight
+            keyword_weight=settings.keyword_weight,
+            nprobe=nprobe,
+            stats=retrieval_stats,
+            query_embedding=query_embedding
         )
         
-        if use_reranking and len(candidates) > 0:
-            candidates = self.llm_client.rerank_candidates(
-                query,
-                candidates,
-                top_k=settings.top_k_rerank
-            )
+        llm_usage = {}
+        if use_reranking and len(candidates) > 0 and llm_mode == 'single_pass':
+            candidates, suggestions = self._rank_and_explain(query, candidates, llm_usage)
         else:
-            candidates = candidates[:top_k]
+            if use_reranking and len(candidates) > 0:
+                candidates = self.llm_client.rerank_candidates(
+                    query,
+                    candidates,
+                    top_k=settings.top_k_rerank,
+                    usage=llm_usage
+                )
+            else:
+                candidates = candidates[:top_k]
+            
+            suggestions = self._generate_suggestions(query, candidates, llm_usage)
         
-        suggestions = self._generate_suggestions(query, candidates)
+        result = self._build_result(
+            query, processed_query, candidates, suggestions, use_reranking,
+            retrieval_stats, start_time, llm_mode, llm_usage
+        )
+        
+        if semantic_options is not None and self._is_cacheable(result):
+            self.semantic_cache.set(query_embedding, semantic_options, asdict(result))
+        
+        return result
+    
+    async def _suggest_codes_async(
+        self,
+        query: str,
+        top_k: int,
+        use_reranking: bool,
+        nprobe: Optional[int],
+        explain: bool,
+        llm_mode: str,
+        start_time: float
+    ) -> QueryResult:
+        
+        async for event, payload in self._suggest_events(query, top_k, use_reranking, nprobe, explain, llm_mode, start_time):
+            if event == 'done':
+                return payload
+    
+    async def _suggest_events(
+        self,
+        query: str,
+        top_k: int,
+        use_reranking: bool,
+        nprobe: Optional[int],
+        explain: bool,
+        llm_mode: str,
+        start_time: float
+    ) -> AsyncIterator[Tuple[str, Any]]:
+        
+        processed_query = self.query_processor.process(query)
+        search_query = processed_query['search_query']
+        
+        if settings.code_fast_path_enabled and processed_query['code_query']:
+            result = await self._suggest_exact_codes_async(query, processed_query['mentioned_codes'], top_k, explain, start_time)
+            if result is not None:
+                for event in self._replay(result):
+                    yield event
+                return
+        
+        query_embedding, semantic_options = None, None
+        if self.semantic_cache is not None:
+            try:
+                query_embedding = await self.embedding_generator.generate_embedding_async(search_query)
+            except Exception as e:
+                print(f" Query embedding failed, skipping the semantic cache: {e}")
+        if query_embedding is not None:
+            semantic_options = self._semantic_options(processed_query, top_k, use_reranking, nprobe, explain, llm_mode)
+            cached, similarity = self.semantic_cache.get(query_embedding, semantic_options)
+            if cached is not None:
+                for event in self._replay(self._result_from_cache(query, cached, 'semantic', start_time, similarity)):
+                    yield event
+                return
+        
+        retrieval_stats = {}
+        candidates = await self.retriever.retrieve_hybrid_async(
+            search_query,
+            top_k=settings.top_k_retrieval,
+            semantic_weight=settings.semantic_weight,
+            keyword_weight=settings.keyword_weight,
+            nprobe=nprobe,
+            stats=retrieval_stats,
+            query_embedding=query_embedding
+        )
+        yield 'candidates', [self._candidate_summary(c) for c in candidates]
+        
+        llm_usage = {}
+        suggestions = []
+        if use_reranking and len(candidates) > 0 and llm_mode == 'single_pass':
+            selected = []
+            async for suggestion in self._stream_ranked_suggestions(query, candidates, selected, llm_usage):
+                suggestions.append(suggestion)
+                yield 'suggestion', suggestion
+            candidates = selected
+            yield 'reranked', [self._candidate_summary(c) for c in candidates]
+        else:
+            if use_reranking and len(candidates) > 0:
+                candidates = await self.llm_client.rerank_candidates_async(
+                    query,
+                    candidates,
+                    top_k=settings.top_k_rerank,
+                    usage=llm_usage
+                )
+                yield 'reranked', [self._candidate_summary(c) for c in candidates]
+            else:
+                candidates = candidates[:top_k]
+            
+            async for suggestion in self._stream_suggestions(query, candidates, llm_usage):
+                suggestions.append(suggestion)
+                yield 'suggestion', suggestion
+        
+        result = self._build_result(
+            query, processed_query, candidates, suggestions, use_reranking,
+            retrieval_stats, start_time, llm_mode, llm_usage
+        )
+        
+        if semantic_options is not None and self._is_cacheable(result):
+            self.semantic_cache.set(query_embedding, semantic_options, asdict(result))
+        
+        yield 'done', result
+    
+    @staticmethod
+    def _replay(result: QueryResult):
+        for suggestion in result.suggestions:
+            yield 'suggestion', suggestion
+        yield 'done', result
+    
+    @staticmethod
+    def _candidate_summary(candidate: Dict) -> Dict:
+        metadata = candidate.get('metadata') or {}
+        return {
+            'id': candidate['id'],
+            'code': metadata.get('primary_code'),
+            'label': metadata.get('label'),
+            'hybrid_score': candidate.get('hybrid_score'),
+            'rerank_score': candidate.get('rerank_score')
+        }
+    
+    def _semantic_options(
+        self,
+        processed_query: Dict,
+        top_k: int,
+        use_reranking: bool,
+        nprobe: Optional[int],
+        explain: bool,
+        llm_mode: str
+    ) -> tuple:
+        return (
+            self.vector_store.get_index_version(), top_k, use_reranking, nprobe, explain, llm_mode,
+            tuple(sorted(processed_query['mentioned_codes']))
+        )
+    
+    def _build_result(
+        self,
+        query: str,
+        processed_query: Dict,
+        candidates: List[Dict],
+        suggestions: List[CodeSuggestion],
+        use_reranking: bool,
+        retrieval_stats: Dict,
+        start_time: float,
+        llm_mode: str,
+        llm_usage: Dict
+    ) -> QueryResult:
         
         processing_time = (time.time() - start_time) * 1000  # ms
+        llm_status = llm_usage.pop('status', 'ok')
         
-
-        result = QueryResult(
+        return QueryResult(
             query=query,
             suggestions=suggestions,
             processing_time_ms=processing_time,
             retrieval_metadata={
                 'candidates_retrieved': len(candidates),
                 'reranking_used': use_reranking,
-                'mentioned_codes': processed_query['mentioned_codes']
+                'llm_mode': llm_mode,
+                'llm_status': llm_status,
+                'llm_usage': llm_usage,
+                'mentioned_codes': processed_query['mentioned_codes'],
+                'embedding_backend': self.retriever.index_signature.get('embedding_backend'),
+                'retrieval_timings': retrieval_stats
             }
         )
+    
+    @staticmethod
+    def _neighbour_codes(code: str) -> List[str]:
+        # Same 3-character category: A41.0 -> A41, A41.1 ... A41.9
+        category = code.split('.')[0]
+        return [category] + [f"{category}.{digit}" for digit in range(10)]
+    
+    def _suggestion_from_chunk(self, chunk: Dict, relevance_score: float, explanation: str) -> CodeSuggestion:
+        metadata = chunk.get('metadata') or {}
+        fields = split_content_fields(chunk['document'])
         
-        return result
+        def items(name):
+            return [line for line in fields.get(name, '').split('\n') if line]
+        
+        rules = []
+        if fields.get('exclusions'):
+            rules.append("À l'exclusion de: " + '; '.join(items('exclusions')))
+        if fields.get('inclusions'):
+            rules.append("Comprend: " + '; '.join(items('inclusions')))
+        
+        return CodeSuggestion(
+            code=metadata.get('primary_code', fields.get('code', 'UNKNOWN')),
+            label=metadata.get('label', fields.get('label', '')),
+            relevance_score=relevance_score,
+            explanation=explanation,
+            cocoa_rules='\n'.join(rules) or None,
+            exclusions=items('exclusions'),
+            inclusions=items('inclusions'),
+            coding_instructions=items('instructions'),
+            chapter=metadata.get('chapter') or None,
+            priority=metadata.get('priority') or None,
+            source_chunks=[chunk['id']]
+        )
+    
+    def _resolve_codes(self, codes: List[str], top_k: int) -> Optional[Dict]:
+        """Chunks of the mentioned codes, then of their category neighbours; None if no code exists."""
+        exact = {}
+        for chunk in self.vector_store.get_by_codes(codes):
+            exact.setdefault(chunk['metadata'].get('primary_code'), chunk)
+        if not exact:
+            return None
+        
+        neighbour_codes = [
+            c for code in codes for c in self._neighbour_codes(code)
+            if c not in exact
+        ]
+        neighbours = {}
+        for chunk in self.vector_store.get_by_codes(list(dict.fromkeys(neighbour_codes))):
+            neighbours.setdefault(chunk['metadata'].get('primary_code'), chunk)
+        
+        ordered_exact = [exact[c] for c in codes if c in exact]
+        ordered_neighbours = [neighbours[c] for c in neighbour_codes if c in neighbours]
+        
+        return {
+            'exact': ordered_exact,
+            'candidates': (ordered_exact + ordered_neighbours)[:max(top_k, len(ordered_exact))]
+        }
+    
+    def _templated_suggestions(self, resolved: Dict) -> List[CodeSuggestion]:
+        n_exact = len(resolved['exact'])
+        return [
+            self._suggestion_from_chunk(chunk, 1.0, "Code trouvé directement dans le référentiel CoCoA.")
+            for chunk in resolved['exact']
+        ] + [
+            self._suggestion_from_chunk(
+                chunk, 0.5,
+                f"Code voisin de la même catégorie ({chunk['metadata'].get('primary_code', '').split('.')[0]})."
+            )
+            for chunk in resolved['candidates'][n_exact:]
+        ]
+    
+    def _exact_code_result(
+        self,
+        query: str,
+        codes: List[str],
+        resolved: Dict,
+        suggestions: List[CodeSuggestion],
+        explain: bool,
+        start_time: float,
+        llm_usage: Dict
+    ) -> QueryResult:
+        
+        n_exact = len(resolved['exact'])
+        llm_status = llm_usage.pop('status', 'ok')
+        return QueryResult(
+            query=query,
+            suggestions=suggestions,
+            processing_time_ms=(time.time() - start_time) * 1000,
+            retrieval_metadata={
+                'fast_path': 'exact_code',
+                'candidates_retrieved': len(resolved['candidates']),
+                'reranking_used': False,
+                'explanation_used': explain,
+                'llm_status': llm_status,
+                'llm_usage': llm_usage,
+                'mentioned_codes': codes,
+                'resolved_codes': [c['metadata'].get('primary_code') for c in resolved['exact']],
+                'neighbour_codes': [c['metadata'].get('primary_code') for c in resolved['candidates'][n_exact:]]
+            }
+        )
+    
+    def _suggest_exact_codes(
+        self,
+        query: str,
+        codes: List[str],
+        top_k: int,
+        explain: bool,
+        start_time: float
+    ) -> Optional[QueryResult]:
+        
+        resolved = self._resolve_codes(codes, top_k)
+        if resolved is None:
+            return None
+        
+        llm_usage = {}
+        if explain:
+            suggestions = self._generate_suggestions(query, resolved['candidates'], llm_usage)
+        else:
+            suggestions = self._templated_suggestions(resolved)
+        
+        return self._exact_code_result(query, codes, resolved, suggestions, explain, start_time, llm_usage)
     
-    def _generate_suggestions(self, query: str, candidates: List[Dict]) -> List[CodeSuggestion]:
+    async def _suggest_exact_codes_async(
+        self,
+        query: str,
+        codes: List[str],
+        top_k: int,
+        explain: bool,
+        start_time: float
+    ) -> Optional[QueryResult]:
+        
+        resolved = await self.retriever.run_blocking(self._resolve_codes, codes, top_k)
+        if resolved is None:
+            return None
+        
+        llm_usage = {}
+        if explain:
+            suggestions = await self._generate_suggestions_async(query, resolved['candidates'], llm_usage)
+        else:
+            suggestions = self._templated_suggestions(resolved)
+        
+        return self._exact_code_result(query, codes, resolved, suggestions, explain, start_time, llm_usage)
+    
+    def _generate_suggestions(
+        self,
+        query: str,
+        candidates: List[Dict],
+        usage: Optional[Dict] = None
+    ) -> List[CodeSuggestion]:
 
         if not candidates:
             return []
         
-        system_prompt = """
+        system_prompt, user_message, packed = self._suggestion_prompt(query, candidates)
+        llm_response = self.llm_client.generate_json_response(
+            system_prompt,
+            user_message,
+            temperature=0.2,
+            usage=usage
+        )
+        return self._parse_suggestions(llm_response, candidates, packed)
+    
+    async def _generate_suggestions_async(
+        self,
+        query: str,
+        candidates: List[Dict],
+        usage: Optional[Dict] = None
+    ) -> List[CodeSuggestion]:
+
+        if not candidates:
+            return []
+        
+        system_prompt, user_message, packed = self._suggestion_prompt(query, candidates)
+        llm_response = await self.llm_client.generate_json_response_async(
+            system_prompt,
+            user_message,
+            temperature=0.2,
+            usage=usage
+        )
+        return self._parse_suggestions(llm_response, candidates, packed)
+    
+    async def _stream_suggestions(
+        self,
+        query: str,
+        candidates: List[Dict],
+        usage: Optional[Dict] = None
+    ) -> AsyncIterator[CodeSuggestion]:
+        """Suggestions parsed from the streamed explanation as each object completes."""
+        if not candidates:
+            return
+        
+        system_prompt, user_message, packed = self._suggestion_prompt(query, candidates)
+        parser = JSONArrayStreamParser('suggestions')
+        emitted = 0
+        failed = False
+        try:
+            async for delta in self.llm_client.stream_json_response_async(
+                system_prompt,
+                user_message,
+                temperature=0.2,
+                usage=usage
+            ):
+                for item in parser.feed(delta):
+                    if emitted < 5:
+                        emitted += 1
+                        yield self._suggestion_from_llm(item, packed)
+        except Exception as e:
+            print(f" Error streaming explanations: {e}")
+            record_llm_status(usage, 'error')
+            failed = True
+        
+        # A cut-off answer is served as far as it got, but is not complete
+        if not parser.done:
+            record_llm_status(usage, 'fallback')
+        
+        # Same fallback as the non-streamed call when nothing usable came back
+        if emitted == 0 and (failed or not parser.done):
+            for suggestion in self._fallback_suggestions(candidates):
+                yield suggestion
+    
+    def _suggestion_prompt(self, query: str, candidates: List[Dict]):
+        
+        system_prompt = static_prompt("""
             Tu es un expert en codage médical CIM-10 utilisant le référentiel CoCoA.
 
             Pour chaque code CIM-10 suggéré, tu dois:
@@ -102,62 +687,194 @@ class RAGPipeline:
                     }
                 ]
             }
-        """
 
-
-        context = "\n\n".join([
-            f"--- Code {i+1} ---\n{c['document']}"
-            for i, c in enumerate(candidates[:5])
-        ])
+            Suggère les codes candidats les plus pertinents avec explications détaillées.
+        """)
         
-        user_message = f"""Requête du médecin: "{query}"
-
-            Codes candidats du référentiel CoCoA:
-            {context}
-
-            Suggère les codes les plus pertinents avec explications détaillées.
-        """
-
+        return (system_prompt, *self._context_message(query, candidates, 5))
+    
+    def _rank_and_explain(
+        self,
+        query: str,
+        candidates: List[Dict],
+        usage: Optional[Dict] = None
+    ) -> Tuple[List[Dict], List[CodeSuggestion]]:
+        """single_pass mode: one call ranks the candidates, keeps the best and explains them."""
+        
+        system_prompt, user_message, packed = self._rank_and_explain_prompt(query, candidates)
         llm_response = self.llm_client.generate_json_response(
             system_prompt,
             user_message,
-            temperature=0.2
+            temperature=0.2,
+            usage=usage
         )
         
-        suggestions = []
+        selected, suggestions = [], []
+        if "error" not in llm_response:
+            for item in llm_response.get('suggestions', []):
+                suggestion = self._select_ranked(item, packed, selected)
+                if suggestion is not None:
+                    suggestions.append(suggestion)
+        
+        if not suggestions:
+            print(" Single-pass ranking failed, using original order")
+            record_llm_status(usage, 'fallback')
+            selected = candidates[:settings.top_k_rerank]
+            suggestions = self._fallback_suggestions(selected)
+        
+        return selected, suggestions
+    
+    async def _stream_ranked_suggestions(
+        self,
+        query: str,
+        candidates: List[Dict],
+        selected: List[Dict],
+        usage: Optional[Dict] = None
+    ) -> AsyncIterator[CodeSuggestion]:
+        """Streamed `_rank_and_explain`; the chosen candidates are appended to `selected`."""
+        
+        system_prompt, user_message, packed = self._rank_and_explain_prompt(query, candidates)
+        parser = JSONArrayStreamParser('suggestions')
+        try:
+            async for delta in self.llm_client.stream_json_response_async(
+                system_prompt,
+                user_message,
+                temperature=0.2,
+                usage=usage
+            ):
+                for item in parser.feed(delta):
+                    suggestion = self._select_ranked(item, packed, selected)
+                    if suggestion is not None:
+                        yield suggestion
+        except Exception as e:
+            print(f" Error streaming single-pass ranking: {e}")
+            record_llm_status(usage, 'error')
+        
+        if not parser.done:
+            record_llm_status(usage, 'fallback')
+        
+        if not selected:
+            print(" Single-pass ranking failed, using original order")
+            record_llm_status(usage, 'fallback')
+            selected.extend(candidates[:settings.top_k_rerank])
+            for suggestion in self._fallback_suggestions(selected):
+                yield suggestion
+    
+    def _select_ranked(self, item: Dict, candidates: List[Dict], selected: List[Dict]) -> Optional[CodeSuggestion]:
+        # Only codes sent in the prompt are kept, once each, up to top_k_rerank
+        if len(selected) >= settings.top_k_rerank:
+            return None
+        
+        taken = {c['id'] for c in selected}
+        for candidate in candidates:
+            if candidate['metadata'].get('primary_code') == item.get('code') and candidate['id'] not in taken:
+                candidate['rerank_score'] = item.get('relevance_score', 0.5)
+                selected.append(candidate)
+                return self._suggestion_from_llm(item, [candidate])
+        
+        print(f" Single-pass answer names {item.get('code')!r}, not an unused candidate, skipped")
+        return None
+    
+    def _rank_and_explain_prompt(self, query: str, candidates: List[Dict]):
+        
+        top_k = settings.top_k_rerank
+        system_prompt = static_prompt(f"""
+            Tu es un expert en codage médical CIM-10 utilisant le référentiel CoCoA.
+
+            Parmi les codes candidats, tu dois:
+            1. Évaluer la pertinence de chaque code par rapport à la requête
+               (correspondance sémantique, règles d'exclusion CoCoA, spécificité
+               du code, contexte clinique)
+            2. Garder au plus {top_k} codes, du plus pertinent au moins pertinent
+            3. Pour chaque code gardé, expliquer POURQUOI il correspond, citer les
+               règles CoCoA pertinentes et mentionner les précautions de codage
+
+            N'utilise que des codes présents dans les candidats.
+
+            Retourne un JSON avec cette structure exacte:
+            {{
+            "suggestions": [
+                    {{
+                    "code": "A41.0",
+                    "label": "Sepsis à staphylocoques dorés",
+                    "relevance_score": 0.95,
+                    "explanation": "Ce code correspond car...",
+                    "cocoa_rules": "À l'exclusion de: sepsis néonatal (P36.-)",
+                    "exclusions": ["P36.-", "O85"],
+                    "inclusions": ["septicémie à staphylocoque doré"],
+                    "coding_instructions": ["Utiliser code supplémentaire R57.2 pour choc septique"],
+                    "chapter": "I",
+                    "priority": "4"
+                    }}
+                ]
+            }}
+
+            Classe les codes candidats et explique les {top_k} plus pertinents.
+        """)
+        
+        return (system_prompt, *self._context_message(query, candidates, settings.top_k_retrieval))
+    
+    def _context_message(self, query: str, candidates: List[Dict], max_items: int) -> Tuple[str, List[Dict]]:
+        """(message, packed candidates): query and full candidate chunks, packed into the context token budget."""
+        packed, blocks = self.llm_client.prompt_builder.pack(
+            candidates,
+            settings.prompt_context_budget_tokens,
+            lambda i, c, text: f"--- Code {i+1} ---\n{text}",
+            max_items=max_items
+        )
+        message = f'Requête du médecin: "{query}"\n\nCodes candidats du référentiel CoCoA:\n' + "\n\n".join(blocks)
+        return message, packed
+    
+    def _parse_suggestions(
+        self,
+        llm_response: Dict,
+        candidates: List[Dict],
+        packed: List[Dict]
+    ) -> List[CodeSuggestion]:
         
         if "error" in llm_response:
-            for i, candidate in enumerate(candidates[:5]):
-                metadata = candidate.get('metadata', {})
-                code = metadata.get('primary_code', 'UNKNOWN')
-                label = metadata.get('label', 'Code CIM-10')
-                
-                suggestions.append(CodeSuggestion(
-                    code=code,
-                    label=label,
-                    relevance_score=candidate.get('rerank_score', candidate.get('hybrid_score', 0.5)),
-                    explanation=f"Ce code a été trouvé dans le référentiel CoCoA avec un score de similarité élevé.",
-                    cocoa_rules=None,
-                    source_chunks=[candidate['id']]
-                ))
-        else:
-            for item in llm_response.get('suggestions', [])[:5]:
-                suggestions.append(CodeSuggestion(
-                    code=item.get('code', 'Unknown'),
-                    label=item.get('label', ''),
-                    relevance_score=item.get('relevance_score', 0.5),
-                    explanation=item.get('explanation', ''),
-                    cocoa_rules=item.get('cocoa_rules'),
-                    exclusions=item.get('exclusions', []),
-                    inclusions=item.get('inclusions', []),
-                    coding_instructions=item.get('coding_instructions', []),
-                    chapter=item.get('chapter'),
-                    priority=item.get('priority'),
-                    source_chunks=[c['id'] for c in candidates[:5]]
-                ))
+            return self._fallback_suggestions(candidates)
+        
+        # Explanations can only draw on the chunks that were sent
+        return [
+            self._suggestion_from_llm(item, packed)
+            for item in llm_response.get('suggestions', [])[:5]
+        ]
+    
+    def _fallback_suggestions(self, candidates: List[Dict]) -> List[CodeSuggestion]:
+        
+        suggestions = []
+        for i, candidate in enumerate(candidates[:5]):
+            metadata = candidate.get('metadata', {})
+            code = metadata.get('primary_code', 'UNKNOWN')
+            label = metadata.get('label', 'Code CIM-10')
+            
+            suggestions.append(CodeSuggestion(
+                code=code,
+                label=label,
+                relevance_score=candidate.get('rerank_score', candidate.get('hybrid_score', 0.5)),
+                explanation=f"Ce code a été trouvé dans le référentiel CoCoA avec un score de similarité élevé.",
+                cocoa_rules=None,
+                source_chunks=[candidate['id']]
+            ))
         
         return suggestions
     
+    def _suggestion_from_llm(self, item: Dict, candidates: List[Dict]) -> CodeSuggestion:
+        return CodeSuggestion(
+            code=item.get('code', 'Unknown'),
+            label=item.get('label', ''),
+            relevance_score=item.get('relevance_score', 0.5),
+            explanation=item.get('explanation', ''),
+            cocoa_rules=item.get('cocoa_rules'),
+            exclusions=item.get('exclusions', []),
+            inclusions=item.get('inclusions', []),
+            coding_instructions=item.get('coding_instructions', []),
+            chapter=item.get('chapter'),
+            priority=item.get('priority'),
+            source_chunks=[c['id'] for c in candidates[:5]]
+        )
+    
     def lookup_code(self, code: str) -> Dict:
 
         result = self.vector_store.get_by_code(code)
@@ -1,9 +1,14 @@
-from typing import List, Dict
-from rank_bm25 import BM25Okapi
-import re
+from typing import Awaitable, Callable, List, Dict, Optional
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from functools import partial
+import asyncio
+import time
 
 from ..infrastructure.vector_store import VectorStore
+from ..infrastructure.lexical_index import LexicalIndex, lexical_index_path
+from ..infrastructure.text_analyzer import get_analyzer
 from ..infrastructure.embeddings import EmbeddingGenerator
+from ..infrastructure.single_flight import SingleFlight
 from ..config import settings
 
 
@@ -13,67 +18,270 @@ class HybridRetriever:
         self.vector_store = vector_store
         self.embedding_generator = embedding_generator
         
-        self.bm25 = None
-        self.bm25_docs = None
-        self.bm25_ids = None
-        self.bm25_metadata = None
+        self.index_signature = self._check_embedding_signature()
+        
+        self.lexical_index = self._load_lexical_index()
+        self._index_builds = SingleFlight()
+        
+        # Semantic (network-bound) and keyword (CPU-bound) branches run side by side;
+        # the async path only sends CPU and store work here
+        self.executor = ThreadPoolExecutor(
+            max_workers=settings.retrieval_max_workers,
+            thread_name_prefix="retrieval"
+        )
     
-    def _build_bm25_index(self):
-        print("Building BM25 index...")
+    def _check_embedding_signature(self) -> Dict:
+        index_signature = self.vector_store.get_embedding_signature()
+        query_signature = self.embedding_generator.signature
+        
+        if not index_signature and self.vector_store.count() == 0:
+            return dict(query_signature)
+        
+        if not index_signature:
+            # Stores built before backends were recorded were always OpenAI
+            print(" Vector store has no embedding signature, assuming it was built with OpenAI")
+            index_signature = {
+                'embedding_backend': 'openai',
+                'embedding_model': settings.openai_embedding_model,
+                'embedding_dimensions': settings.openai_embedding_dimensions
+            }
+        
+        for key in ('embedding_backend', 'embedding_model', 'embedding_dimensions'):
+            if index_signature.get(key) != query_signature.get(key):
+                raise ValueError(
+                    f"Vector store was built with {index_signature} but queries are embedded with "
+                    f"{query_signature}. Rebuild the store or change EMBEDDING_BACKEND."
+                )
         
-        all_docs = self.vector_store.collection.get(include=["documents", "metadatas"])
+        return index_signature
+    
+    def _load_lexical_index(self) -> Optional[LexicalIndex]:
+        # Snapshot-backed stores ship their index, others keep it next to their files
+        index = getattr(self.vector_store, 'lexical_index', None)
+        if index is None:
+            path = lexical_index_path(self.vector_store.persist_directory)
+            if not path.exists():
+                return None
+            try:
+                index = LexicalIndex.load(path)
+            except ValueError as e:
+                print(f" Could not load BM25 index: {e}")
+                return None
+        
+        if index.analyzer_version != get_analyzer().VERSION:
+            print(f" Stored BM25 index was built with analyzer {index.analyzer_version}, it will be rebuilt")
+            return None
         
-        self.bm25_docs = all_docs['documents']
-        self.bm25_ids = all_docs['ids']
-        self.bm25_metadata = all_docs['metadatas']
+        if index.field_weights != settings.bm25_field_weights:
+            print(" Stored BM25 index uses other field weights, it will be rebuilt")
+            return None
         
-        tokenized_docs = [self._tokenize(doc) for doc in self.bm25_docs]
+        if set(index.ids) != set(self.vector_store.get_ids()):
+            print(" Stored BM25 index does not match the vector store, it will be rebuilt")
+            return None
         
-        self.bm25 = BM25Okapi(tokenized_docs)
+        print(f" BM25 index loaded ({len(index)} documents)")
+        return index
+    
+    def _build_bm25_index(self):
+        # Fallback for stores built before the index was persisted
+        all_docs = self.vector_store.get_all()
+        self.lexical_index = LexicalIndex.build(all_docs['ids'], all_docs['documents'])
         
-        print(f" BM25 index built with {len(self.bm25_docs)} documents")
+        print(f" BM25 index built with {len(self.lexical_index)} documents")
+    
+    def _ensure_bm25_index(self):
+        # Concurrent first queries share one build; late arrivals see the finished index
+        if self.lexical_index is None:
+            self._index_builds.do(
+                'bm25',
+                lambda: self.lexical_index if self.lexical_index is not None else self._build_bm25_index()
+            )
     
     def _tokenize(self, text: str) -> List[str]:
-        # Lowercase and split by non-alphanumeric
-        tokens = re.findall(r'\b\w+\b', text.lower())
-        return tokens
+        return list(get_analyzer().analyze_query(text))
     
-    def retrieve_semantic(self, query: str, top_k: int = 10) -> List[Dict]:
-        query_embedding = self.embedding_generator.generate_embedding(query)
-        results = self.vector_store.search(query_embedding, top_k=top_k)
+    def retrieve_semantic(
+        self,
+        query: str,
+        top_k: int = 10,
+        nprobe: Optional[int] = None,
+        query_embedding: Optional[List[float]] = None
+    ) -> List[Dict]:
+        if query_embedding is None:
+            query_embedding = self.embedding_generator.generate_embedding(query)
+        # Only the IVF backend takes a recall/latency knob
+        search_params = {'nprobe': nprobe} if nprobe else {}
+        results = self.vector_store.search(query_embedding, top_k=top_k, **search_params)
         return results
     
+    async def retrieve_semantic_async(
+        self,
+        query: str,
+        top_k: int = 10,
+        nprobe: Optional[int] = None,
+        query_embedding: Optional[List[float]] = None
+    ) -> List[Dict]:
+        if query_embedding is None:
+            query_embedding = await self.embedding_generator.generate_embedding_async(query)
+        search_params = {'nprobe': nprobe} if nprobe else {}
+        return await self.run_blocking(self.vector_store.search, query_embedding, top_k=top_k, **search_params)
+    
     def retrieve_keyword(self, query: str, top_k: int = 10) -> List[Dict]:
-        if self.bm25 is None:
-            self._build_bm25_index()
-        
-        query_tokens = self._tokenize(query)
+        self._ensure_bm25_index()
         
-        scores = self.bm25.get_scores(query_tokens)
+        hits = self.lexical_index.search(query, top_k=top_k)
         
-        top_indices = sorted(range(len(scores)), key=lambda i: scores[i], reverse=True)[:top_k]
+        # Document text lives only in the vector store
+        records = self.vector_store.get_by_ids([self.lexical_index.ids[idx] for idx, _ in hits])
+        scores = {self.lexical_index.ids[idx]: score for idx, score in hits}
         
         results = []
-        for idx in top_indices:
+        for record in records:
             results.append({
-                'id': self.bm25_ids[idx],
-                'document': self.bm25_docs[idx],
-                'bm25_score': float(scores[idx]),
-                'metadata': self.bm25_metadata[idx] if self.bm25_metadata else {}
+                'id': record['id'],
+                'document': record['document'],
+                'bm25_score': scores[record['id']],
+                'metadata': record['metadata'] or {}
             })
         
         return results
     
+    def run_blocking(self, fn: Callable, *args, **kwargs) -> Awaitable:
+        """Run CPU-bound or blocking store work on the retrieval pool, off the event loop."""
+        return asyncio.get_running_loop().run_in_executor(self.executor, partial(fn, *args, **kwargs))
+    
+    def _run_branch(self, name: str, fn: Callable[[], List[Dict]], stats: Dict) -> Future:
+        def timed():
+            start = time.perf_counter()
+            try:
+                return fn()
+            finally:
+                stats[f'{name}_ms'] = round((time.perf_counter() - start) * 1000, 2)
+        
+        return self.executor.submit(timed)
+    
+    def _wait_branch(self, name: str, future: Future, deadline: float, stats: Dict) -> List[Dict]:
+        try:
+            results = future.result(timeout=max(0.0, deadline - time.perf_counter()))
+            stats[f'{name}_status'] = 'ok'
+            return results
+        except FutureTimeoutError:
+            print(f" {name} retrieval timed out, continuing without it")
+            stats[f'{name}_status'] = 'timeout'
+        except Exception as e:
+            print(f" {name} retrieval failed: {e}")
+            stats[f'{name}_status'] = 'error'
+        return []
+    
+    async def _timed_async(self, name: str, awaitable: Awaitable, stats: Dict):
+        start = time.perf_counter()
+        try:
+            return await awaitable
+        finally:
+            stats[f'{name}_ms'] = round((time.perf_counter() - start) * 1000, 2)
+    
+    async def _wait_branch_async(self, name: str, task: asyncio.Task, deadline: float, stats: Dict) -> List[Dict]:
+        try:
+            results = await asyncio.wait_for(task, timeout=max(0.0, deadline - time.perf_counter()))
+            stats[f'{name}_status'] = 'ok'
+            return results
+        except asyncio.TimeoutError:
+            print(f" {name} retrieval timed out, continuing without it")
+            stats[f'{name}_status'] = 'timeout'
+        except Exception as e:
+            print(f" {name} retrieval failed: {e}")
+            stats[f'{name}_status'] = 'error'
+        return []
+    
     def retrieve_hybrid(
         self,
         query: str,
         top_k: int = 10,
         semantic_weight: float = 0.7,
-        keyword_weight: float = 0.3
+        keyword_weight: float = 0.3,
+        nprobe: Optional[int] = None,
+        stats: Optional[Dict] = None,
+        query_embedding: Optional[List[float]] = None
+    ) -> List[Dict]:
+        """
+        Fuse semantic and BM25 results. Both branches run concurrently, each
+        with its own timeout; a branch that fails or times out contributes
+        nothing. Per-branch timings and status are written to `stats`.
+        A precomputed `query_embedding` skips the embedding call.
+        """
+        stats = {} if stats is None else stats
+        start = time.perf_counter()
+        
+        semantic_future = self._run_branch(
+            'semantic',
+            lambda: self.retrieve_semantic(query, top_k=top_k * 2, nprobe=nprobe, query_embedding=query_embedding),
+            stats
+        )
+        keyword_future = self._run_branch(
+            'keyword', lambda: self.retrieve_keyword(query, top_k=top_k * 2), stats
+        )
+        
+        semantic_results = self._wait_branch(
+            'semantic', semantic_future, start + settings.retrieval_semantic_timeout, stats
+        )
+        keyword_results = self._wait_branch(
+            'keyword', keyword_future, start + settings.retrieval_keyword_timeout, stats
+        )
+        
+        return self._fuse(semantic_results, keyword_results, top_k, semantic_weight, keyword_weight, stats, start)
+    
+    async def retrieve_hybrid_async(
+        self,
+        query: str,
+        top_k: int = 10,
+        semantic_weight: float = 0.7,
+        keyword_weight: float = 0.3,
+        nprobe: Optional[int] = None,
+        stats: Optional[Dict] = None,
+        query_embedding: Optional[List[float]] = None
+    ) -> List[Dict]:
+        """
+        `retrieve_hybrid` for async callers: the query embedding is awaited
+        natively, vector search and BM25 scoring run on the retrieval pool,
+        with the same per-branch timeouts.
+        """
+        stats = {} if stats is None else stats
+        start = time.perf_counter()
+        
+        semantic_task = asyncio.ensure_future(self._timed_async(
+            'semantic',
+            self.retrieve_semantic_async(query, top_k=top_k * 2, nprobe=nprobe, query_embedding=query_embedding),
+            stats
+        ))
+        keyword_task = asyncio.ensure_future(self._timed_async(
+            'keyword', self.run_blocking(self.retrieve_keyword, query, top_k=top_k * 2), stats
+        ))
+        
+        semantic_results = await self._wait_branch_async(
+            'semantic', semantic_task, start + settings.retrieval_semantic_timeout, stats
+        )
+        keyword_results = await self._wait_branch_async(
+            'keyword', keyword_task, start + settings.retrieval_keyword_timeout, stats
+        )
+        
+        return self._fuse(semantic_results, keyword_results, top_k, semantic_weight, keyword_weight, stats, start)
+    
+    def _fuse(
+        self,
+        semantic_results: List[Dict],
+        keyword_results: List[Dict],
+        top_k: int,
+        semantic_weight: float,
+        keyword_weight: float,
+        stats: Dict,
+        start: float
     ) -> List[Dict]:
-
-        semantic_results = self.retrieve_semantic(query, top_k=top_k * 2)
-        keyword_results = self.retrieve_keyword(query, top_k=top_k * 2)
+        
+        if stats['semantic_status'] != 'ok' and stats['keyword_status'] != 'ok':
+            raise RuntimeError("Both semantic and keyword retrieval failed")
+        
+        fusion_start = time.perf_counter()
         
         def normalize_scores(results, score_key):
             if not results:
@@ -112,4 +320,7 @@ class HybridRetriever:
         
         sorted_results = sorted(merged.values(), key=lambda x: x.get('hybrid_score', 0), reverse=True)
         
+        stats['fusion_ms'] = round((time.perf_counter() - fusion_start) * 1000, 2)
+        stats['retrieval_ms'] = round((time.perf_counter() - start) * 1000, 2)
+        
         return sorted_results[:top_k]
\ No newline at end of file
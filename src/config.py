@@ -1,6 +1,7 @@
 from pydantic_settings import BaseSettings
 from pydantic import Field
 from pathlib import Path
+from typing import Dict
 
 
 class Settings(BaseSettings):
@@ -12,7 +13,44 @@ class Settings(BaseSettings):
         env="OPENAI_EMBEDDING_MODEL"
     )
     openai_embedding_dimensions: int = Field(default=1536)
-    
+    openai_timeout: float = Field(default=60.0, env="OPENAI_TIMEOUT")  # seconds, read/write
+    openai_connect_timeout: float = 5.0
+    openai_pool_timeout: float = 10.0  # waiting for a free pooled connection
+    openai_max_retries: int = Field(default=2, env="OPENAI_MAX_RETRIES")
+    openai_max_connections: int = Field(default=100, env="OPENAI_MAX_CONNECTIONS")
+    openai_max_keepalive_connections: int = 20
+    openai_keepalive_expiry: float = 30.0
+
+    embedding_backend: str = Field(default="openai", env="EMBEDDING_BACKEND")
+    local_embedding_model: str = Field(
+        default="sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2",
+        env="LOCAL_EMBEDDING_MODEL"
+    )
+    local_embedding_runtime: str = Field(default="torch", env="LOCAL_EMBEDDING_RUNTIME")
+    local_embedding_quantized: bool = Field(default=False, env="LOCAL_EMBEDDING_QUANTIZED")
+    local_embedding_onnx_file: str = "onnx/model_qint8_avx512_vnni.onnx"
+    local_embedding_threads: int = 0
+    local_embedding_batch_size: int = 64
+    local_embedding_max_seq_length: int = 256
+
+    query_batching_enabled: bool = Field(default=True, env="QUERY_BATCHING_ENABLED")
+    query_batch_max_size: int = 32
+    query_batch_max_wait_ms: float = 5.0
+
+    embedding_cache_enabled: bool = Field(default=True, env="EMBEDDING_CACHE_ENABLED")
+    embedding_cache_path: str = Field(
+        default="./data/embedding_cache.sqlite",
+        env="EMBEDDING_CACHE_PATH"
+    )
+    embedding_cache_max_entries: int = 200000
+    embedding_max_input_tokens: int = 8191
+    embedding_max_request_tokens: int = 300000
+    embedding_max_batch_inputs: int = 2048
+    embedding_max_concurrency: int = Field(default=8, env="EMBEDDING_MAX_CONCURRENCY")
+    embedding_max_retries: int = 6
+    embedding_retry_base_delay: float = 1.0
+    embedding_retry_max_delay: float = 60.0
+
     project_root: Path = Field(default_factory=lambda: Path(__file__).parent.parent)
     data_dir: Path = Field(default_factory=lambda: Path(__file__).parent.parent / "data")
     cocoa_pdf_path: Path = Field(
@@ -22,13 +60,63 @@ class Settings(BaseSettings):
         default="./data/chroma_db", 
         env="CHROMA_PERSIST_DIR"
     )
+    vector_store_backend: str = Field(default="chroma", env="VECTOR_STORE_BACKEND")
+    mmap_store_dir: str = Field(
+        default="./data/mmap_store",
+        env="MMAP_STORE_DIR"
+    )
+    vector_store_snapshot: str = Field(default="", env="VECTOR_STORE_SNAPSHOT")  # serve a read-only snapshot file
+    vector_quantization: str = Field(default="none", env="VECTOR_QUANTIZATION")  # none | int8
+    vector_coarse_dimensions: int = Field(default=0, env="VECTOR_COARSE_DIMENSIONS")  # 0: all dimensions
+    vector_rescore_candidates: int = 100
+    ann_n_lists: int = Field(default=0, env="ANN_N_LISTS")  # 0: 4 * sqrt(N)
+    ann_nprobe: int = Field(default=16, env="ANN_NPROBE")
+    ann_train_iterations: int = 15
+    ann_train_sample: int = 50000
+    ann_retrain_drift: float = 0.2  # retrain k-means once this fraction of rows changed since training
     
     chunk_size: int = 600
     chunk_overlap: int = 100
     top_k_retrieval: int = 10
     top_k_rerank: int = 5
+    llm_mode: str = Field(default="two_pass", env="LLM_MODE")  # two_pass: rerank then explain | single_pass: one call
+    prompt_rerank_budget_tokens: int = Field(default=2000, env="PROMPT_RERANK_BUDGET_TOKENS")  # candidate excerpts
+    prompt_rerank_excerpt_tokens: int = 100  # per candidate
+    prompt_context_budget_tokens: int = Field(default=4000, env="PROMPT_CONTEXT_BUDGET_TOKENS")  # full chunks to explain
+    prompt_min_excerpt_tokens: int = 32  # the first chunk is never cut shorter, whatever the budget
     semantic_weight: float = 0.7
     keyword_weight: float = 0.3
+    code_fast_path_enabled: bool = Field(default=True, env="CODE_FAST_PATH_ENABLED")
+    code_fast_path_max_extra_terms: int = 0  # free-text words tolerated in a code query ("sepsis A41" is not one)
+    retrieval_semantic_timeout: float = Field(default=10.0, env="RETRIEVAL_SEMANTIC_TIMEOUT")  # seconds
+    retrieval_keyword_timeout: float = Field(default=2.0, env="RETRIEVAL_KEYWORD_TIMEOUT")
+    retrieval_max_workers: int = 32
+    result_cache_enabled: bool = Field(default=True, env="RESULT_CACHE_ENABLED")
+    result_cache_max_entries: int = 2048  # in-process LRU tier
+    result_cache_ttl: float = Field(default=600.0, env="RESULT_CACHE_TTL")  # seconds
+    result_cache_shared_backend: str = Field(default="sqlite", env="RESULT_CACHE_SHARED_BACKEND")  # none | sqlite | redis
+    result_cache_shared_ttl: float = Field(default=86400.0, env="RESULT_CACHE_SHARED_TTL")
+    result_cache_path: str = Field(default="./data/result_cache.sqlite", env="RESULT_CACHE_PATH")
+    result_cache_redis_url: str = Field(default="redis://localhost:6379/0", env="RESULT_CACHE_REDIS_URL")
+    semantic_cache_enabled: bool = Field(default=True, env="SEMANTIC_CACHE_ENABLED")
+    semantic_cache_threshold: float = Field(default=0.97, env="SEMANTIC_CACHE_THRESHOLD")  # cosine similarity
+    semantic_cache_max_entries: int = 1024
+    semantic_cache_ttl: float = Field(default=600.0, env="SEMANTIC_CACHE_TTL")  # seconds
+    bm25_k1: float = 1.5
+    bm25_b: float = 0.75
+    # BM25F weight per chunk field; exclusions list what a code is NOT
+    bm25_field_weights: Dict[str, float] = Field(
+        default={
+            "code": 3.0,
+            "label": 2.5,
+            "inclusions": 1.0,
+            "instructions": 0.5,
+            "notes": 0.5,
+            "exclusions": 0.2,
+            "body": 1.0
+        },
+        env="BM25_FIELD_WEIGHTS"
+    )
 
     api_host: str = Field(default="0.0.0.0", env="API_HOST")
     api_port: int = Field(default=8000, env="API_PORT")
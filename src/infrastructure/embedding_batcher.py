@@ -0,0 +1,197 @@
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+from concurrent.futures import Future
+import asyncio
+import queue
+import threading
+import time
+import weakref
+
+from ..config import settings
+
+
+class QueryEmbeddingBatcher:
+    """
+    Coalesces concurrent single-text embedding requests into batched calls.
+
+    Callers block on a future while a background thread collects requests
+    for up to `max_wait_ms` (or until `max_batch_size` are queued) and sends
+    them to `embed_fn` as one batch. Identical texts in a batch are embedded
+    once.
+    """
+
+    def __init__(
+        self,
+        embed_fn: Callable[[List[str]], List[Optional[List[float]]]],
+        max_batch_size: Optional[int] = None,
+        max_wait_ms: Optional[float] = None
+    ):
+        self.embed_fn = embed_fn
+        self.max_batch_size = max_batch_size or settings.query_batch_max_size
+        self.max_wait = (max_wait_ms if max_wait_ms is not None else settings.query_batch_max_wait_ms) / 1000
+
+        self._queue: "queue.Queue[Tuple[str, Future]]" = queue.Queue()
+        self._worker: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+
+        self.requests = 0
+        self.batches = 0
+
+    def _ensure_worker(self):
+        if self._worker is not None:
+            return
+        with self._start_lock:
+            if self._worker is None:
+                self._worker = threading.Thread(
+                    target=self._run,
+                    name="query-embedding-batcher",
+                    daemon=True
+                )
+                self._worker.start()
+
+    def submit(self, text: str) -> Future:
+        self._ensure_worker()
+        future: Future = Future()
+        self._queue.put((text, future))
+        return future
+
+    def embed(self, text: str) -> Optional[List[float]]:
+        return self.submit(text).result()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.max_wait
+
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            self._flush(batch)
+
+    def _flush(self, batch: List[Tuple[str, Future]]):
+        texts = list(dict.fromkeys(text for text, _ in batch))
+
+        try:
+            vectors = dict(zip(texts, self.embed_fn(texts)))
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+
+        self.requests += len(batch)
+        self.batches += 1
+
+        for text, future in batch:
+            future.set_result(vectors.get(text))
+
+    def stats(self) -> Dict:
+        return {
+            'requests': self.requests,
+            'batches': self.batches,
+            'avg_batch_size': self.requests / self.batches if self.batches else 0.0,
+            'queued': self._queue.qsize()
+        }
+
+
+class AsyncQueryEmbeddingBatcher:
+    """
+    `QueryEmbeddingBatcher` for the event loop.
+
+    Callers await a future while a worker task collects requests from an
+    asyncio.Queue for up to `max_wait_ms` (or until `max_batch_size` are
+    queued) and awaits `embed_fn` on them as one batch. A batch is sent as
+    its own task, so the next one is collected while it is in flight.
+    Queues and workers are per event loop.
+    """
+
+    def __init__(
+        self,
+        embed_fn: Callable[[List[str]], Awaitable[List[Optional[List[float]]]]],
+        max_batch_size: Optional[int] = None,
+        max_wait_ms: Optional[float] = None
+    ):
+        self.embed_fn = embed_fn
+        self.max_batch_size = max_batch_size or settings.query_batch_max_size
+        self.max_wait = (max_wait_ms if max_wait_ms is not None else settings.query_batch_max_wait_ms) / 1000
+
+        self._queues: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Queue]" = weakref.WeakKeyDictionary()
+        self._tasks: Set[asyncio.Task] = set()
+
+        self.requests = 0
+        self.batches = 0
+
+    def _queue(self) -> asyncio.Queue:
+        loop = asyncio.get_running_loop()
+        pending = self._queues.get(loop)
+        if pending is None:
+            pending = asyncio.Queue()
+            self._queues[loop] = pending
+            self._spawn(self._run(pending))
+        return pending
+
+    def _spawn(self, coroutine):
+        # Keep a reference, the loop only holds weak ones to its tasks
+        task = asyncio.ensure_future(coroutine)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def submit(self, text: str) -> asyncio.Future:
+        pending = self._queue()
+        future = asyncio.get_running_loop().create_future()
+        pending.put_nowait((text, future))
+        return future
+
+    async def embed(self, text: str) -> Optional[List[float]]:
+        return await self.submit(text)
+
+    async def _run(self, pending: asyncio.Queue):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await pending.get()]
+            deadline = loop.time() + self.max_wait
+
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(pending.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+
+            self._spawn(self._flush(batch))
+
+    async def _flush(self, batch: List[Tuple[str, asyncio.Future]]):
+        # Callers that gave up are dropped
+        batch = [(text, future) for text, future in batch if not future.done()]
+        if not batch:
+            return
+        texts = list(dict.fromkeys(text for text, _ in batch))
+
+        try:
+            vectors = dict(zip(texts, await self.embed_fn(texts)))
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        self.requests += len(batch)
+        self.batches += 1
+
+        for text, future in batch:
+            if not future.done():
+                future.set_result(vectors.get(text))
+
+    def stats(self) -> Dict:
+        return {
+            'requests': self.requests,
+            'batches': self.batches,
+            'avg_batch_size': self.requests / self.batches if self.batches else 0.0,
+            'queued': sum(pending.qsize() for pending in list(self._queues.values()))
+        }
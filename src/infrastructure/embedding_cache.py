@@ -0,0 +1,178 @@
+from typing import List, Optional, Dict
+from pathlib import Path
+import hashlib
+import sqlite3
+import threading
+import time
+import unicodedata
+
+import numpy as np
+
+from ..config import settings
+
+
+class EmbeddingCache:
+    """
+    Persistent embedding cache backed by SQLite.
+
+    Entries are content-addressed on (model, dimensions, normalized text) so a
+    rebuild only pays for text it has never embedded, and repeated queries skip
+    the API round trip. Vectors are stored as float32 blobs; the least recently
+    used entries are evicted once `max_entries` is exceeded.
+
+    The row count used for eviction is read once at open and then kept up
+    to date by this instance, so inserts do not scan the table. Rows added
+    by another process sharing the file are only seen after a reopen.
+    """
+
+    _SQL_BATCH = 500
+
+    def __init__(self, path: Optional[str] = None, max_entries: Optional[int] = None):
+        self.path = path or settings.embedding_cache_path
+        self.max_entries = max_entries if max_entries is not None else settings.embedding_cache_max_entries
+
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                dimensions INTEGER NOT NULL,
+                vector BLOB NOT NULL,
+                last_used REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings(last_used)")
+        self._conn.commit()
+        self._rows = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def normalize_text(text: str) -> str:
+        return unicodedata.normalize("NFC", " ".join(text.split()))
+
+    @classmethod
+    def make_key(cls, model: str, dimensions: int, text: str) -> str:
+        payload = f"{model}\x1f{dimensions}\x1f{cls.normalize_text(text)}"
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, model: str, dimensions: int, text: str) -> Optional[List[float]]:
+        return self.get_many(model, dimensions, [text])[0]
+
+    def get_many(self, model: str, dimensions: int, texts: List[str]) -> List[Optional[List[float]]]:
+
+        keys = [self.make_key(model, dimensions, text) for text in texts]
+        found: Dict[str, List[float]] = {}
+
+        with self._lock:
+            unique_keys = list(dict.fromkeys(keys))
+            for i in range(0, len(unique_keys), self._SQL_BATCH):
+                batch = unique_keys[i:i + self._SQL_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})",
+                    batch
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32).tolist()
+
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                    [(now, key) for key in found]
+                )
+                self._conn.commit()
+
+            results = [found.get(key) for key in keys]
+            hit_count = sum(1 for r in results if r is not None)
+            self.hits += hit_count
+            self.misses += len(results) - hit_count
+
+        return results
+
+    def put(self, model: str, dimensions: int, text: str, embedding: List[float]):
+        self.put_many(model, dimensions, [text], [embedding])
+
+    def put_many(self, model: str, dimensions: int, texts: List[str], embeddings: List[List[float]]):
+
+        now = time.time()
+        rows = {}
+        for text, embedding in zip(texts, embeddings):
+            vector = np.asarray(embedding, dtype=np.float32)
+            # Zero vectors are failure placeholders, never cache them
+            if not vector.any():
+                continue
+            key = self.make_key(model, dimensions, text)
+            rows[key] = (key, model, dimensions, vector.tobytes(), now)
+
+        if not rows:
+            return
+
+        with self._lock:
+            keys = list(rows)
+            existing = 0
+            for i in range(0, len(keys), self._SQL_BATCH):
+                batch = keys[i:i + self._SQL_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                existing += self._conn.execute(
+                    f"SELECT COUNT(*) FROM embeddings WHERE key IN ({placeholders})",
+                    batch
+                ).fetchone()[0]
+
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, model, dimensions, vector, last_used) VALUES (?, ?, ?, ?, ?)",
+                list(rows.values())
+            )
+            self._rows += len(rows) - existing
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        if not self.max_entries or self.max_entries <= 0:
+            return
+
+        overflow = self._rows - self.max_entries
+        if overflow > 0:
+            deleted = self._conn.execute(
+                "DELETE FROM embeddings WHERE key IN "
+                "(SELECT key FROM embeddings ORDER BY last_used ASC LIMIT ?)",
+                (overflow,)
+            ).rowcount
+            self._rows -= deleted
+            self.evictions += deleted
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            'entries': self.count(),
+            'max_entries': self.max_entries,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / lookups if lookups else 0.0
+        }
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM embeddings")
+            self._conn.commit()
+            self._rows = 0
+        print("Embedding cache cleared")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,333 @@
+from abc import ABC, abstractmethod
+from typing import List, Optional, Dict
+import asyncio
+import random
+import time
+
+import numpy as np
+import openai
+from openai import AsyncOpenAI
+
+from .openai_transport import create_openai_client, get_async_openai_client
+from .token_counter import TokenCounter
+from ..config import settings
+
+
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.APIConnectionError,
+    openai.APITimeoutError,
+    openai.InternalServerError,
+)
+
+# Rejections caused by the inputs themselves: only these are worth
+# bisecting a batch or shortening a text over
+INPUT_ERROR_CODES = {"context_length_exceeded", "invalid_input", "string_above_max_length"}
+INPUT_ERROR_MESSAGES = ("maximum context length", "too many tokens", "invalid input", "'$.input'", "invalid 'input")
+
+
+def is_input_error(error: openai.BadRequestError) -> bool:
+    if getattr(error, "code", None) in INPUT_ERROR_CODES:
+        return True
+    message = str(getattr(error, "message", None) or error).lower()
+    return any(marker in message for marker in INPUT_ERROR_MESSAGES)
+
+
+class EmbeddingProvider(ABC):
+    """
+    A backend that turns one request-sized batch of texts into vectors.
+
+    Batching, caching and progress are handled by EmbeddingGenerator; a
+    provider only declares its limits and embeds what it is given. A None
+    in the returned list marks a text the backend could not embed.
+    """
+
+    name: str = ""
+    model: str = ""
+    dimensions: int = 0
+
+    # None means the backend truncates long inputs itself
+    max_input_tokens: Optional[int] = None
+    max_request_tokens: Optional[int] = None
+    max_batch_inputs: int = 64
+    token_counter: Optional[TokenCounter] = None
+
+    @property
+    def cache_namespace(self) -> str:
+        return f"{self.name}:{self.model}"
+
+    @property
+    def signature(self) -> Dict:
+        return {
+            'embedding_backend': self.name,
+            'embedding_model': self.model,
+            'embedding_dimensions': self.dimensions
+        }
+
+    @abstractmethod
+    def embed(self, texts: List[str]) -> List[Optional[List[float]]]:
+        pass
+
+    async def embed_async(self, texts: List[str]) -> List[Optional[List[float]]]:
+        return await asyncio.to_thread(self.embed, texts)
+
+
+class OpenAIEmbeddingProvider(EmbeddingProvider):
+
+    name = "openai"
+
+    def __init__(self):
+        # Retries are handled here with rate-limit-aware backoff
+        self.client = create_openai_client(max_retries=0)
+        self.model = settings.openai_embedding_model
+        self.dimensions = settings.openai_embedding_dimensions
+        self.max_retries = settings.embedding_max_retries
+
+        self.token_counter = TokenCounter(self.model)
+        self.max_input_tokens = settings.embedding_max_input_tokens
+        self.max_request_tokens = settings.embedding_max_request_tokens
+        self.max_batch_inputs = settings.embedding_max_batch_inputs
+
+    @property
+    def async_client(self) -> AsyncOpenAI:
+        # One client per event loop, on the shared connection pool
+        return get_async_openai_client(max_retries=0)
+
+    @property
+    def cache_namespace(self) -> str:
+        # Plain model name, so caches written before backends existed stay valid
+        return self.model
+
+    def _retry_delay(self, attempt: int, error: Exception) -> float:
+        """Honour the server's retry-after hint, else exponential backoff with jitter."""
+        response = getattr(error, "response", None)
+        headers = getattr(response, "headers", None) or {}
+
+        retry_after = headers.get("retry-after")
+        if retry_after:
+            try:
+                return min(float(retry_after), settings.embedding_retry_max_delay)
+            except ValueError:
+                pass
+
+        delay = settings.embedding_retry_base_delay * (2 ** attempt)
+        delay = min(delay, settings.embedding_retry_max_delay)
+        return delay * (0.5 + random.random() / 2)
+
+    def _embed_with_backoff(self, batch: List[str]) -> List[List[float]]:
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = self.client.embeddings.create(
+                    model=self.model,
+                    input=batch,
+                    encoding_format="float"
+                )
+                return [item.embedding for item in response.data]
+            except RETRYABLE_ERRORS as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = self._retry_delay(attempt, e)
+                print(f" {type(e).__name__}, retrying in {delay:.1f}s (attempt {attempt + 1}/{self.max_retries})")
+                time.sleep(delay)
+
+    async def _embed_with_backoff_async(self, batch: List[str]) -> List[List[float]]:
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = await self.async_client.embeddings.create(
+                    model=self.model,
+                    input=batch,
+                    encoding_format="float"
+                )
+                return [item.embedding for item in response.data]
+            except RETRYABLE_ERRORS as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = self._retry_delay(attempt, e)
+                print(f" {type(e).__name__}, retrying in {delay:.1f}s (attempt {attempt + 1}/{self.max_retries})")
+                await asyncio.sleep(delay)
+
+    def embed(self, texts: List[str]) -> List[Optional[List[float]]]:
+        """Embed a batch; when the API rejects an input, halve it until the bad input is isolated."""
+        try:
+            return self._embed_with_backoff(texts)
+        except openai.BadRequestError as e:
+            if not is_input_error(e):
+                # Model, dimensions or account problem: splitting would only repeat it
+                print(f"Error embedding {len(texts)} texts: {e}")
+                return [None] * len(texts)
+            if len(texts) == 1:
+                return [self._embed_shrinking(texts[0], e)]
+            mid = len(texts) // 2
+            return self.embed(texts[:mid]) + self.embed(texts[mid:])
+        except Exception as e:
+            print(f"Error embedding {len(texts)} texts: {e}")
+            return [None] * len(texts)
+
+    def _embed_shrinking(self, text: str, error: Exception) -> Optional[List[float]]:
+        tokens = self.token_counter.encode(text)
+        while len(tokens) > 1:
+            tokens = tokens[:len(tokens) // 2]
+            try:
+                return self._embed_with_backoff([self.token_counter.decode(tokens)])[0]
+            except openai.BadRequestError as e:
+                error = e
+                if not is_input_error(e):
+                    break
+            except Exception as e:
+                error = e
+                break
+
+        print(f" Could not embed text ({len(text)} chars): {error}")
+        return None
+
+    async def embed_async(self, texts: List[str]) -> List[Optional[List[float]]]:
+        try:
+            return await self._embed_with_backoff_async(texts)
+        except openai.BadRequestError as e:
+            if not is_input_error(e):
+                print(f"Error embedding {len(texts)} texts: {e}")
+                return [None] * len(texts)
+            if len(texts) == 1:
+                return [await self._embed_shrinking_async(texts[0], e)]
+            mid = len(texts) // 2
+            return (
+                await self.embed_async(texts[:mid])
+                + await self.embed_async(texts[mid:])
+            )
+        except Exception as e:
+            print(f"Error embedding {len(texts)} texts: {e}")
+            return [None] * len(texts)
+
+    async def _embed_shrinking_async(self, text: str, error: Exception) -> Optional[List[float]]:
+        tokens = self.token_counter.encode(text)
+        while len(tokens) > 1:
+            tokens = tokens[:len(tokens) // 2]
+            try:
+                return (await self._embed_with_backoff_async([self.token_counter.decode(tokens)]))[0]
+            except openai.BadRequestError as e:
+                error = e
+                if not is_input_error(e):
+                    break
+            except Exception as e:
+                error = e
+                break
+
+        print(f" Could not embed text ({len(text)} chars): {error}")
+        return None
+
+
+class LocalEmbeddingProvider(EmbeddingProvider):
+    """
+    CPU embeddings with sentence-transformers, for offline deployments.
+
+    `runtime="onnx"` loads the model through ONNX Runtime; with `quantized`
+    it loads the int8 ONNX export (torch runtime: dynamic int8 quantization
+    of the Linear layers instead).
+    """
+
+    name = "local"
+
+    def __init__(
+        self,
+        model_name: Optional[str] = None,
+        runtime: Optional[str] = None,
+        quantized: Optional[bool] = None,
+        threads: Optional[int] = None
+    ):
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError as e:
+            raise ImportError(
+                "The local embedding backend requires sentence-transformers: "
+                "pip install sentence-transformers"
+            ) from e
+
+        self.model = model_name or settings.local_embedding_model
+        self.runtime = runtime or settings.local_embedding_runtime
+        self.quantized = settings.local_embedding_quantized if quantized is None else quantized
+        threads = threads if threads is not None else settings.local_embedding_threads
+        self.max_batch_inputs = settings.local_embedding_batch_size
+
+        if self.runtime not in ("torch", "onnx"):
+            raise ValueError(f"Unknown local embedding runtime: {self.runtime}")
+
+        kwargs = {}
+        if self.runtime == "onnx":
+            try:
+                import onnxruntime
+                import optimum.onnxruntime
+            except ImportError as e:
+                raise ImportError(
+                    "LOCAL_EMBEDDING_RUNTIME=onnx requires sentence-transformers>=3.2 and ONNX Runtime: "
+                    "pip install \"sentence-transformers[onnx]>=3.2\""
+                ) from e
+            model_kwargs = {"provider": "CPUExecutionProvider"}
+            if self.quantized:
+                model_kwargs["file_name"] = settings.local_embedding_onnx_file
+            if threads:
+                session_options = onnxruntime.SessionOptions()
+                session_options.intra_op_num_threads = threads
+                model_kwargs["session_options"] = session_options
+            kwargs = {"backend": "onnx", "model_kwargs": model_kwargs}
+        elif threads:
+            import torch
+            torch.set_num_threads(threads)
+
+        try:
+            self.encoder = SentenceTransformer(self.model, device="cpu", **kwargs)
+        except TypeError as e:
+            if not kwargs:
+                raise
+            # sentence-transformers < 3.2 has no `backend` argument
+            raise ImportError(
+                "LOCAL_EMBEDDING_RUNTIME=onnx requires sentence-transformers>=3.2: "
+                "pip install \"sentence-transformers[onnx]>=3.2\""
+            ) from e
+        self.encoder.max_seq_length = settings.local_embedding_max_seq_length
+
+        if self.runtime == "torch" and self.quantized:
+            import torch
+            self.encoder = torch.quantization.quantize_dynamic(
+                self.encoder, {torch.nn.Linear}, dtype=torch.qint8
+            )
+
+        self.dimensions = self.encoder.get_sentence_embedding_dimension()
+
+        print(f"Local embedding model loaded: {self.model} ({self.runtime}{', int8' if self.quantized else ''}, {self.dimensions} dims)")
+
+    @property
+    def cache_namespace(self) -> str:
+        return f"{self.name}:{self.model}:{self.runtime}{':int8' if self.quantized else ''}"
+
+    @property
+    def signature(self) -> Dict:
+        signature = super().signature
+        signature['embedding_runtime'] = self.runtime
+        signature['embedding_quantized'] = self.quantized
+        return signature
+
+    def embed(self, texts: List[str]) -> List[Optional[List[float]]]:
+        try:
+            vectors = self.encoder.encode(
+                texts,
+                batch_size=self.max_batch_inputs,
+                normalize_embeddings=True,
+                convert_to_numpy=True,
+                show_progress_bar=False
+            )
+        except Exception as e:
+            print(f"Error embedding {len(texts)} texts: {e}")
+            return [None] * len(texts)
+
+        return np.asarray(vectors, dtype=np.float32).tolist()
+
+
+def create_embedding_provider(backend: Optional[str] = None) -> EmbeddingProvider:
+    backend = backend or settings.embedding_backend
+
+    if backend == "openai":
+        return OpenAIEmbeddingProvider()
+    if backend == "local":
+        return LocalEmbeddingProvider()
+
+    raise ValueError(f"Unknown embedding backend: {backend}")
@@ -1,62 +1,277 @@
-from typing import List
-import openai
-from openai import OpenAI
+from typing import List, Optional, Tuple, Dict
+from collections import defaultdict
+import asyncio
 import numpy as np
 from tqdm import tqdm
 
+from .embedding_cache import EmbeddingCache
+from .embedding_batcher import QueryEmbeddingBatcher, AsyncQueryEmbeddingBatcher
+from .embedding_providers import EmbeddingProvider, create_embedding_provider
 from ..config import settings
 
 
+class _PieceCollector:
+    """
+    Reassembles per-text embeddings from packed pieces.
+    
+    A text longer than the per-input token limit is split into several
+    pieces; its embedding is the token-weighted mean of its pieces.
+    """
+    
+    def __init__(self, pieces: List[Tuple[int, str, int]], indices: List[int], dimensions: int):
+        self.pieces = pieces
+        self.dimensions = dimensions
+        self.vectors: List[Optional[List[float]]] = [None] * len(pieces)
+        
+        self.owner_pieces: Dict[int, List[int]] = defaultdict(list)
+        for p, (owner, _, _) in enumerate(pieces):
+            self.owner_pieces[owner].append(p)
+        self.remaining = {owner: len(p) for owner, p in self.owner_pieces.items()}
+        
+        # Empty texts produce no pieces and cannot be embedded
+        self.failed = [idx for idx in indices if idx not in self.owner_pieces]
+    
+    def add(self, piece_ids: List[int], vectors: List[Optional[List[float]]]) -> List[Tuple[int, List[float]]]:
+        finished = []
+        for p, vector in zip(piece_ids, vectors):
+            self.vectors[p] = vector
+            owner = self.pieces[p][0]
+            self.remaining[owner] -= 1
+            if self.remaining[owner] == 0:
+                finished.append((owner, self._combine(owner)))
+        return finished
+    
+    def _combine(self, owner: int) -> List[float]:
+        parts = [
+            (self.vectors[p], self.pieces[p][2])
+            for p in self.owner_pieces[owner]
+            if self.vectors[p] is not None
+        ]
+        if not parts:
+            self.failed.append(owner)
+            return [0.0] * self.dimensions
+        if len(parts) == 1:
+            return parts[0][0]
+        
+        combined = np.average(
+            np.array([v for v, _ in parts], dtype=np.float32),
+            axis=0,
+            weights=[n for _, n in parts]
+        )
+        norm = np.linalg.norm(combined)
+        return (combined / norm if norm > 0 else combined).tolist()
+
+
 class EmbeddingGenerator:
     
-    def __init__(self):
-        self.client = OpenAI(api_key=settings.openai_api_key)
-        self.model = settings.openai_embedding_model
-        self.dimensions = settings.openai_embedding_dimensions
+    def __init__(
+        self,
+        cache: Optional[EmbeddingCache] = None,
+        provider: Optional[EmbeddingProvider] = None
+    ):
+        self.provider = provider or create_embedding_provider()
+        self.backend = self.provider.name
+        self.model = self.provider.model
+        self.dimensions = self.provider.dimensions
         
+        if cache is None and settings.embedding_cache_enabled:
+            cache = EmbeddingCache()
+        self.cache = cache
+        
+        # Concurrent query embeddings share one provider call
+        self.batcher = None
+        self.async_batcher = None
+        if settings.query_batching_enabled:
+            self.batcher = QueryEmbeddingBatcher(self.provider.embed)
+            self.async_batcher = AsyncQueryEmbeddingBatcher(self.provider.embed_async)
+    
+    @property
+    def signature(self) -> Dict:
+        """Identifies the embedding space; stored with the index it builds."""
+        return self.provider.signature
+    
     def generate_embedding(self, text: str) -> List[float]:
 
-        try:
-            response = self.client.embeddings.create(
-                model=self.model,
-                input=text,
-                encoding_format="float"
-            )
-            return response.data[0].embedding
-        except Exception as e:
-            print(f"Error generating embedding: {e}")
+        if self.cache is not None:
+            cached = self.cache.get(self.provider.cache_namespace, self.dimensions, text)
+            if cached is not None:
+                return cached
+        
+        prepared = text
+        if self.provider.max_input_tokens:
+            prepared = self.provider.token_counter.truncate(text, self.provider.max_input_tokens)
+        
+        if self.batcher is not None:
+            embedding = self.batcher.embed(prepared)
+        else:
+            embedding = self.provider.embed([prepared])[0]
+        if embedding is None:
             return [0.0] * self.dimensions
+        
+        self._store_cached([text], [embedding])
+        
+        return embedding
     
-    def generate_embeddings_batch(self, texts: List[str], batch_size: int = 100) -> List[List[float]]:
-
-        embeddings = []
+    async def generate_embedding_async(self, text: str) -> List[float]:
+        """
+        Awaitable `generate_embedding`: the provider call is awaited and the
+        SQLite cache is read and written from a worker thread, so neither
+        blocks the event loop.
+        """
+        if self.cache is not None:
+            cached = await asyncio.to_thread(self.cache.get, self.provider.cache_namespace, self.dimensions, text)
+            if cached is not None:
+                return cached
         
-        print(f"Generating embeddings for {len(texts)} texts...")
+        prepared = text
+        if self.provider.max_input_tokens:
+            prepared = self.provider.token_counter.truncate(text, self.provider.max_input_tokens)
+        
+        if self.async_batcher is not None:
+            embedding = await self.async_batcher.embed(prepared)
+        else:
+            embedding = (await self.provider.embed_async([prepared]))[0]
+        if embedding is None:
+            return [0.0] * self.dimensions
+        
+        await asyncio.to_thread(self._store_cached, [text], [embedding])
+        
+        return embedding
+    
+    def _lookup_cached(self, texts: List[str]) -> List[Optional[List[float]]]:
+        if self.cache is None:
+            return [None] * len(texts)
+        
+        embeddings = self.cache.get_many(self.provider.cache_namespace, self.dimensions, texts)
+        hits = sum(1 for e in embeddings if e is not None)
+        print(f" Cache: {hits} hits, {len(texts) - hits} to embed")
+        return embeddings
+    
+    def _store_cached(self, texts: List[str], embeddings: List[List[float]]):
+        if self.cache is not None:
+            self.cache.put_many(self.provider.cache_namespace, self.dimensions, texts, embeddings)
+    
+    def _split_into_pieces(self, texts: List[str], indices: List[int]) -> List[Tuple[int, str, int]]:
+        """Return (text index, text, token count) pieces, splitting texts over the per-input limit."""
+        counter = self.provider.token_counter
+        max_input_tokens = self.provider.max_input_tokens
+        
+        if counter is None or not max_input_tokens:
+            # The backend truncates by itself; character length is only used for packing
+            return [(idx, texts[idx], len(texts[idx])) for idx in indices if texts[idx]]
         
-        max_chars = 30000
-        truncated_texts = []
-        for text in texts:
-            if len(text) > max_chars:
-                truncated_texts.append(text[:max_chars] + "...[truncated]")
-            else:
-                truncated_texts.append(text)
+        counts = counter.count_many([texts[idx] for idx in indices])
         
-        for i in tqdm(range(0, len(truncated_texts), batch_size)):
-            batch = truncated_texts[i:i + batch_size]
+        pieces = []
+        for idx, n_tokens in zip(indices, counts):
+            if n_tokens == 0:
+                continue
+            if n_tokens <= max_input_tokens:
+                pieces.append((idx, texts[idx], n_tokens))
+                continue
             
-            try:
-                response = self.client.embeddings.create(
-                    model=self.model,
-                    input=batch,
-                    encoding_format="float"
-                )
-                
-                batch_embeddings = [item.embedding for item in response.data]
-                embeddings.extend(batch_embeddings)
-                
-            except Exception as e:
-                print(f"Error in batch {i//batch_size}: {e}")
-                embeddings.extend([[0.0] * self.dimensions] * len(batch))
+            tokens = counter.encode(texts[idx])
+            for start in range(0, len(tokens), max_input_tokens):
+                window = tokens[start:start + max_input_tokens]
+                pieces.append((idx, counter.decode(window), len(window)))
+        
+        return pieces
+    
+    def _pack_batches(self, pieces: List[Tuple[int, str, int]], max_inputs: int) -> List[List[int]]:
+        """Greedily fill each request up to the input count and per-request token limits."""
+        max_request_tokens = self.provider.max_request_tokens or float("inf")
+        batches = []
+        current = []
+        current_tokens = 0
+        
+        for p, (_, _, n_tokens) in enumerate(pieces):
+            if current and (len(current) >= max_inputs or current_tokens + n_tokens > max_request_tokens):
+                batches.append(current)
+                current = []
+                current_tokens = 0
+            current.append(p)
+            current_tokens += n_tokens
+        
+        if current:
+            batches.append(current)
+        
+        return batches
+    
+    def _collect(self, texts: List[str], embeddings: List, finished: List[Tuple[int, List[float]]]):
+        for idx, embedding in finished:
+            embeddings[idx] = embedding
+        
+        # Cache as texts complete so an interrupted build resumes where it stopped
+        self._store_cached([texts[idx] for idx, _ in finished], [e for _, e in finished])
+    
+    def _report_failures(self, texts: List[str], embeddings: List, collector: _PieceCollector):
+        for idx in collector.failed:
+            embeddings[idx] = [0.0] * self.dimensions
+        
+        if collector.failed:
+            print(f" {len(collector.failed)} texts could not be embedded, rerun to retry them")
+    
+    def generate_embeddings_batch(self, texts: List[str], batch_size: Optional[int] = None) -> List[List[float]]:
+
+        print(f"Generating embeddings for {len(texts)} texts...")
+        
+        embeddings = self._lookup_cached(texts)
+        missing = [i for i, e in enumerate(embeddings) if e is None]
+        
+        pieces = self._split_into_pieces(texts, missing)
+        batches = self._pack_batches(pieces, batch_size or self.provider.max_batch_inputs)
+        collector = _PieceCollector(pieces, missing, self.dimensions)
+        
+        print(f" Packed {len(pieces)} inputs into {len(batches)} requests")
+        
+        for batch in tqdm(batches):
+            vectors = self.provider.embed([pieces[p][1] for p in batch])
+            self._collect(texts, embeddings, collector.add(batch, vectors))
+        
+        self._report_failures(texts, embeddings, collector)
+        
+        return embeddings
+    
+    async def generate_embeddings_batch_async(
+        self,
+        texts: List[str],
+        batch_size: Optional[int] = None,
+        max_concurrency: Optional[int] = None
+    ) -> List[List[float]]:
+        """
+        Embed texts with up to `max_concurrency` requests in flight.
+        
+        Completed texts are written to the cache as they finish, so a
+        rerun after an interruption only embeds what is still missing.
+        """
+        max_concurrency = max_concurrency or settings.embedding_max_concurrency
+        
+        print(f"Generating embeddings for {len(texts)} texts ({max_concurrency} concurrent requests)...")
+        
+        embeddings = await asyncio.to_thread(self._lookup_cached, texts)
+        missing = [i for i, e in enumerate(embeddings) if e is None]
+        
+        pieces = self._split_into_pieces(texts, missing)
+        batches = self._pack_batches(pieces, batch_size or self.provider.max_batch_inputs)
+        collector = _PieceCollector(pieces, missing, self.dimensions)
+        
+        print(f" Packed {len(pieces)} inputs into {len(batches)} requests")
+        
+        semaphore = asyncio.Semaphore(max_concurrency)
+        progress = tqdm(total=len(batches))
+        
+        async def run_batch(batch: List[int]):
+            async with semaphore:
+                vectors = await self.provider.embed_async([pieces[p][1] for p in batch])
+                await asyncio.to_thread(self._collect, texts, embeddings, collector.add(batch, vectors))
+                progress.update(1)
+        
+        try:
+            await asyncio.gather(*(run_batch(batch) for batch in batches))
+        finally:
+            progress.close()
+        
+        self._report_failures(texts, embeddings, collector)
         
         return embeddings
     
@@ -0,0 +1,157 @@
+"""
+Single-file index snapshot: ids, documents, metadata, embeddings and the
+prebuilt lexical index.
+
+Layout:
+  - 16-byte preamble: magic + length of the JSON header
+  - JSON header: format version, embedding signature and, per section,
+    its offset, length, dtype/shape and sha256
+  - sections, each aligned to 64 bytes so the embedding matrix can be
+    memory-mapped straight from the file
+
+Sections: "embeddings" (L2-normalized float32, N x D), "columns" (UTF-8 JSON with ids,
+documents and metadata columns) and optionally "lexical".
+"""
+
+from typing import Dict, List, Optional, Any
+from datetime import datetime, timezone
+from pathlib import Path
+import hashlib
+import json
+import os
+import struct
+
+import numpy as np
+
+
+MAGIC = b"CIMSNAP\x00"
+FORMAT_VERSION = 1
+ALIGNMENT = 64
+
+# magic, header length
+_PREAMBLE = struct.Struct("<8sQ")
+
+
+def _align(offset: int) -> int:
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def metadata_to_columns(metadatas: List[Dict]) -> Dict[str, List[Any]]:
+    keys = sorted({key for metadata in metadatas for key in metadata})
+    return {key: [metadata.get(key) for metadata in metadatas] for key in keys}
+
+
+def write_snapshot(
+    path: str,
+    ids: List[str],
+    documents: List[str],
+    metadata_columns: Dict[str, List[Any]],
+    embeddings: np.ndarray,
+    embedding_signature: Dict,
+    lexical: Optional[bytes] = None
+) -> Dict:
+    """Write a snapshot atomically and return its header."""
+    embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+
+    payloads = {
+        'embeddings': embeddings.tobytes(),
+        'columns': json.dumps(
+            {"ids": ids, "documents": documents, "metadata": metadata_columns},
+            ensure_ascii=False
+        ).encode("utf-8")
+    }
+    if lexical is not None:
+        payloads['lexical'] = lexical
+
+    sections = {}
+    relative = 0
+    for name, payload in payloads.items():
+        relative = _align(relative)
+        sections[name] = {
+            'offset': relative,
+            'length': len(payload),
+            'sha256': hashlib.sha256(payload).hexdigest()
+        }
+        relative += len(payload)
+    sections['embeddings'].update({'dtype': 'float32', 'shape': list(embeddings.shape)})
+
+    header = {
+        'format_version': FORMAT_VERSION,
+        'created_at': datetime.now(timezone.utc).isoformat(),
+        'count': len(ids),
+        'dimensions': int(embeddings.shape[1]) if embeddings.ndim == 2 else 0,
+        'embedding_signature': dict(embedding_signature),
+        'sections': sections
+    }
+
+    # Section offsets are relative to the data start, which follows the header
+    header_bytes = json.dumps(header).encode("utf-8")
+    data_start = _align(_PREAMBLE.size + len(header_bytes))
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(_PREAMBLE.pack(MAGIC, len(header_bytes)))
+        f.write(header_bytes)
+        for name, payload in payloads.items():
+            f.seek(data_start + sections[name]['offset'])
+            f.write(payload)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+    header['data_start'] = data_start
+    return header
+
+
+def read_header(path: str) -> Dict:
+    with open(path, "rb") as f:
+        magic, header_length = _PREAMBLE.unpack(f.read(_PREAMBLE.size))
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not an index snapshot")
+        header = json.loads(f.read(header_length).decode("utf-8"))
+
+    if header.get('format_version') != FORMAT_VERSION:
+        raise ValueError(f"Unsupported snapshot version {header.get('format_version')} in {path}")
+
+    header['data_start'] = _align(_PREAMBLE.size + header_length)
+    return header
+
+
+def read_section(path: str, header: Dict, name: str) -> bytes:
+    section = header['sections'][name]
+    with open(path, "rb") as f:
+        f.seek(header['data_start'] + section['offset'])
+        return f.read(section['length'])
+
+
+def map_embeddings(path: str, header: Dict) -> np.ndarray:
+    section = header['sections']['embeddings']
+    shape = tuple(section['shape'])
+    if section['length'] == 0:
+        return np.zeros(shape, dtype=np.float32)
+    return np.memmap(path, dtype=np.float32, mode="r", offset=header['data_start'] + section['offset'], shape=shape)
+
+
+def verify_snapshot(path: str) -> Dict:
+    """Check every section checksum; raises ValueError on corruption."""
+    header = read_header(path)
+    if Path(path).stat().st_size < header['data_start'] + max(
+        (s['offset'] + s['length'] for s in header['sections'].values()), default=0
+    ):
+        raise ValueError(f"Snapshot {path} is truncated")
+
+    for name, section in header['sections'].items():
+        digest = hashlib.sha256()
+        remaining = section['length']
+        with open(path, "rb") as f:
+            f.seek(header['data_start'] + section['offset'])
+            while remaining:
+                block = f.read(min(remaining, 1 << 24))
+                if not block:
+                    raise ValueError(f"Snapshot {path} is truncated")
+                digest.update(block)
+                remaining -= len(block)
+        if digest.hexdigest() != section['sha256']:
+            raise ValueError(f"Snapshot {path}: checksum mismatch in section '{name}'")
+
+    return header
@@ -0,0 +1,210 @@
+from typing import List, Dict, Optional, Any
+import os
+
+import numpy as np
+
+from .mmap_vector_store import MmapVectorStore
+from ..config import settings
+
+
+class IVFVectorStore(MmapVectorStore):
+    """
+    Approximate search with an inverted-file (IVF) index over the mmap store.
+
+    Vectors are clustered with spherical k-means; a query scores the
+    centroids, probes the `nprobe` closest lists and scores only their
+    members. More lists probed means higher recall and higher latency.
+
+    Extra files next to the mmap store:
+      - ivf_centroids.npy: (n_lists, D) normalized centroids
+      - ivf_offsets.npy: (n_lists + 1,) start of each list in ivf_rows
+      - ivf_rows.npy: row ids grouped by list
+
+    Writes (upsert, delete) assign the rows to the existing centroids.
+    k-means is retrained only on a full build (empty store) or once the
+    rows added, changed or removed since training exceed
+    `ann_retrain_drift` of the trained count.
+    """
+
+    def __init__(self, persist_directory: Optional[str] = None, nprobe: Optional[int] = None, **kwargs):
+        self.nprobe = nprobe or settings.ann_nprobe
+        super().__init__(persist_directory, **kwargs)
+
+    def _load(self):
+        super()._load()
+
+        self.centroids = None
+        self.list_offsets = None
+        self.list_rows = None
+
+        paths = [self.persist_directory / f"ivf_{name}.npy" for name in ("centroids", "offsets", "rows")]
+        if self.manifest.get("ivf", {}).get("count") == self.count() and all(p.exists() for p in paths):
+            self.centroids, self.list_offsets, self.list_rows = (np.load(p, mmap_mode="r") for p in paths)
+
+    def _write(
+        self,
+        ids: List[str],
+        documents: List[str],
+        metadata_columns: Dict[str, List[Any]],
+        embeddings: np.ndarray
+    ):
+        centroids = None if self.centroids is None else np.array(self.centroids)
+        ivf = dict(self.manifest.get("ivf", {}))
+        drift = ivf.get("drift", 0) + self._changed_rows(ids, metadata_columns)
+
+        super()._write(ids, documents, metadata_columns, embeddings)
+
+        if self.count() == 0:
+            return
+        trained_count = ivf.get("trained_count", ivf.get("count", 0))
+        if (
+            centroids is None
+            or centroids.shape[1] != self.embeddings.shape[1]
+            or drift > settings.ann_retrain_drift * trained_count
+        ):
+            self.build_index()
+        else:
+            self._save_lists(centroids, ivf.get("iterations", 0), trained_count, drift)
+
+    def _changed_rows(self, ids: List[str], metadata_columns: Dict[str, List[Any]]) -> int:
+        """Rows added, removed or with new content (by content hash) relative to the stored ones."""
+        old = dict(zip(self.ids, self.metadata_columns.get('content_hash', [None] * self.count())))
+        new = dict(zip(ids, metadata_columns.get('content_hash', [None] * len(ids))))
+
+        changed = sum(1 for chunk_id, h in new.items() if h is None or old.get(chunk_id) != h)
+        removed = sum(1 for chunk_id in old if chunk_id not in new)
+        return changed + removed
+
+    def _default_n_lists(self) -> int:
+        if settings.ann_n_lists:
+            return settings.ann_n_lists
+        return max(1, int(4 * np.sqrt(self.count())))
+
+    def _assign(self, vectors: np.ndarray, centroids: np.ndarray, block: int = 8192) -> np.ndarray:
+        labels = np.empty(len(vectors), dtype=np.int32)
+        for start in range(0, len(vectors), block):
+            labels[start:start + block] = np.argmax(vectors[start:start + block] @ centroids.T, axis=1)
+        return labels
+
+    def _train_centroids(self, n_lists: int, iterations: int) -> np.ndarray:
+        rng = np.random.default_rng(0)
+
+        sample_size = min(self.count(), max(settings.ann_train_sample, n_lists))
+        sample_rows = np.sort(rng.choice(self.count(), size=sample_size, replace=False))
+        sample = np.asarray(self.embeddings[sample_rows], dtype=np.float32)
+
+        centroids = sample[rng.choice(len(sample), size=n_lists, replace=False)].copy()
+
+        for _ in range(iterations):
+            labels = self._assign(sample, centroids)
+
+            sizes = np.bincount(labels, minlength=n_lists)
+            order = np.argsort(labels, kind="stable")
+            starts = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+            filled = np.flatnonzero(sizes)
+
+            sums = np.zeros_like(centroids)
+            sums[filled] = np.add.reduceat(sample[order], starts[filled], axis=0)
+
+            # Re-seed empty lists from random sample points
+            empty = np.flatnonzero(sizes == 0)
+            if len(empty):
+                sums[empty] = sample[rng.choice(len(sample), size=len(empty), replace=False)]
+
+            centroids = self._normalize(sums)
+
+        return centroids
+
+    def build_index(self, n_lists: Optional[int] = None, iterations: Optional[int] = None):
+
+        if self.count() == 0:
+            return
+
+        n_lists = min(n_lists or self._default_n_lists(), self.count())
+        iterations = iterations or settings.ann_train_iterations
+
+        print(f"Building IVF index: {n_lists} lists over {self.count()} vectors...")
+
+        centroids = self._train_centroids(n_lists, iterations)
+        self._save_lists(centroids, iterations, self.count(), 0)
+
+    def _save_lists(self, centroids: np.ndarray, iterations: int, trained_count: int, drift: int):
+        """Assign every row to its closest centroid and write the lists."""
+        n_lists = len(centroids)
+        labels = self._assign(self.embeddings, centroids)
+
+        list_rows = np.argsort(labels, kind="stable").astype(np.int32)
+        list_offsets = np.zeros(n_lists + 1, dtype=np.int64)
+        np.cumsum(np.bincount(labels, minlength=n_lists), out=list_offsets[1:])
+
+        for name, array in (("centroids", centroids), ("offsets", list_offsets), ("rows", list_rows)):
+            tmp_path = self.persist_directory / f"ivf_{name}.{os.getpid()}.tmp.npy"
+            np.save(tmp_path, array)
+            os.replace(tmp_path, self.persist_directory / f"ivf_{name}.npy")
+
+        # Manifest last, so readers never see a list count for files not yet in place
+        self.manifest["ivf"] = {
+            "n_lists": n_lists,
+            "iterations": iterations,
+            "count": self.count(),
+            "trained_count": trained_count,
+            "drift": drift
+        }
+        self._save_manifest()
+
+        self._load()
+
+        sizes = np.diff(list_offsets)
+        print(f" IVF lists written ({drift} rows changed since training): list sizes min {sizes.min()}, median {int(np.median(sizes))}, max {sizes.max()}")
+
+    def search(
+        self,
+        query_embedding: List[float],
+        top_k: int = 10,
+        filter_dict: Optional[Dict] = None,
+        nprobe: Optional[int] = None
+    ) -> List[Dict]:
+        return self.search_many([query_embedding], top_k=top_k, filter_dict=filter_dict, nprobe=nprobe)[0]
+
+    def search_many(
+        self,
+        query_embeddings: List[List[float]],
+        top_k: int = 10,
+        filter_dict: Optional[Dict] = None,
+        nprobe: Optional[int] = None
+    ) -> List[List[Dict]]:
+
+        # Filtered searches cover few rows, scan them exactly
+        if self.centroids is None or filter_dict or len(query_embeddings) == 0:
+            return super().search_many(query_embeddings, top_k=top_k, filter_dict=filter_dict)
+
+        queries = self._normalize(np.asarray(query_embeddings, dtype=np.float32))
+
+        nprobe = min(nprobe or self.nprobe, len(self.centroids))
+        centroid_scores = queries @ self.centroids.T
+        probed_lists = np.argpartition(-centroid_scores, nprobe - 1, axis=1)[:, :nprobe]
+
+        results = []
+        for query, probed in zip(queries, probed_lists):
+            rows = np.sort(np.concatenate([
+                self.list_rows[self.list_offsets[l]:self.list_offsets[l + 1]]
+                for l in probed
+            ]))
+            if len(rows) == 0:
+                results.append([])
+                continue
+
+            top_rows, scores = self._top_rows(query, rows, top_k)
+            results.append([self._format_result(int(row), float(score)) for row, score in zip(top_rows, scores)])
+
+        return results
+
+    def clear(self):
+        super().clear()
+        for name in ("centroids", "offsets", "rows"):
+            path = self.persist_directory / f"ivf_{name}.npy"
+            if path.exists():
+                path.unlink()
+        self.centroids = None
+        self.list_offsets = None
+        self.list_rows = None
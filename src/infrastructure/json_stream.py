@@ -0,0 +1,78 @@
+from typing import Dict, List, Optional
+import json
+import re
+
+
+class JSONArrayStreamParser:
+    """
+    Pulls complete objects out of a JSON array while the document is still
+    being streamed, e.g. each element of "suggestions" in
+    `{"suggestions": [{...}, {...}]}` as soon as its closing brace arrives.
+
+    Text is fed in arbitrary pieces (LLM token deltas). The scanner tracks
+    strings, escapes and brace depth, so braces inside string values do not
+    split objects; an element that fails to parse is skipped.
+    """
+
+    def __init__(self, key: str):
+        self._array_start = re.compile(r'"%s"\s*:\s*\[' % re.escape(key))
+        self._buffer = ""
+        self._pos: Optional[int] = None  # scan position once the array is found
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._object_start = 0
+        self.done = False
+
+    @property
+    def text(self) -> str:
+        """Everything fed so far."""
+        return self._buffer
+
+    def feed(self, text: str) -> List[Dict]:
+        """Add streamed text and return the array elements it completed."""
+        self._buffer += text
+        if self.done:
+            return []
+
+        if self._pos is None:
+            match = self._array_start.search(self._buffer)
+            if match is None:
+                return []
+            self._pos = match.end()
+
+        objects = []
+        buffer = self._buffer
+        i = self._pos
+        while i < len(buffer):
+            char = buffer[i]
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char == "{":
+                if self._depth == 0:
+                    self._object_start = i
+                self._depth += 1
+            elif char == "}":
+                self._depth -= 1
+                if self._depth == 0:
+                    try:
+                        objects.append(json.loads(buffer[self._object_start:i + 1]))
+                    except json.JSONDecodeError:
+                        pass
+            elif char == "]" and self._depth == 0:
+                self.done = True
+                i += 1
+                break
+
+            i += 1
+
+        self._pos = i
+        return objects
@@ -0,0 +1,252 @@
+from typing import Dict, List, Optional, Tuple
+from pathlib import Path
+import io
+import json
+import os
+
+import numpy as np
+
+from .pdf_processor import split_content_fields
+from .text_analyzer import get_analyzer
+from ..config import settings
+
+
+INDEX_FILENAME = "lexical_index.bin"
+
+
+def lexical_index_path(persist_directory) -> Path:
+    """Where the lexical index of a store lives: next to its vector files."""
+    return Path(persist_directory) / INDEX_FILENAME
+
+
+class LexicalIndex:
+    """
+    BM25 keyword index over the store's chunk ids.
+
+    Built once at ingestion (`build_vector_store.py`) and saved next to the
+    vector store, or shipped inside an index snapshot, so workers load it
+    instead of rebuilding it. Only ids are kept: document text stays in
+    the vector store.
+
+    Scoring is BM25F: chunks are split into fields (code, label,
+    exclusions, inclusions, instructions, notes), each field's term
+    frequency is length-normalized against that field's average and
+    weighted, and the weighted sum is saturated once with k1. A label
+    match therefore counts more than a match in an exclusion list.
+
+    Postings are stored CSR-style per integer term id:
+      - term_offsets: (V + 1,) start of each term's postings
+      - doc_ids: (P,) row of each posting
+      - weights: (P,) BM25F contribution of the term to that row, with
+        idf, field weights and length normalization folded in at build time
+
+    Documents and queries go through the shared FrenchAnalyzer (accent
+    folding, elision, stopwords, light stemming); the analyzer version is
+    stored with the index.
+
+    A query only touches the postings of its terms: scores are summed per
+    candidate row and the top k taken with `argpartition`. With a single
+    field of weight 1, scores equal rank_bm25's BM25Okapi.
+    """
+
+    FORMAT_VERSION = 3
+
+    def __init__(
+        self,
+        ids: List[str],
+        terms: List[str],
+        term_offsets: np.ndarray,
+        doc_ids: np.ndarray,
+        weights: np.ndarray,
+        field_weights: Optional[Dict[str, float]] = None,
+        analyzer_version: Optional[str] = None
+    ):
+        self.ids = ids
+        self.terms = terms
+        self.term_offsets = term_offsets
+        self.doc_ids = doc_ids
+        self.weights = weights
+        self.field_weights = dict(field_weights or {})
+        self.analyzer_version = analyzer_version or get_analyzer().VERSION
+
+        self.term_ids: Dict[str, int] = {term: i for i, term in enumerate(terms)}
+
+    @staticmethod
+    def tokenize(text: str) -> List[str]:
+        return get_analyzer().analyze(text)
+
+    @classmethod
+    def build(
+        cls,
+        ids: List[str],
+        documents: List[str],
+        field_weights: Optional[Dict[str, float]] = None,
+        k1: Optional[float] = None,
+        b: Optional[float] = None,
+        epsilon: float = 0.25
+    ) -> "LexicalIndex":
+        field_weights = dict(settings.bm25_field_weights if field_weights is None else field_weights)
+        k1 = settings.bm25_k1 if k1 is None else k1
+        b = settings.bm25_b if b is None else b
+
+        print(f"Building BM25F index over {len(documents)} documents...")
+
+        fields = list(field_weights)
+        field_ids = {name: i for i, name in enumerate(fields)}
+        n_docs = len(documents)
+
+        term_ids: Dict[str, int] = {}
+        posting_terms = []
+        posting_docs = []
+        posting_fields = []
+        posting_tfs = []
+        field_lengths = np.zeros((len(fields), n_docs), dtype=np.float32)
+
+        for row, document in enumerate(documents):
+            for name, text in split_content_fields(document).items():
+                # Fields without a weight are not indexed
+                if name not in field_ids:
+                    continue
+                field = field_ids[name]
+
+                tokens = cls.tokenize(text)
+                field_lengths[field, row] = len(tokens)
+
+                counts: Dict[int, int] = {}
+                for token in tokens:
+                    term = term_ids.setdefault(token, len(term_ids))
+                    counts[term] = counts.get(term, 0) + 1
+
+                posting_terms.extend(counts)
+                posting_docs.extend([row] * len(counts))
+                posting_fields.extend([field] * len(counts))
+                posting_tfs.extend(counts.values())
+
+        posting_terms = np.asarray(posting_terms, dtype=np.int64)
+        posting_docs = np.asarray(posting_docs, dtype=np.int64)
+        posting_fields = np.asarray(posting_fields, dtype=np.int64)
+        tfs = np.asarray(posting_tfs, dtype=np.float32)
+
+        # Per-field length normalization against the field's average over chunks that have it
+        present = field_lengths > 0
+        avg_lengths = field_lengths.sum(axis=1) / np.maximum(present.sum(axis=1), 1)
+        avg_lengths[avg_lengths == 0] = 1.0
+        norms = 1 - b + b * field_lengths / avg_lengths[:, None]
+
+        weights_by_field = np.asarray([field_weights[name] for name in fields], dtype=np.float32)
+        pseudo_tfs = weights_by_field[posting_fields] * tfs / norms[posting_fields, posting_docs]
+
+        # Merge the field postings of each (term, row) pair
+        keys = posting_terms * max(n_docs, 1) + posting_docs
+        order = np.argsort(keys, kind="stable")
+        keys = keys[order]
+        boundaries = np.ones(len(keys), dtype=bool)
+        boundaries[1:] = keys[1:] != keys[:-1]
+        starts = np.flatnonzero(boundaries)
+        pseudo_tfs = np.add.reduceat(pseudo_tfs[order], starts) if len(starts) else pseudo_tfs
+
+        merged_terms = keys[starts] // max(n_docs, 1)
+        doc_ids = (keys[starts] % max(n_docs, 1)).astype(np.int32)
+
+        n_terms = len(term_ids)
+        doc_freqs = np.bincount(merged_terms, minlength=n_terms)
+        term_offsets = np.zeros(n_terms + 1, dtype=np.int64)
+        np.cumsum(doc_freqs, out=term_offsets[1:])
+
+        # BM25Okapi idf: very common terms get a floor of epsilon * mean idf
+        idf = np.log((n_docs - doc_freqs + 0.5) / (doc_freqs + 0.5))
+        if n_terms:
+            idf[idf < 0] = epsilon * idf.mean()
+
+        weights = (idf[merged_terms] * pseudo_tfs * (k1 + 1) / (pseudo_tfs + k1)).astype(np.float32)
+
+        terms = [None] * n_terms
+        for term, i in term_ids.items():
+            terms[i] = term
+
+        return cls(list(ids), terms, term_offsets, doc_ids, weights, field_weights)
+
+    def search(self, query: str, top_k: int = 10) -> List[Tuple[int, float]]:
+        """(row, score) pairs for the best `top_k` documents containing a query term."""
+        # Repeated query tokens count once per occurrence, as in BM25Okapi
+        query_terms = [self.term_ids[t] for t in get_analyzer().analyze_query(query) if t in self.term_ids]
+        if not query_terms or top_k <= 0:
+            return []
+
+        spans = [(self.term_offsets[t], self.term_offsets[t + 1]) for t in query_terms]
+        docs = np.concatenate([self.doc_ids[start:end] for start, end in spans])
+        weights = np.concatenate([self.weights[start:end] for start, end in spans])
+
+        if len(spans) == 1:
+            candidates, scores = docs, weights
+        elif len(docs) * 8 < len(self.ids):
+            # Few postings: sort-based reduction over the candidates only
+            candidates, inverse = np.unique(docs, return_inverse=True)
+            scores = np.bincount(inverse, weights=weights)
+        else:
+            # Common terms: a dense accumulator is cheaper than sorting
+            candidates = np.flatnonzero(np.bincount(docs, minlength=len(self.ids)))
+            scores = np.bincount(docs, weights=weights, minlength=len(self.ids))[candidates]
+
+        k = min(top_k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+
+        return [(int(candidates[i]), float(scores[i])) for i in top]
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def to_bytes(self) -> bytes:
+        meta = json.dumps(
+            {
+                'format_version': self.FORMAT_VERSION,
+                'field_weights': self.field_weights,
+                'analyzer': self.analyzer_version,
+                'ids': self.ids,
+                'terms': self.terms
+            },
+            ensure_ascii=False
+        ).encode("utf-8")
+
+        buffer = io.BytesIO()
+        np.savez(
+            buffer,
+            meta=np.frombuffer(meta, dtype=np.uint8),
+            term_offsets=self.term_offsets,
+            doc_ids=self.doc_ids,
+            weights=self.weights
+        )
+        return buffer.getvalue()
+
+    def save(self, path) -> Path:
+        path = Path(path)
+        tmp_path = path.with_suffix(".tmp")
+        tmp_path.write_bytes(self.to_bytes())
+        os.replace(tmp_path, path)
+        return path
+
+    @classmethod
+    def load(cls, path) -> "LexicalIndex":
+        return cls.from_bytes(Path(path).read_bytes())
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "LexicalIndex":
+        try:
+            arrays = np.load(io.BytesIO(data), allow_pickle=False)
+            meta = json.loads(arrays['meta'].tobytes().decode("utf-8"))
+        except Exception as e:
+            raise ValueError(f"Unreadable lexical index ({e}), rebuild it") from e
+
+        if meta.get('format_version') != cls.FORMAT_VERSION:
+            raise ValueError(f"Unsupported lexical index version: {meta.get('format_version')}")
+
+        return cls(
+            meta['ids'],
+            meta['terms'],
+            arrays['term_offsets'],
+            arrays['doc_ids'],
+            arrays['weights'],
+            meta.get('field_weights'),
+            meta.get('analyzer', "unknown")
+        )
@@ -1,17 +1,47 @@
-from typing import List, Dict, Optional
-from openai import OpenAI
+from typing import AsyncIterator, List, Dict, Optional
+from openai import AsyncOpenAI
 import json
 
+from .openai_transport import create_openai_client, get_async_openai_client
+from .prompt_builder import PromptBuilder, static_prompt
 from ..config import settings
 
 
+LLM_STATUSES = ('ok', 'fallback', 'error')
+
+
+def record_llm_status(usage: Optional[Dict], status: str):
+    """
+    Keep the worst LLM outcome of a request in its usage dict: "error" (a
+    call failed) over "fallback" (an answer was unusable and retrieval
+    order was used instead) over "ok".
+    """
+    if usage is None:
+        return
+    if LLM_STATUSES.index(status) > LLM_STATUSES.index(usage.get('status', 'ok')):
+        usage['status'] = status
+
+
 class LLMClient:
     
     def __init__(self):
-        self.client = OpenAI(api_key=settings.openai_api_key)
+        # Sync and async clients share the process-wide connection pool,
+        # with OPENAI_TIMEOUT / OPENAI_MAX_RETRIES applied to every call
+        self.client = create_openai_client()
         self.model = settings.openai_model
+        self.prompt_builder = PromptBuilder(self.model)
         print(f"LLMClient initialized with model: {self.model}")
     
+    @property
+    def async_client(self) -> AsyncOpenAI:
+        return get_async_openai_client()
+    
+    def _messages(self, system_prompt: str, user_message: str) -> List[Dict]:
+        return [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_message}
+        ]
+    
     def generate_response(
         self,
         system_prompt: str,
@@ -23,10 +53,29 @@ class LLMClient:
         try:
             response = self.client.chat.completions.create(
                 model=self.model,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_message}
-                ],
+                messages=self._messages(system_prompt, user_message),
+                temperature=temperature,
+                max_tokens=max_tokens
+            )
+            
+            return response.choices[0].message.content
+            
+        except Exception as e:
+            print(f" Error generating response: {e}")
+            return f"Error: {str(e)}"
+    
+    async def generate_response_async(
+        self,
+        system_prompt: str,
+        user_message: str,
+        temperature: float = 0.3,
+        max_tokens: int = 2000
+    ) -> str:
+
+        try:
+            response = await self.async_client.chat.completions.create(
+                model=self.model,
+                messages=self._messages(system_prompt, user_message),
                 temperature=temperature,
                 max_tokens=max_tokens
             )
@@ -41,7 +90,8 @@ class LLMClient:
         self,
         system_prompt: str,
         user_message: str,
-        temperature: float = 0.2
+        temperature: float = 0.2,
+        usage: Optional[Dict] = None
     ) -> Dict:
         """
         Generate a JSON response from GPT-4.
@@ -50,46 +100,123 @@ class LLMClient:
             system_prompt: System instructions
             user_message: User query
             temperature: Sampling temperature
+            usage: Optional dict the call's token usage (and failure status) is added to
             
         Returns:
             Parsed JSON dict
         """
+        content = None
         try:
-            print(f" Calling LLM with model: {self.model}")
-            print(f"   Temperature: {temperature}")
-            print(f"   User message length: {len(user_message)} chars")
+            self._log_call(temperature, user_message)
             
             response = self.client.chat.completions.create(
                 model=self.model,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_message}
-                ],
+                messages=self._messages(system_prompt, user_message),
                 temperature=temperature,
                 response_format={"type": "json_object"}
             )
+            self._record_usage(usage, response.usage)
             
             content = response.choices[0].message.content
-            print(f" LLM response received: {len(content)} chars")
+            return self._parse_json(content)
             
-            parsed = json.loads(content)
-            print(f" JSON parsed successfully")
-            return parsed
+        except Exception as e:
+            record_llm_status(usage, 'error')
+            return self._json_error(e, content)
+    
+    async def generate_json_response_async(
+        self,
+        system_prompt: str,
+        user_message: str,
+        temperature: float = 0.2,
+        usage: Optional[Dict] = None
+    ) -> Dict:
+        """Awaitable `generate_json_response`, on the shared async connection pool."""
+        content = None
+        try:
+            self._log_call(temperature, user_message)
+            
+            response = await self.async_client.chat.completions.create(
+                model=self.model,
+                messages=self._messages(system_prompt, user_message),
+                temperature=temperature,
+                response_format={"type": "json_object"}
+            )
+            self._record_usage(usage, response.usage)
+            
+            content = response.choices[0].message.content
+            return self._parse_json(content)
             
-        except json.JSONDecodeError as e:
-            print(f" Error parsing JSON: {e}")
-            print(f"   Raw content: {content[:500]}...")
-            return {"error": "Invalid JSON response"}
         except Exception as e:
-            print(f" Error generating JSON response: {e}")
-            print(f"   Error type: {type(e).__name__}")
-            return {"error": str(e)}
+            record_llm_status(usage, 'error')
+            return self._json_error(e, content)
+    
+    async def stream_json_response_async(
+        self,
+        system_prompt: str,
+        user_message: str,
+        temperature: float = 0.2,
+        usage: Optional[Dict] = None
+    ) -> AsyncIterator[str]:
+        """Text deltas of a JSON-mode completion as they are generated; errors are raised to the caller."""
+        self._log_call(temperature, user_message)
+        
+        stream = await self.async_client.chat.completions.create(
+            model=self.model,
+            messages=self._messages(system_prompt, user_message),
+            temperature=temperature,
+            response_format={"type": "json_object"},
+            stream=True,
+            stream_options={"include_usage": True}
+        )
+        async for chunk in stream:
+            # The last chunk carries the usage and no choices
+            if chunk.usage is not None:
+                self._record_usage(usage, chunk.usage)
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+    
+    def _log_call(self, temperature: float, user_message: str):
+        print(f" Calling LLM with model: {self.model}")
+        print(f"   Temperature: {temperature}")
+        print(f"   User message length: {len(user_message)} chars")
+    
+    @staticmethod
+    def _record_usage(usage: Optional[Dict], response_usage):
+        if usage is None or response_usage is None:
+            return
+        usage['calls'] = usage.get('calls', 0) + 1
+        usage['prompt_tokens'] = usage.get('prompt_tokens', 0) + response_usage.prompt_tokens
+        usage['completion_tokens'] = usage.get('completion_tokens', 0) + response_usage.completion_tokens
+        
+        # Prompt tokens served from the provider's prompt cache (shared prefix of earlier requests)
+        details = getattr(response_usage, 'prompt_tokens_details', None)
+        cached = (getattr(details, 'cached_tokens', None) or 0) if details is not None else 0
+        usage['cached_prompt_tokens'] = usage.get('cached_prompt_tokens', 0) + cached
+        usage['uncached_prompt_tokens'] = usage['prompt_tokens'] - usage['cached_prompt_tokens']
+    
+    def _parse_json(self, content: str) -> Dict:
+        print(f" LLM response received: {len(content)} chars")
+        
+        parsed = json.loads(content)
+        print(f" JSON parsed successfully")
+        return parsed
+    
+    def _json_error(self, error: Exception, content: Optional[str]) -> Dict:
+        if isinstance(error, json.JSONDecodeError):
+            print(f" Error parsing JSON: {error}")
+            print(f"   Raw content: {(content or '')[:500]}...")
+            return {"error": "Invalid JSON response"}
+        print(f" Error generating JSON response: {error}")
+        print(f"   Error type: {type(error).__name__}")
+        return {"error": str(error)}
     
     def rerank_candidates(
         self,
         query: str,
         candidates: List[Dict],
-        top_k: int = 5
+        top_k: int = 5,
+        usage: Optional[Dict] = None
     ) -> List[Dict]:
 
         if not candidates:
@@ -98,45 +225,71 @@ class LLMClient:
         
         print(f" Re-ranking {len(candidates)} candidates...")
         
-        system_prompt = """
+        result = self.generate_json_response(*self._rerank_prompt(query, candidates, top_k), usage=usage)
+        return self._apply_rankings(result, candidates, top_k)
+    
+    async def rerank_candidates_async(
+        self,
+        query: str,
+        candidates: List[Dict],
+        top_k: int = 5,
+        usage: Optional[Dict] = None
+    ) -> List[Dict]:
+
+        if not candidates:
+            print(" No candidates to rerank")
+            return []
+        
+        print(f" Re-ranking {len(candidates)} candidates...")
+        
+        result = await self.generate_json_response_async(*self._rerank_prompt(query, candidates, top_k), usage=usage)
+        return self._apply_rankings(result, candidates, top_k)
+    
+    def _rerank_prompt(self, query: str, candidates: List[Dict], top_k: int):
+        
+        system_prompt = static_prompt(f"""
             Tu es un expert en codage médical CIM-10 avec le référentiel CoCoA.
 
             Évalue la pertinence de chaque code CIM-10 par rapport à la requête médicale.
 
             Retourne un JSON avec cette structure:
-            {
+            {{
             "rankings": [
-                {
+                {{
                 "code": "A41.0",
                 "relevance_score": 0.95,
                 "reasoning": "Correspond exactement à la description..."
-                }
+                }}
             ]
-            }
+            }}
 
             Critères d'évaluation:
             1. Correspondance sémantique avec la requête
             2. Respect des règles d'exclusion CoCoA
             3. Spécificité du code (privilégier codes précis)
             4. Contexte clinique approprié
-        """
-
-        candidates_text = "\n\n".join([
-            f"Code: {c['metadata'].get('primary_code', 'UNKNOWN')}\n"
-            f"Libellé: {c['metadata'].get('label', 'N/A')}\n"
-            f"Extrait: {c['document'][:300]}..."
-            for c in candidates[:15] 
-        ])
-        
-        user_message = f"""Requête: "{query}"
-
-            Codes candidats:
-            {candidates_text}
-
-            Classe ces codes par pertinence (top {top_k}).
-        """
 
-        result = self.generate_json_response(system_prompt, user_message)
+            Classe les codes candidats par pertinence (top {top_k}).
+        """)
+        
+        _, blocks = self.prompt_builder.pack(
+            candidates,
+            settings.prompt_rerank_budget_tokens,
+            lambda i, c, text: (
+                f"Code: {c['metadata'].get('primary_code', 'UNKNOWN')}\n"
+                f"Libellé: {c['metadata'].get('label', 'N/A')}\n"
+                f"Extrait: {text}"
+            ),
+            max_items=15,
+            max_item_tokens=settings.prompt_rerank_excerpt_tokens
+        )
+        
+        # Everything that varies per request comes after the fixed system prompt
+        user_message = f'Requête: "{query}"\n\nCodes candidats:\n' + "\n\n".join(blocks)
+        
+        return system_prompt, user_message
+    
+    def _apply_rankings(self, result: Dict, candidates: List[Dict], top_k: int) -> List[Dict]:
         
         if "error" in result:
             print(" Re-ranking failed, using original order")
@@ -0,0 +1,639 @@
+from typing import List, Dict, Optional, Any, Tuple
+from pathlib import Path
+import json
+import os
+import threading
+
+import numpy as np
+
+from .vector_store import prepare_chunks
+from .index_snapshot import read_header, read_section, map_embeddings
+from .lexical_index import LexicalIndex
+from ..domain.entities import DocumentChunk
+from ..config import settings
+
+
+class MmapVectorStore:
+    """
+    In-process exact vector store over a memory-mapped float32 matrix.
+
+    Same API as VectorStore. Files in `persist_directory`:
+      - embeddings.npy: L2-normalized float32 matrix (N, D), opened with
+        mmap_mode="r" so worker processes share the page cache
+      - columns.json: ids, documents and one value list per metadata key
+      - manifest.json: format version, dimensions and embedding signature
+
+    `search` is one matrix-vector product plus `argpartition`. Writes
+    rewrite the files and swap them in atomically, which suits a
+    read-mostly corpus.
+
+    With `quantization="int8"` and/or `coarse_dimensions` set, a compact
+    copy of the vectors (int8 codes, or the first N Matryoshka dimensions
+    renormalized) is scanned first and only the best `rescore_candidates`
+    rows are rescored against the full-precision matrix.
+
+    `MmapVectorStore.from_snapshot(path)` serves a read-only store straight
+    from an index snapshot file (see index_snapshot.py), including its
+    prebuilt lexical index.
+    """
+
+    FORMAT_VERSION = 1
+    QUANTIZATIONS = ("none", "int8")
+    # Size of one widened int8 block in the first-pass scan, small enough to stay in L2
+    SCAN_BLOCK_BYTES = 256 * 1024
+
+    def __init__(
+        self,
+        persist_directory: Optional[str] = None,
+        quantization: Optional[str] = None,
+        coarse_dimensions: Optional[int] = None,
+        rescore_candidates: Optional[int] = None,
+        snapshot_path: Optional[str] = None
+    ):
+        self.snapshot_path = snapshot_path
+        self.persist_directory = Path(persist_directory or settings.mmap_store_dir)
+        if snapshot_path is None:
+            self.persist_directory.mkdir(parents=True, exist_ok=True)
+
+        self.quantization = quantization or settings.vector_quantization
+        if self.quantization not in self.QUANTIZATIONS:
+            raise ValueError(f"Unknown vector quantization: {self.quantization}")
+        self.coarse_dimensions = settings.vector_coarse_dimensions if coarse_dimensions is None else coarse_dimensions
+        self.rescore_candidates = rescore_candidates or settings.vector_rescore_candidates
+        self._scan_buffers = threading.local()
+
+        self._load()
+
+        print(f"Vector store initialized: {self.count()} documents")
+
+    @classmethod
+    def from_snapshot(cls, snapshot_path: str, **kwargs) -> "MmapVectorStore":
+        return cls(persist_directory=str(Path(snapshot_path).parent), snapshot_path=snapshot_path, **kwargs)
+
+    def _check_writable(self):
+        if self.snapshot_path is not None:
+            raise RuntimeError(
+                f"Store is served from snapshot {self.snapshot_path} and is read-only; "
+                "import it into a store directory to modify it"
+            )
+
+    @property
+    def _embeddings_path(self) -> Path:
+        return self.persist_directory / "embeddings.npy"
+
+    @property
+    def _columns_path(self) -> Path:
+        return self.persist_directory / "columns.json"
+
+    @property
+    def _manifest_path(self) -> Path:
+        return self.persist_directory / "manifest.json"
+
+    def _save_manifest(self):
+        """Write manifest.json to a tmp file and rename it, so readers never see a partial manifest."""
+        tmp_manifest = self.persist_directory / f"manifest.json.{os.getpid()}.tmp"
+        tmp_manifest.write_text(json.dumps(self.manifest, indent=2), encoding="utf-8")
+        os.replace(tmp_manifest, self._manifest_path)
+
+    def _load_snapshot(self):
+        header = read_header(self.snapshot_path)
+        self.manifest = {
+            "format_version": self.FORMAT_VERSION,
+            "count": header["count"],
+            "dimensions": header["dimensions"],
+            "embedding_signature": header["embedding_signature"],
+            "index_version": header["created_at"]
+        }
+
+        self.lexical_index = None
+        if "lexical" in header["sections"]:
+            try:
+                self.lexical_index = LexicalIndex.from_bytes(read_section(self.snapshot_path, header, "lexical"))
+            except ValueError as e:
+                print(f" Ignoring snapshot lexical index: {e}")
+
+        columns = json.loads(read_section(self.snapshot_path, header, "columns").decode("utf-8"))
+        self._set_contents(
+            columns["ids"],
+            columns["documents"],
+            columns["metadata"],
+            map_embeddings(self.snapshot_path, header)
+        )
+
+    def _load(self):
+        if self.snapshot_path is not None:
+            self._load_snapshot()
+            return
+
+        self.lexical_index = None
+        self.manifest = {}
+        if self._manifest_path.exists():
+            self.manifest = json.loads(self._manifest_path.read_text(encoding="utf-8"))
+
+        columns = {"ids": [], "documents": [], "metadata": {}}
+        if self._columns_path.exists():
+            columns = json.loads(self._columns_path.read_text(encoding="utf-8"))
+
+        self._set_contents(
+            columns["ids"],
+            columns["documents"],
+            columns["metadata"],
+            np.load(self._embeddings_path, mmap_mode="r") if self._embeddings_path.exists() else None
+        )
+
+    def _set_contents(
+        self,
+        ids: List[str],
+        documents: List[str],
+        metadata_columns: Dict[str, List[Any]],
+        embeddings: Optional[np.ndarray]
+    ):
+        self.ids = ids
+        self.documents = documents
+        self.metadata_columns = metadata_columns
+        self.embeddings = embeddings
+        if self.embeddings is None:
+            self.embeddings = np.zeros((0, self.manifest.get("dimensions", 0)), dtype=np.float32)
+
+        self._row_by_id = {chunk_id: row for row, chunk_id in enumerate(self.ids)}
+        self._column_arrays: Dict[str, np.ndarray] = {}
+
+        self._load_coarse()
+
+    def _coarse_dims(self, full: int) -> int:
+        if 0 < self.coarse_dimensions < full:
+            return self.coarse_dimensions
+        return full
+
+    def _coarse_name(self, full: int) -> Optional[str]:
+        """File stem of the first-pass copy for `full`-dimensional vectors, None without a first pass."""
+        dims = self._coarse_dims(full)
+        if self.quantization == "none" and dims == full:
+            return None
+        return f"coarse_{self.quantization}_{dims}"
+
+    def _load_coarse(self):
+        """Map the first-pass copy written by `_write`; the read path never writes."""
+        self.coarse = None
+        self.coarse_scale = None
+
+        name = self._coarse_name(self.embeddings.shape[1])
+        if self.count() == 0 or name is None:
+            return
+
+        if self.snapshot_path is None and self.manifest.get("coarse", {}).get(name) == self.count():
+            try:
+                codes = np.load(self.persist_directory / f"{name}.npy", mmap_mode="r")
+                scale = np.load(self.persist_directory / f"{name}_scale.npy") if self.quantization == "int8" else None
+            except FileNotFoundError:
+                codes = None
+            if codes is not None and len(codes) == self.count():
+                self.coarse, self.coarse_scale = codes, scale
+                return
+
+        # Snapshots, or a store written with another first-pass configuration:
+        # keep a private copy in memory rather than rewriting shared files
+        self.coarse, self.coarse_scale = self._build_coarse(self.embeddings)
+
+    def _build_coarse(self, embeddings: np.ndarray, block: int = 16384):
+        dims = self._coarse_dims(embeddings.shape[1])
+        print(f" Building {self.quantization} first-pass vectors ({dims} dims)...")
+
+        vectors = np.empty((len(embeddings), dims), dtype=np.float32)
+        for start in range(0, len(embeddings), block):
+            vectors[start:start + block] = self._normalize(np.asarray(embeddings[start:start + block, :dims]))
+
+        if self.quantization != "int8":
+            return vectors, None
+
+        # Symmetric per-dimension scale
+        scale = np.abs(vectors).max(axis=0) / 127
+        scale[scale == 0] = 1.0
+        return np.round(vectors / scale).astype(np.int8), scale.astype(np.float32)
+
+    def _write(
+        self,
+        ids: List[str],
+        documents: List[str],
+        metadata_columns: Dict[str, List[Any]],
+        embeddings: np.ndarray
+    ):
+        self._check_writable()
+
+        # Write next to the live files, then rename: readers keep their old mapping
+        tmp_embeddings = self.persist_directory / "embeddings.tmp.npy"
+        np.save(tmp_embeddings, np.ascontiguousarray(embeddings, dtype=np.float32))
+
+        tmp_columns = self.persist_directory / "columns.json.tmp"
+        tmp_columns.write_text(
+            json.dumps({"ids": ids, "documents": documents, "metadata": metadata_columns}, ensure_ascii=False),
+            encoding="utf-8"
+        )
+
+        # First-pass copy for this store's configuration, built with the matrix
+        renames = [(tmp_embeddings, self._embeddings_path), (tmp_columns, self._columns_path)]
+        coarse_name = self._coarse_name(embeddings.shape[1]) if len(ids) and embeddings.ndim == 2 else None
+        self.manifest.pop("coarse", None)
+        if coarse_name is not None:
+            codes, scale = self._build_coarse(embeddings)
+            tmp_codes = self.persist_directory / f"{coarse_name}.{os.getpid()}.tmp.npy"
+            np.save(tmp_codes, codes)
+            renames.append((tmp_codes, self.persist_directory / f"{coarse_name}.npy"))
+            if scale is not None:
+                tmp_scale = self.persist_directory / f"{coarse_name}_scale.{os.getpid()}.tmp.npy"
+                np.save(tmp_scale, scale)
+                renames.append((tmp_scale, self.persist_directory / f"{coarse_name}_scale.npy"))
+            self.manifest["coarse"] = {coarse_name: len(ids)}
+
+        self.manifest.update({
+            "format_version": self.FORMAT_VERSION,
+            "count": len(ids),
+            "dimensions": int(embeddings.shape[1]) if embeddings.ndim == 2 else 0
+        })
+
+        # The manifest goes last: it only ever describes files already in place
+        for tmp_path, path in renames:
+            os.replace(tmp_path, path)
+        self._save_manifest()
+
+        # Copies for other configurations no longer match the matrix
+        current = {path.name for _, path in renames}
+        for path in self.persist_directory.glob("coarse_*.npy"):
+            if path.name not in current:
+                path.unlink(missing_ok=True)
+
+        self._load()
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return (vectors / norms).astype(np.float32)
+
+    def _row_metadata(self, row: int) -> Dict:
+        return {
+            key: values[row]
+            for key, values in self.metadata_columns.items()
+            if values[row] is not None
+        }
+
+    def _metadata_columns_for(
+        self,
+        metadatas: List[Dict],
+        existing_rows: int,
+        base: Optional[Dict[str, List[Any]]] = None
+    ) -> Dict[str, List[Any]]:
+        base = self.metadata_columns if base is None else base
+        columns = {key: list(values) for key, values in base.items()}
+        keys = set(columns) | {key for metadata in metadatas for key in metadata}
+
+        for key in keys:
+            column = columns.setdefault(key, [None] * existing_rows)
+            column.extend(metadata.get(key) for metadata in metadatas)
+
+        return columns
+
+    def get_embedding_signature(self) -> Dict:
+        return dict(self.manifest.get("embedding_signature", {}))
+
+    def set_embedding_signature(self, signature: Dict):
+        self._check_writable()
+        self.manifest["embedding_signature"] = dict(signature)
+        self._save_manifest()
+
+    def get_index_version(self) -> str:
+        return str(self.manifest.get("index_version", ""))
+
+    def set_index_version(self, version: str):
+        self._check_writable()
+        self.manifest["index_version"] = version
+        self._save_manifest()
+
+    def add_chunks(self, chunks: List[DocumentChunk], embeddings: List[List[float]]):
+
+        if len(chunks) != len(embeddings):
+            raise ValueError(f"Mismatch: {len(chunks)} chunks but {len(embeddings)} embeddings")
+
+        print(f"Adding {len(chunks)} chunks to vector store...")
+
+        ids, documents, metadatas, embeddings_clean = prepare_chunks(chunks, embeddings)
+
+        new_rows = [i for i, chunk_id in enumerate(ids) if chunk_id not in self._row_by_id]
+        if len(new_rows) < len(ids):
+            print(f" Skipped {len(ids) - len(new_rows)} chunk IDs already in the store")
+
+        if not new_rows:
+            print(f" Added 0 chunks. Total in store: {self.count()}")
+            return
+
+        new_vectors = self._normalize(np.asarray([embeddings_clean[i] for i in new_rows], dtype=np.float32))
+        if self.count() and new_vectors.shape[1] != self.embeddings.shape[1]:
+            raise ValueError(
+                f"Embedding dimension {new_vectors.shape[1]} does not match store dimension {self.embeddings.shape[1]}"
+            )
+
+        all_vectors = np.concatenate([np.asarray(self.embeddings), new_vectors]) if self.count() else new_vectors
+
+        self._write(
+            self.ids + [ids[i] for i in new_rows],
+            self.documents + [documents[i] for i in new_rows],
+            self._metadata_columns_for([metadatas[i] for i in new_rows], self.count()),
+            all_vectors
+        )
+
+        print(f" Added {len(new_rows)} chunks. Total in store: {self.count()}")
+
+    def get_content_keys(self) -> Dict[str, Tuple[str, Optional[int]]]:
+        """(content key, page number) per chunk id; the key is "" for chunks stored before keys."""
+        keys = self.metadata_columns.get('content_key', [None] * self.count())
+        pages = self.metadata_columns.get('page_number', [None] * self.count())
+        return {chunk_id: (key or "", page) for chunk_id, key, page in zip(self.ids, keys, pages)}
+
+    def update_page_numbers(self, pages: Dict[str, int]):
+        """Set the page number of stored chunks in place; text and vectors are unchanged."""
+        rows = {self._row_by_id[chunk_id]: page for chunk_id, page in pages.items() if chunk_id in self._row_by_id}
+        if not rows:
+            return
+
+        columns = {key: list(values) for key, values in self.metadata_columns.items()}
+        column = columns.setdefault('page_number', [None] * self.count())
+        for row, page in rows.items():
+            column[row] = page
+
+        self._write(self.ids, self.documents, columns, np.asarray(self.embeddings, dtype=np.float32))
+
+        print(f" Updated the page number of {len(rows)} chunks")
+
+    def upsert_chunks(self, chunks: List[DocumentChunk], embeddings: List[List[float]]):
+        """Insert new chunks and overwrite stored chunks with the same id, in one rewrite."""
+        if len(chunks) != len(embeddings):
+            raise ValueError(f"Mismatch: {len(chunks)} chunks but {len(embeddings)} embeddings")
+
+        ids, documents, metadatas, embeddings_clean = prepare_chunks(chunks, embeddings)
+        if not ids:
+            return
+
+        vectors = self._normalize(np.asarray(embeddings_clean, dtype=np.float32))
+        if self.count() and vectors.shape[1] != self.embeddings.shape[1]:
+            raise ValueError(
+                f"Embedding dimension {vectors.shape[1]} does not match store dimension {self.embeddings.shape[1]}"
+            )
+
+        replaced = [(i, self._row_by_id[chunk_id]) for i, chunk_id in enumerate(ids) if chunk_id in self._row_by_id]
+        new_rows = [i for i, chunk_id in enumerate(ids) if chunk_id not in self._row_by_id]
+
+        all_vectors = np.array(self.embeddings, dtype=np.float32)
+        all_documents = list(self.documents)
+        columns = {key: list(values) for key, values in self.metadata_columns.items()}
+
+        for i, row in replaced:
+            all_vectors[row] = vectors[i]
+            all_documents[row] = documents[i]
+            for key in set(columns) | set(metadatas[i]):
+                columns.setdefault(key, [None] * self.count())[row] = metadatas[i].get(key)
+
+        if new_rows:
+            columns = self._metadata_columns_for([metadatas[i] for i in new_rows], self.count(), base=columns)
+            all_vectors = np.concatenate([all_vectors, vectors[new_rows]]) if self.count() else vectors[new_rows]
+
+        self._write(
+            self.ids + [ids[i] for i in new_rows],
+            all_documents + [documents[i] for i in new_rows],
+            columns,
+            all_vectors
+        )
+
+        print(f" Upserted {len(ids)} chunks ({len(replaced)} replaced). Total in store: {self.count()}")
+
+    def delete_chunks(self, chunk_ids: List[str]):
+        doomed = {self._row_by_id[chunk_id] for chunk_id in chunk_ids if chunk_id in self._row_by_id}
+        if not doomed:
+            return
+
+        keep = np.array([row for row in range(self.count()) if row not in doomed], dtype=np.int64)
+
+        self._write(
+            [self.ids[row] for row in keep],
+            [self.documents[row] for row in keep],
+            {key: [values[row] for row in keep] for key, values in self.metadata_columns.items()},
+            np.asarray(self.embeddings[keep], dtype=np.float32).reshape(len(keep), self.embeddings.shape[1])
+        )
+
+        print(f" Deleted {len(doomed)} chunks. Total in store: {self.count()}")
+
+    def _column_array(self, key: str) -> np.ndarray:
+        if key not in self._column_arrays:
+            values = self.metadata_columns.get(key, [None] * self.count())
+            array = np.empty(len(values), dtype=object)
+            array[:] = values
+            self._column_arrays[key] = array
+        return self._column_arrays[key]
+
+    def _where_mask(self, where: Dict) -> np.ndarray:
+        """Evaluate the subset of Chroma's `where` syntax this repo uses."""
+        mask = np.ones(self.count(), dtype=bool)
+
+        for key, condition in where.items():
+            if key == "$and":
+                for sub in condition:
+                    mask &= self._where_mask(sub)
+                continue
+            if key == "$or":
+                any_mask = np.zeros(self.count(), dtype=bool)
+                for sub in condition:
+                    any_mask |= self._where_mask(sub)
+                mask &= any_mask
+                continue
+
+            column = self._column_array(key)
+            if not isinstance(condition, dict):
+                condition = {"$eq": condition}
+
+            for op, value in condition.items():
+                if op == "$eq":
+                    mask &= column == value
+                elif op == "$ne":
+                    mask &= column != value
+                elif op == "$in":
+                    mask &= np.isin(column, list(value))
+                elif op == "$nin":
+                    mask &= ~np.isin(column, list(value))
+                else:
+                    raise ValueError(f"Unsupported filter operator: {op}")
+
+        return mask
+
+    def _filter_rows(self, filter_dict: Optional[Dict]) -> Optional[np.ndarray]:
+        if not filter_dict:
+            return None
+        return np.flatnonzero(self._where_mask(filter_dict))
+
+    def _format_result(self, row: int, score: float) -> Dict:
+        return {
+            'id': self.ids[row],
+            'document': self.documents[row],
+            'metadata': self._row_metadata(row),
+            'distance': 1 - score,
+            'similarity': score
+        }
+
+    @staticmethod
+    def _top_indices(scores: np.ndarray, k: int) -> np.ndarray:
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        return top[np.argsort(-scores[top])]
+
+    def _coarse_scores_many(self, queries: np.ndarray, rows: Optional[np.ndarray], block: Optional[int] = None) -> np.ndarray:
+        """(rows, M) first-pass scores for a (M, D) query matrix."""
+        coarse_queries = self._normalize(queries[:, :self.coarse.shape[1]])
+        source = self.coarse if rows is None else self.coarse[rows]
+
+        if self.coarse_scale is None:
+            return source @ coarse_queries.T
+
+        # Codes are widened one block at a time into a per-thread float32
+        # buffer that is reused across blocks and queries
+        coarse_queries = (coarse_queries * self.coarse_scale).T
+        block = block or max(64, self.SCAN_BLOCK_BYTES // (4 * source.shape[1]))
+        buffer = getattr(self._scan_buffers, "buffer", None)
+        if buffer is None or buffer.shape != (block, source.shape[1]):
+            buffer = np.empty((block, source.shape[1]), dtype=np.float32)
+            self._scan_buffers.buffer = buffer
+
+        scores = np.empty((len(source), coarse_queries.shape[1]), dtype=np.float32)
+        for start in range(0, len(source), block):
+            stop = min(start + block, len(source))
+            widened = buffer[:stop - start]
+            np.copyto(widened, source[start:stop], casting="unsafe")
+            np.matmul(widened, coarse_queries, out=scores[start:stop])
+        return scores
+
+    def _top_rows(self, query: np.ndarray, rows: Optional[np.ndarray], top_k: int):
+        """Best rows among `rows` (all rows if None) and their full-precision scores."""
+        return self._top_rows_many(query[None, :], rows, top_k)[0]
+
+    def _top_rows_many(self, queries: np.ndarray, rows: Optional[np.ndarray], top_k: int, block: int = 64):
+        """`_top_rows` for a (M, D) query matrix; queries are scored `block` at a time."""
+        top_rows = []
+        for start in range(0, len(queries), block):
+            batch = queries[start:start + block]
+
+            if self.coarse is None:
+                scores = (self.embeddings if rows is None else self.embeddings[rows]) @ batch.T
+                for column in scores.T:
+                    top = self._top_indices(column, top_k)
+                    top_rows.append(((top if rows is None else rows[top]), column[top]))
+                continue
+
+            coarse_scores = self._coarse_scores_many(batch, rows)
+            for query, column in zip(batch, coarse_scores.T):
+                shortlist = self._top_indices(column, max(top_k, self.rescore_candidates))
+                shortlist_rows = np.sort(shortlist if rows is None else rows[shortlist])
+
+                scores = self.embeddings[shortlist_rows] @ query
+                top = self._top_indices(scores, top_k)
+                top_rows.append((shortlist_rows[top], scores[top]))
+
+        return top_rows
+
+    def search(
+        self,
+        query_embedding: List[float],
+        top_k: int = 10,
+        filter_dict: Optional[Dict] = None
+    ) -> List[Dict]:
+        return self.search_many([query_embedding], top_k=top_k, filter_dict=filter_dict)[0]
+
+    def search_many(
+        self,
+        query_embeddings: List[List[float]],
+        top_k: int = 10,
+        filter_dict: Optional[Dict] = None
+    ) -> List[List[Dict]]:
+        """One result list per query embedding, scored as matrix-matrix products."""
+        if self.count() == 0 or len(query_embeddings) == 0:
+            return [[] for _ in query_embeddings]
+
+        queries = self._normalize(np.asarray(query_embeddings, dtype=np.float32))
+
+        rows = self._filter_rows(filter_dict)
+        if rows is not None and len(rows) == 0:
+            return [[] for _ in query_embeddings]
+
+        return [
+            [self._format_result(int(row), float(score)) for row, score in zip(top_rows, scores)]
+            for top_rows, scores in self._top_rows_many(queries, rows, top_k)
+        ]
+
+    def get_by_code(self, code: str) -> Optional[Dict]:
+
+        rows = self._filter_rows({"primary_code": code})
+        if rows is None or len(rows) == 0:
+            return None
+
+        row = int(rows[0])
+        return {
+            'id': self.ids[row],
+            'document': self.documents[row],
+            'metadata': self._row_metadata(row)
+        }
+
+    def get_by_codes(self, codes: List[str]) -> List[Dict]:
+        """All chunks whose primary code is in `codes`."""
+        if not codes:
+            return []
+
+        rows = self._filter_rows({"primary_code": {"$in": list(codes)}})
+        return [
+            {'id': self.ids[row], 'document': self.documents[row], 'metadata': self._row_metadata(row)}
+            for row in rows
+        ]
+
+    def get_ids(self) -> List[str]:
+        return list(self.ids)
+
+    def get_by_ids(self, chunk_ids: List[str]) -> List[Dict]:
+        """Documents and metadata for `chunk_ids`, in the same order (missing ids skipped)."""
+        return [
+            {
+                'id': chunk_id,
+                'document': self.documents[self._row_by_id[chunk_id]],
+                'metadata': self._row_metadata(self._row_by_id[chunk_id])
+            }
+            for chunk_id in chunk_ids
+            if chunk_id in self._row_by_id
+        ]
+
+    def get_all(self, include_embeddings: bool = False) -> Dict:
+        results = {
+            'ids': list(self.ids),
+            'documents': list(self.documents),
+            'metadatas': [self._row_metadata(row) for row in range(self.count())]
+        }
+        if include_embeddings:
+            results['embeddings'] = np.asarray(self.embeddings, dtype=np.float32)
+        return results
+
+    def import_records(self, ids: List[str], documents: List[str], metadatas: List[Dict], embeddings: np.ndarray):
+        """Replace the store contents with already prepared records (snapshot import)."""
+        self._write(
+            list(ids),
+            list(documents),
+            self._metadata_columns_for(metadatas, 0, base={}),
+            self._normalize(np.asarray(embeddings, dtype=np.float32))
+        )
+        print(f" Imported {self.count()} records")
+
+    def count(self) -> int:
+        return len(self.ids)
+
+    def clear(self):
+        self._check_writable()
+        for path in [self._embeddings_path, self._columns_path, *self.persist_directory.glob("coarse_*.npy")]:
+            if path.exists():
+                path.unlink()
+
+        self.manifest = {"format_version": self.FORMAT_VERSION}
+        self._save_manifest()
+        self._set_contents([], [], {}, None)
+        print("Vector store cleared")
@@ -0,0 +1,108 @@
+"""
+Shared HTTP transport for every OpenAI client in the process.
+
+LLM and embedding clients reuse one tuned httpx connection pool (keep-alive,
+bounded connections, explicit connect/read/write/pool timeouts) instead of
+each opening its own. Sync clients share one `httpx.Client`; async clients
+share one `httpx.AsyncClient` per event loop, since async connections are
+bound to the loop that opened them.
+"""
+
+from typing import Dict, Optional
+import asyncio
+import threading
+import weakref
+
+import httpx
+from openai import OpenAI, AsyncOpenAI
+
+from ..config import settings
+
+
+_lock = threading.Lock()
+_http_client: Optional[httpx.Client] = None
+_async_http_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+_async_openai_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[int, AsyncOpenAI]]" = weakref.WeakKeyDictionary()
+
+
+def _timeout() -> httpx.Timeout:
+    return httpx.Timeout(
+        settings.openai_timeout,
+        connect=settings.openai_connect_timeout,
+        pool=settings.openai_pool_timeout
+    )
+
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=settings.openai_max_connections,
+        max_keepalive_connections=settings.openai_max_keepalive_connections,
+        keepalive_expiry=settings.openai_keepalive_expiry
+    )
+
+
+def _retries(max_retries: Optional[int]) -> int:
+    return settings.openai_max_retries if max_retries is None else max_retries
+
+
+def get_http_client() -> httpx.Client:
+    global _http_client
+    with _lock:
+        if _http_client is None:
+            _http_client = httpx.Client(timeout=_timeout(), limits=_limits())
+        return _http_client
+
+
+def get_async_http_client() -> httpx.AsyncClient:
+    """Pooled async client of the running event loop."""
+    loop = asyncio.get_running_loop()
+    with _lock:
+        client = _async_http_clients.get(loop)
+        if client is None:
+            client = httpx.AsyncClient(timeout=_timeout(), limits=_limits())
+            _async_http_clients[loop] = client
+        return client
+
+
+def create_openai_client(max_retries: Optional[int] = None) -> OpenAI:
+    """
+    Sync OpenAI client on the shared pool. The SDK retries connection errors,
+    429 and 5xx with exponential backoff, `OPENAI_MAX_RETRIES` times unless
+    the caller handles retries itself (max_retries=0).
+    """
+    return OpenAI(
+        api_key=settings.openai_api_key,
+        http_client=get_http_client(),
+        timeout=_timeout(),
+        max_retries=_retries(max_retries)
+    )
+
+
+def get_async_openai_client(max_retries: Optional[int] = None) -> AsyncOpenAI:
+    """AsyncOpenAI client of the running event loop, on that loop's shared pool."""
+    loop = asyncio.get_running_loop()
+    retries = _retries(max_retries)
+    http_client = get_async_http_client()
+
+    with _lock:
+        clients = _async_openai_clients.setdefault(loop, {})
+        client = clients.get(retries)
+        if client is None:
+            client = AsyncOpenAI(
+                api_key=settings.openai_api_key,
+                http_client=http_client,
+                timeout=_timeout(),
+                max_retries=retries
+            )
+            clients[retries] = client
+        return client
+
+
+async def aclose():
+    """Close the running loop's async pool (FastAPI shutdown)."""
+    loop = asyncio.get_running_loop()
+    with _lock:
+        client = _async_http_clients.pop(loop, None)
+        _async_openai_clients.pop(loop, None)
+    if client is not None:
+        await client.aclose()
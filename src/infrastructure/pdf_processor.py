@@ -22,6 +22,44 @@ class CodeBlock:
     chapter: Optional[str] = None
 
 
+# Section headers of code chunk contents, in the order they are written
+CONTENT_SECTIONS = {
+    "exclusions": "À l'exclusion de:",
+    "inclusions": "Comprend:",
+    "instructions": "Instructions de codage:",
+    "notes": "Notes:",
+}
+
+
+def split_content_fields(content: str) -> Dict[str, str]:
+    """
+    Split a code chunk's content back into its fields: code, label,
+    exclusions, inclusions, instructions and notes. Content that does not
+    follow the code chunk layout (general rules) is returned as "body".
+    """
+    lines = content.split("\n")
+    if not lines or not lines[0].startswith("Code: "):
+        return {"body": content}
+
+    headers = {header: name for name, header in CONTENT_SECTIONS.items()}
+    fields: Dict[str, List[str]] = {"code": [lines[0][len("Code: "):]]}
+    current = "label"
+
+    for line in lines[1:]:
+        stripped = line.strip()
+        if stripped in headers:
+            current = headers[stripped]
+            continue
+        if current == "label" and stripped.startswith("Libellé: "):
+            stripped = stripped[len("Libellé: "):]
+        if stripped.startswith("• "):
+            stripped = stripped[2:]
+        if stripped:
+            fields.setdefault(current, []).append(stripped)
+
+    return {name: "\n".join(values) for name, values in fields.items()}
+
+
 class CoCoAPDFProcessor:
     
     CODE_PATTERN = r'\b([A-Z]\d{2}\.?\d?)\b'
@@ -333,19 +371,19 @@ class CoCoAPDFProcessor:
                 ]
 
                 if exclusions:
-                    content_parts.append("\nÀ l'exclusion de:")
+                    content_parts.append("\n" + CONTENT_SECTIONS["exclusions"])
                     content_parts.extend([f"  • {excl}" for excl in exclusions])
 
                 if inclusions:
-                    content_parts.append("\nComprend:")
+                    content_parts.append("\n" + CONTENT_SECTIONS["inclusions"])
                     content_parts.extend([f"  • {incl}" for incl in inclusions])
 
                 if instructions:
-                    content_parts.append("\nInstructions de codage:")
+                    content_parts.append("\n" + CONTENT_SECTIONS["instructions"])
                     content_parts.extend([f"  • {instr}" for instr in instructions])
 
                 if notes:
-                    content_parts.append("\nNotes:")
+                    content_parts.append("\n" + CONTENT_SECTIONS["notes"])
                     content_parts.extend([f"  • {note}" for note in notes])
 
                 content = "\n".join(content_parts)
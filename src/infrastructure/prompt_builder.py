@@ -0,0 +1,82 @@
+from typing import Callable, Dict, List, Optional, Tuple
+import textwrap
+
+from .token_counter import TokenCounter
+from ..config import settings
+
+
+def static_prompt(text: str) -> str:
+    """
+    Instruction text without its source indentation. Prompts start with this
+    fixed part so every request shares the same leading bytes, which is what
+    provider-side prompt caching matches on.
+    """
+    return textwrap.dedent(text).strip()
+
+
+class PromptBuilder:
+    """
+    Packs retrieved chunks into a prompt under a token budget.
+
+    Chunk sizes come from the `token_count` stored in their metadata at
+    ingestion; chunks from older stores are counted on the fly. Only chunks
+    that must be cut are encoded.
+    """
+
+    def __init__(self, model: Optional[str] = None):
+        self.counter = TokenCounter(model or settings.openai_model)
+
+    def count(self, text: str) -> int:
+        return self.counter.count(text)
+
+    def document_tokens(self, candidate: Dict) -> int:
+        token_count = (candidate.get('metadata') or {}).get('token_count')
+        if isinstance(token_count, int) and token_count > 0:
+            return token_count
+        return self.counter.count(candidate['document'])
+
+    def pack(
+        self,
+        candidates: List[Dict],
+        budget: int,
+        render: Callable[[int, Dict, str], str],
+        max_items: Optional[int] = None,
+        max_item_tokens: Optional[int] = None
+    ) -> Tuple[List[Dict], List[str]]:
+        """
+        (packed candidates, rendered blocks), in candidate order.
+
+        `render(position, candidate, text)` formats one block around the
+        (possibly cut) document text. Documents longer than `max_item_tokens`
+        are cut to it; a block that does not fit the remaining budget is
+        skipped, except the first one, which is cut to fit but keeps at least
+        `prompt_min_excerpt_tokens` of text even when the block overhead alone
+        exceeds the budget.
+        """
+        packed, blocks = [], []
+        used = 0
+
+        for candidate in candidates[:max_items]:
+            text = candidate['document']
+            n_tokens = self.document_tokens(candidate)
+            if max_item_tokens and n_tokens > max_item_tokens:
+                text, n_tokens = self.counter.truncate(text, max_item_tokens), max_item_tokens
+
+            overhead = self.counter.count(render(len(blocks), candidate, ""))
+            remaining = budget - used - overhead
+            if n_tokens > remaining:
+                if blocks:
+                    continue
+                # The best candidate is always sent, cut to the budget
+                n_tokens = max(remaining, min(n_tokens, settings.prompt_min_excerpt_tokens))
+                text = self.counter.truncate(text, n_tokens)
+
+            blocks.append(render(len(blocks), candidate, text))
+            packed.append(candidate)
+            used += overhead + n_tokens
+
+        if len(packed) < len(candidates[:max_items]):
+            print(f" Prompt budget: packed {len(packed)}/{len(candidates[:max_items])} candidates "
+                  f"into {used}/{budget} tokens")
+
+        return packed, blocks
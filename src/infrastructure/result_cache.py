@@ -0,0 +1,228 @@
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+from pathlib import Path
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+from ..config import settings
+
+
+class MemoryTier:
+    """In-process LRU with a per-entry TTL."""
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Dict]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Dict):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.time() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SqliteTier:
+    """Shared tier for workers on one host: a SQLite file with expiry times."""
+
+    def __init__(self, path: str, ttl: float):
+        self.path = path
+        self.ttl = ttl
+
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS results (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                expires_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_results_expires_at ON results(expires_at)")
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM results WHERE key = ? AND expires_at >= ?",
+                (key, time.time())
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set(self, key: str, value: Dict):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO results (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value, ensure_ascii=False), now + self.ttl)
+            )
+            self._conn.execute("DELETE FROM results WHERE expires_at < ?", (now,))
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM results")
+            self._conn.commit()
+
+
+class RedisTier:
+    """
+    Shared tier across hosts, for any Redis-protocol server (Redis, Valkey,
+    or a local redis-server / KeyDB as a stand-in during development).
+    Expiry is left to the server.
+    """
+
+    PREFIX = "cim10:result:"
+
+    def __init__(self, url: str, ttl: float):
+        import redis  # optional dependency, only needed for this tier
+
+        self.ttl = ttl
+        self._client = redis.Redis.from_url(url, socket_timeout=0.5)
+
+    def get(self, key: str) -> Optional[Dict]:
+        value = self._client.get(self.PREFIX + key)
+        return json.loads(value) if value else None
+
+    def set(self, key: str, value: Dict):
+        self._client.set(self.PREFIX + key, json.dumps(value, ensure_ascii=False), ex=max(int(self.ttl), 1))
+
+    def clear(self):
+        keys = list(self._client.scan_iter(match=self.PREFIX + "*", count=1000))
+        for i in range(0, len(keys), 1000):
+            self._client.delete(*keys[i:i + 1000])
+
+
+class ResultCache:
+    """
+    Two-tier cache of serialized query results.
+
+    Lookups try the in-process LRU first, then the shared tier (SQLite file or
+    Redis), and promote shared hits into memory. Keys are hashes of the
+    canonical query, request options and the index version, so a rebuilt index
+    never serves results computed on the previous one; `clear()` also purges
+    the shared tier after a rebuild. Shared-tier errors are logged and treated
+    as misses: the cache never fails a request.
+    """
+
+    def __init__(
+        self,
+        max_entries: Optional[int] = None,
+        ttl: Optional[float] = None,
+        shared_backend: Optional[str] = None,
+        shared_ttl: Optional[float] = None
+    ):
+        self.memory = MemoryTier(
+            settings.result_cache_max_entries if max_entries is None else max_entries,
+            settings.result_cache_ttl if ttl is None else ttl
+        )
+        self.shared = self._create_shared_tier(
+            settings.result_cache_shared_backend if shared_backend is None else shared_backend,
+            settings.result_cache_shared_ttl if shared_ttl is None else shared_ttl
+        )
+
+        self.memory_hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _create_shared_tier(backend: str, ttl: float):
+        backend = (backend or "none").lower()
+        if backend == "none":
+            return None
+        if backend == "sqlite":
+            return SqliteTier(settings.result_cache_path, ttl)
+        if backend == "redis":
+            try:
+                return RedisTier(settings.result_cache_redis_url, ttl)
+            except ImportError:
+                print(" Result cache: 'redis' package not installed, shared tier disabled")
+                return None
+        raise ValueError(f"Unknown result cache backend: {backend} (expected none, sqlite or redis)")
+
+    @staticmethod
+    def make_key(canonical_query: str, index_version: str, **options: Any) -> str:
+        payload = json.dumps(
+            {"query": canonical_query, "index": index_version, "options": options},
+            sort_keys=True,
+            ensure_ascii=False
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> tuple:
+        """(value, tier) with tier "memory" or "shared", or (None, None) on a miss."""
+        value = self.memory.get(key)
+        if value is not None:
+            self.memory_hits += 1
+            return value, "memory"
+
+        if self.shared is not None:
+            try:
+                value = self.shared.get(key)
+            except Exception as e:
+                print(f" Result cache read failed: {e}")
+                value = None
+            if value is not None:
+                self.memory.set(key, value)
+                self.shared_hits += 1
+                return value, "shared"
+
+        self.misses += 1
+        return None, None
+
+    def set(self, key: str, value: Dict):
+        self.memory.set(key, value)
+        if self.shared is not None:
+            try:
+                self.shared.set(key, value)
+            except Exception as e:
+                print(f" Result cache write failed: {e}")
+
+    def clear(self):
+        self.memory.clear()
+        if self.shared is not None:
+            self.shared.clear()
+        print("Result cache cleared")
+
+    def stats(self) -> Dict:
+        lookups = self.memory_hits + self.shared_hits + self.misses
+        return {
+            'memory_entries': len(self.memory),
+            'shared_backend': type(self.shared).__name__ if self.shared is not None else None,
+            'memory_hits': self.memory_hits,
+            'shared_hits': self.shared_hits,
+            'misses': self.misses,
+            'hit_rate': (self.memory_hits + self.shared_hits) / lookups if lookups else 0.0
+        }
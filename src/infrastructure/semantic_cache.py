@@ -0,0 +1,121 @@
+from typing import Dict, Hashable, List, Optional, Tuple
+import threading
+import time
+
+import numpy as np
+
+from ..config import settings
+
+
+class SemanticResultCache:
+    """
+    Near-duplicate query cache: "dyspnée d'effort" and "essoufflement à
+    l'effort" can share one answer.
+
+    Embeddings of recently answered queries are kept, L2-normalized, in a
+    fixed-size matrix used as a ring buffer (the oldest entry is overwritten
+    when full). A lookup is one matrix-vector product; the best entry whose
+    options match (index version, top_k, mentioned codes...) and that has not
+    expired is a hit when its cosine similarity reaches `threshold`.
+
+    The best similarity of every lookup is recorded in a histogram, to tune
+    the threshold on real traffic.
+    """
+
+    HISTOGRAM_EDGES = (0.80, 0.85, 0.90, 0.93, 0.95, 0.97, 0.99)
+
+    def __init__(
+        self,
+        dimensions: int,
+        max_entries: Optional[int] = None,
+        threshold: Optional[float] = None,
+        ttl: Optional[float] = None
+    ):
+        self.max_entries = settings.semantic_cache_max_entries if max_entries is None else max_entries
+        self.threshold = settings.semantic_cache_threshold if threshold is None else threshold
+        self.ttl = settings.semantic_cache_ttl if ttl is None else ttl
+
+        self._embeddings = np.zeros((self.max_entries, dimensions), dtype=np.float32)
+        self._options: List[Optional[Hashable]] = [None] * self.max_entries
+        self._values: List[Optional[Dict]] = [None] * self.max_entries
+        self._expires_at = np.zeros(self.max_entries, dtype=np.float64)
+        self._next = 0
+        self._size = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self._histogram = np.zeros(len(self.HISTOGRAM_EDGES) + 1, dtype=np.int64)
+
+    @staticmethod
+    def _unit(embedding) -> Optional[np.ndarray]:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        # Zero vectors are embedding failures
+        if norm == 0:
+            return None
+        return vector / norm
+
+    def get(self, embedding, options: Hashable) -> Tuple[Optional[Dict], Optional[float]]:
+        """(value, similarity) of the closest live entry with the same options, or (None, None)."""
+        query = self._unit(embedding)
+        if query is None or self.max_entries <= 0:
+            return None, None
+
+        with self._lock:
+            best_row, best_similarity = None, None
+            if self._size:
+                similarities = self._embeddings[:self._size] @ query
+                live = self._expires_at[:self._size] >= time.time()
+                for row in np.argsort(-similarities):
+                    if live[row] and self._options[row] == options:
+                        best_row, best_similarity = int(row), float(similarities[row])
+                        break
+
+            self._histogram[np.searchsorted(self.HISTOGRAM_EDGES, best_similarity or 0.0, side="right")] += 1
+
+            if best_row is not None and best_similarity >= self.threshold:
+                self.hits += 1
+                return self._values[best_row], best_similarity
+
+            self.misses += 1
+            return None, best_similarity
+
+    def set(self, embedding, options: Hashable, value: Dict):
+        vector = self._unit(embedding)
+        if vector is None or self.max_entries <= 0:
+            return
+
+        with self._lock:
+            row = self._next
+            self._embeddings[row] = vector
+            self._options[row] = options
+            self._values[row] = value
+            self._expires_at[row] = time.time() + self.ttl
+
+            self._next = (row + 1) % self.max_entries
+            self._size = min(self._size + 1, self.max_entries)
+
+    def clear(self):
+        with self._lock:
+            self._options = [None] * self.max_entries
+            self._values = [None] * self.max_entries
+            self._expires_at[:] = 0
+            self._next = 0
+            self._size = 0
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        labels = [f"<{self.HISTOGRAM_EDGES[0]:.2f}"] + [
+            f"{low:.2f}-{high:.2f}" for low, high in zip(self.HISTOGRAM_EDGES, self.HISTOGRAM_EDGES[1:])
+        ] + [f">={self.HISTOGRAM_EDGES[-1]:.2f}"]
+
+        return {
+            'entries': self._size,
+            'max_entries': self.max_entries,
+            'threshold': self.threshold,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'similarity_histogram': dict(zip(labels, self._histogram.tolist()))
+        }
@@ -0,0 +1,112 @@
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+import re
+import sys
+import unicodedata
+
+
+FRENCH_STOPWORDS = frozenset("""
+a au aux avec ce ces cet cette dans de des du elle en et eux il ils je la le les leur leurs
+lui ma mais me meme mes moi mon ne nos notre nous on ou par pas pour qu que qui sa se ses
+son sur ta te tes toi ton tu un une vos votre vous c d j l m n s t y ete etre est sont
+a ai as avons avez ont avait etait sans sous chez entre vers lors dont ou si car donc ni
+""".split())
+
+# l'asthme, d'origine, qu'il, jusqu'a...
+ELISION_PATTERN = re.compile(r"\b(?:l|d|j|m|n|s|t|c|qu|jusqu|lorsqu|puisqu|quoiqu)['’]")
+
+# CIM-10 codes stay one token: "a41.0" (plus its category "a41")
+TOKEN_PATTERN = re.compile(r"[a-z]\d{2}(?:\.\d{1,2})?(?![\w])|\w+")
+CODE_TOKEN = re.compile(r"[a-z]\d{2}(?:\.\d{1,2})?")
+
+
+class FrenchAnalyzer:
+    """
+    Text analysis shared by the lexical index and query processing.
+
+    Pipeline: lowercase, Unicode accent folding (é -> e, œ -> oe), elision
+    removal (l', d', qu'...), tokenization that keeps CIM-10 codes whole,
+    French stopword removal and a light stemmer (plurals, feminine -e,
+    -aux/-al, -eux/-euse). "dyspnée", "dyspnee" and "dyspnées" all
+    analyze to the same term.
+
+    Surface words are memoized to interned stems, so a corpus pass keeps
+    one string per distinct term, and analyzed queries go through an LRU
+    cache.
+    """
+
+    # Bump when the output of `analyze` changes: indexes record it
+    VERSION = "french-1"
+    MAX_MEMO_WORDS = 500000
+
+    def __init__(self, query_cache_size: int = 4096):
+        self._stems: Dict[str, str] = {}
+        self.analyze_query = lru_cache(maxsize=query_cache_size)(self._analyze_query)
+
+    @staticmethod
+    def fold(text: str) -> str:
+        text = text.lower().replace("œ", "oe").replace("æ", "ae")
+        decomposed = unicodedata.normalize("NFKD", text)
+        return "".join(c for c in decomposed if not unicodedata.combining(c))
+
+    @staticmethod
+    def stem(word: str) -> str:
+        if word.isdigit() or len(word) <= 3:
+            return word
+
+        if word.endswith("aux") and len(word) > 4:
+            word = word[:-3] + "al"
+        elif word.endswith(("s", "x")):
+            word = word[:-1]
+
+        if word.endswith("e") and len(word) > 3:
+            word = word[:-1]
+        if word.endswith("eus"):
+            word = word[:-1]
+
+        return word
+
+    def _term(self, word: str) -> Optional[str]:
+        term = self._stems.get(word)
+        if term is None:
+            if word in FRENCH_STOPWORDS or (len(word) < 2 and not word.isdigit()):
+                term = ""
+            else:
+                term = sys.intern(self.stem(word))
+            # Query words are unbounded, keep the memo at corpus scale
+            if len(self._stems) >= self.MAX_MEMO_WORDS:
+                self._stems.clear()
+            self._stems[word] = term
+        return term or None
+
+    def analyze(self, text: str) -> List[str]:
+        text = ELISION_PATTERN.sub(" ", self.fold(text))
+
+        terms = []
+        for token in TOKEN_PATTERN.findall(text):
+            if CODE_TOKEN.fullmatch(token):
+                terms.append(token)
+                if "." in token:
+                    terms.append(token.split(".")[0])
+                continue
+            term = self._term(token)
+            if term is not None:
+                terms.append(term)
+        return terms
+
+    def _analyze_query(self, query: str) -> Tuple[str, ...]:
+        return tuple(self.analyze(query))
+
+    def cache_info(self):
+        return self.analyze_query.cache_info()
+
+
+_default_analyzer: Optional[FrenchAnalyzer] = None
+
+
+def get_analyzer() -> FrenchAnalyzer:
+    """Process-wide analyzer, so the index and queries share memo and cache."""
+    global _default_analyzer
+    if _default_analyzer is None:
+        _default_analyzer = FrenchAnalyzer()
+    return _default_analyzer
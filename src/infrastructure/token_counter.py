@@ -0,0 +1,64 @@
+from typing import List
+import tiktoken
+
+
+class _ApproximateEncoding:
+    """
+    Offline stand-in when the tiktoken BPE files cannot be downloaded.
+
+    Every 3 UTF-8 bytes count as one token, which overestimates real BPE
+    counts for French text and therefore keeps budgets on the safe side.
+    """
+
+    name = "approximate"
+    BYTES_PER_TOKEN = 3
+
+    def encode(self, text: str, disallowed_special=()) -> List[bytes]:
+        data = text.encode("utf-8")
+        step = self.BYTES_PER_TOKEN
+        return [data[i:i + step] for i in range(0, len(data), step)]
+
+    def encode_batch(self, texts: List[str], disallowed_special=()) -> List[List[bytes]]:
+        return [self.encode(text) for text in texts]
+
+    def decode(self, tokens: List[bytes]) -> str:
+        return b"".join(tokens).decode("utf-8", errors="ignore")
+
+
+class TokenCounter:
+
+    def __init__(self, model: str):
+        self.model = model
+        try:
+            try:
+                self.encoding = tiktoken.encoding_for_model(model)
+            except KeyError:
+                self.encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception as e:
+            print(f" Could not load tiktoken encoding for {model} ({type(e).__name__}), using approximate counts")
+            self.encoding = _ApproximateEncoding()
+
+    def encode(self, text: str) -> List[int]:
+        return self.encoding.encode(text, disallowed_special=())
+
+    def decode(self, tokens: List[int]) -> str:
+        return self.encoding.decode(tokens)
+
+    def count(self, text: str) -> int:
+        return len(self.encode(text))
+
+    def count_many(self, texts: List[str]) -> List[int]:
+        return [len(tokens) for tokens in self.encoding.encode_batch(texts, disallowed_special=())]
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        tokens = self.encode(text)
+        if len(tokens) <= max_tokens:
+            return text
+        return self.decode(tokens[:max_tokens])
+
+    def split(self, text: str, max_tokens: int) -> List[str]:
+        tokens = self.encode(text)
+        return [
+            self.decode(tokens[i:i + max_tokens])
+            for i in range(0, len(tokens), max_tokens)
+        ]
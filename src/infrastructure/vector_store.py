@@ -1,14 +1,162 @@
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
+from collections import defaultdict
+import hashlib
+import json
+import time
 import chromadb
 from chromadb.config import Settings as ChromaSettings
 from pathlib import Path
 
+from .token_counter import TokenCounter
 from ..domain.entities import DocumentChunk
 from ..config import settings
 
 
+def chunk_content_hash(chunk: DocumentChunk) -> str:
+    """
+    Hash of a chunk's text and metadata. The page number is left out so a
+    revision that only shifts pagination does not change it.
+    """
+    payload = json.dumps(
+        [chunk.content, chunk.metadata],
+        sort_keys=True,
+        ensure_ascii=False,
+        default=str
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def chunk_content_key(chunk: DocumentChunk) -> str:
+    """Position-independent identity of a chunk, used to diff incremental rebuilds."""
+    return f"{chunk.metadata.get('primary_code') or ''}:{chunk_content_hash(chunk)}"
+
+
+def diff_chunks(
+    stored: Dict[str, Tuple[str, Optional[int]]],
+    chunks: List[DocumentChunk]
+) -> Tuple[Dict[str, int], List[DocumentChunk], List[str]]:
+    """
+    Match rebuilt chunks to stored ones (chunk id -> (content key, page
+    number)) by content key rather than by their positional ids.
+
+    Returns (moved, added, removed):
+      - moved: stored id -> new page number, for unchanged chunks whose
+        page changed; they keep their id and vector
+      - added: new or changed chunks to embed; an id still used by a kept
+        chunk is suffixed `_1`, `_2`...
+      - removed: stored ids no longer in the document
+    """
+    ids_by_key = defaultdict(list)
+    for chunk_id, (key, _) in stored.items():
+        ids_by_key[key].append(chunk_id)
+    
+    kept = set()
+    moved = {}
+    added = []
+    for chunk in chunks:
+        matches = ids_by_key.get(chunk_content_key(chunk))
+        if not matches:
+            added.append(chunk)
+            continue
+        
+        stored_id = chunk.chunk_id if chunk.chunk_id in matches else matches[0]
+        matches.remove(stored_id)
+        kept.add(stored_id)
+        if stored[stored_id][1] != chunk.page_number:
+            moved[stored_id] = chunk.page_number
+    
+    taken = kept | {chunk.chunk_id for chunk in added}
+    for chunk in added:
+        if chunk.chunk_id not in kept:
+            continue
+        base, counter = chunk.chunk_id, 1
+        while f"{base}_{counter}" in taken:
+            counter += 1
+        chunk.chunk_id = f"{base}_{counter}"
+        taken.add(chunk.chunk_id)
+    
+    removed = [chunk_id for chunk_id in stored if chunk_id not in kept]
+    
+    return moved, added, removed
+
+
+def unique_chunk_ids(chunks: List[DocumentChunk]) -> List[str]:
+    """Chunk ids with duplicates suffixed `_1`, `_2`... in document order."""
+    ids = []
+    seen_ids = set()
+    for chunk in chunks:
+        chunk_id = chunk.chunk_id
+        counter = 1
+        while chunk_id in seen_ids:
+            chunk_id = f"{chunk.chunk_id}_{counter}"
+            counter += 1
+        seen_ids.add(chunk_id)
+        ids.append(chunk_id)
+    return ids
+
+
+def prepare_chunks(chunks: List[DocumentChunk], embeddings: List[List[float]]) -> Tuple[List[str], List[str], List[Dict], List[List[float]]]:
+    """
+    Drop zero embeddings, de-duplicate ids and flatten metadata into store-safe
+    scalars. Each chunk's `token_count` for the LLM model is stored with it, so
+    prompts can be packed without re-encoding retrieved text.
+    """
+    ids = []
+    documents = []
+    metadatas = []
+    embeddings_clean = []
+    
+    skipped_zero = 0
+    skipped_zero_ids = []
+    
+    chunk_ids = unique_chunk_ids(chunks)
+    skipped_duplicate = sum(1 for chunk, chunk_id in zip(chunks, chunk_ids) if chunk_id != chunk.chunk_id)
+    
+    for chunk, chunk_id, embedding in zip(chunks, chunk_ids, embeddings):
+        if all(e == 0.0 for e in embedding):
+            skipped_zero += 1
+            skipped_zero_ids.append(chunk_id)
+            continue
+        
+        ids.append(chunk_id)
+        documents.append(chunk.content)
+        embeddings_clean.append(embedding)
+        
+        clean_metadata = {}
+        for key, value in chunk.metadata.items():
+            if isinstance(value, (str, int, float, bool)):
+                clean_metadata[key] = value
+            elif isinstance(value, list):
+                
+                if value and isinstance(value[0], str):
+                    clean_metadata[key] = ','.join(str(v) for v in value[:10])
+            elif value is None:
+                clean_metadata[key] = ""
+        
+        clean_metadata['page_number'] = chunk.page_number
+        clean_metadata['content_hash'] = chunk_content_hash(chunk)
+        clean_metadata['content_key'] = chunk_content_key(chunk)
+        
+        metadatas.append(clean_metadata)
+    
+    token_counts = TokenCounter(settings.openai_model).count_many(documents)
+    for metadata, token_count in zip(metadatas, token_counts):
+        metadata['token_count'] = token_count
+    
+    if skipped_zero > 0:
+        print(f" Skipped {skipped_zero} chunks with zero embeddings:")
+        print(f"   {', '.join(skipped_zero_ids[:20])}{' ...' if skipped_zero > 20 else ''}")
+    if skipped_duplicate > 0:
+        print(f" Renamed {skipped_duplicate} duplicate chunk IDs")
+    
+    return ids, documents, metadatas, embeddings_clean
+
+
 class VectorStore:
     
+    # Seconds a fetched index version is trusted before Chroma is asked again
+    INDEX_VERSION_TTL = 2.0
+    
     def __init__(self, persist_directory: Optional[str] = None):
         self.persist_directory = persist_directory or settings.chroma_persist_dir
         
@@ -30,9 +178,48 @@ class VectorStore:
                 name=self.collection_name,
                 metadata={"description": "CIM-10 CoCoA codes and rules"}
             )
+        self._index_version: Optional[str] = None
+        self._index_version_at = 0.0
         
         print(f"Vector store initialized: {self.collection.count()} documents")
     
+    def get_embedding_signature(self) -> Dict:
+        """Embedding backend, model and dimensions the stored vectors were built with."""
+        metadata = self.collection.metadata or {}
+        return {k: v for k, v in metadata.items() if k.startswith("embedding_")}
+    
+    def set_embedding_signature(self, signature: Dict):
+        metadata = dict(self.collection.metadata or {})
+        metadata.update(signature)
+        self.collection.modify(metadata=metadata)
+    
+    def get_index_version(self) -> str:
+        """
+        Set on every (re)build; query results are cached per index version.
+        The collection handle keeps the metadata it was opened with, so the
+        collection is re-fetched (at most every INDEX_VERSION_TTL seconds) to
+        see a rebuild made by another process.
+        """
+        now = time.monotonic()
+        if self._index_version is None or now - self._index_version_at > self.INDEX_VERSION_TTL:
+            try:
+                self.collection = self.client.get_collection(name=self.collection_name)
+            except Exception:
+                # Collection being recreated by a rebuild: keep the last version seen
+                if self._index_version is not None:
+                    return self._index_version
+                raise
+            self._index_version = str((self.collection.metadata or {}).get("index_version", ""))
+            self._index_version_at = now
+        return self._index_version
+    
+    def set_index_version(self, version: str):
+        metadata = dict(self.collection.metadata or {})
+        metadata["index_version"] = version
+        self.collection.modify(metadata=metadata)
+        self._index_version = version
+        self._index_version_at = time.monotonic()
+    
     def add_chunks(self, chunks: List[DocumentChunk], embeddings: List[List[float]]):
 
         if len(chunks) != len(embeddings):
@@ -40,52 +227,7 @@ class VectorStore:
         
         print(f"Adding {len(chunks)} chunks to vector store...")
         
-        ids = []
-        documents = []
-        metadatas = []
-        embeddings_clean = []
-        
-        seen_ids = set()
-        skipped_zero = 0
-        skipped_duplicate = 0
-        
-        for i, (chunk, embedding) in enumerate(zip(chunks, embeddings)):
-            if all(e == 0.0 for e in embedding):
-                skipped_zero += 1
-                continue
-            
-            chunk_id = chunk.chunk_id
-            original_id = chunk_id
-            counter = 1
-            while chunk_id in seen_ids:
-                chunk_id = f"{original_id}_{counter}"
-                counter += 1
-                skipped_duplicate += 1
-            
-            seen_ids.add(chunk_id)
-            ids.append(chunk_id)
-            documents.append(chunk.content)
-            embeddings_clean.append(embedding)
-            
-            clean_metadata = {}
-            for key, value in chunk.metadata.items():
-                if isinstance(value, (str, int, float, bool)):
-                    clean_metadata[key] = value
-                elif isinstance(value, list):
-                    
-                    if value and isinstance(value[0], str):
-                        clean_metadata[key] = ','.join(str(v) for v in value[:10])
-                elif value is None:
-                    clean_metadata[key] = ""
-            
-            clean_metadata['page_number'] = chunk.page_number
-            
-            metadatas.append(clean_metadata)
-        
-        if skipped_zero > 0:
-            print(f" Skipped {skipped_zero} chunks with zero embeddings")
-        if skipped_duplicate > 0:
-            print(f" Renamed {skipped_duplicate} duplicate chunk IDs")
+        ids, documents, metadatas, embeddings_clean = prepare_chunks(chunks, embeddings)
         
         batch_size = 1000
         for i in range(0, len(ids), batch_size):
@@ -101,29 +243,92 @@ class VectorStore:
         
         print(f" Added {len(ids)} chunks. Total in store: {self.collection.count()}")
     
+    def get_content_keys(self) -> Dict[str, Tuple[str, Optional[int]]]:
+        """(content key, page number) per chunk id; the key is "" for chunks stored before keys."""
+        results = self.collection.get(include=["metadatas"])
+        return {
+            chunk_id: ((metadata or {}).get('content_key', ""), (metadata or {}).get('page_number'))
+            for chunk_id, metadata in zip(results['ids'], results['metadatas'])
+        }
+    
+    def update_page_numbers(self, pages: Dict[str, int]):
+        """Set the page number of stored chunks in place; text and vectors are unchanged."""
+        chunk_ids = list(pages)
+        batch_size = 1000
+        for i in range(0, len(chunk_ids), batch_size):
+            results = self.collection.get(ids=chunk_ids[i:i + batch_size], include=["metadatas"])
+            self.collection.update(
+                ids=results['ids'],
+                metadatas=[
+                    {**(metadata or {}), 'page_number': pages[chunk_id]}
+                    for chunk_id, metadata in zip(results['ids'], results['metadatas'])
+                ]
+            )
+        
+        print(f" Updated the page number of {len(chunk_ids)} chunks")
+    
+    def upsert_chunks(self, chunks: List[DocumentChunk], embeddings: List[List[float]]):
+        """Insert new chunks and overwrite stored chunks with the same id."""
+        if len(chunks) != len(embeddings):
+            raise ValueError(f"Mismatch: {len(chunks)} chunks but {len(embeddings)} embeddings")
+        
+        ids, documents, metadatas, embeddings_clean = prepare_chunks(chunks, embeddings)
+        
+        batch_size = 1000
+        for i in range(0, len(ids), batch_size):
+            self.collection.upsert(
+                ids=ids[i:i + batch_size],
+                documents=documents[i:i + batch_size],
+                embeddings=embeddings_clean[i:i + batch_size],
+                metadatas=metadatas[i:i + batch_size]
+            )
+        
+        print(f" Upserted {len(ids)} chunks. Total in store: {self.collection.count()}")
+    
+    def delete_chunks(self, chunk_ids: List[str]):
+        batch_size = 1000
+        for i in range(0, len(chunk_ids), batch_size):
+            self.collection.delete(ids=chunk_ids[i:i + batch_size])
+        
+        print(f" Deleted {len(chunk_ids)} chunks. Total in store: {self.collection.count()}")
+    
     def search(
         self, 
         query_embedding: List[float], 
         top_k: int = 10,
         filter_dict: Optional[Dict] = None
     ) -> List[Dict]:
+        return self.search_many([query_embedding], top_k=top_k, filter_dict=filter_dict)[0]
+    
+    def search_many(
+        self,
+        query_embeddings: List[List[float]],
+        top_k: int = 10,
+        filter_dict: Optional[Dict] = None
+    ) -> List[List[Dict]]:
+        """One result list per query embedding, from a single collection query."""
+        if not query_embeddings:
+            return []
 
         results = self.collection.query(
-            query_embeddings=[query_embedding],
+            query_embeddings=query_embeddings,
             n_results=top_k,
             where=filter_dict,
             include=["documents", "metadatas", "distances"]
         )
         
         formatted_results = []
-        for i in range(len(results['ids'][0])):
-            formatted_results.append({
-                'id': results['ids'][0][i],
-                'document': results['documents'][0][i],
-                'metadata': results['metadatas'][0][i],
-                'distance': results['distances'][0][i],
-                'similarity': 1 - results['distances'][0][i]
-            })
+        for q in range(len(query_embeddings)):
+            formatted_results.append([
+                {
+                    'id': results['ids'][q][i],
+                    'document': results['documents'][q][i],
+                    'metadata': results['metadatas'][q][i],
+                    'distance': results['distances'][q][i],
+                    'similarity': 1 - results['distances'][q][i]
+                }
+                for i in range(len(results['ids'][q]))
+            ])
         
         return formatted_results
     
@@ -143,6 +348,53 @@ class VectorStore:
         
         return None
     
+    def get_ids(self) -> List[str]:
+        return self.collection.get(include=[])['ids']
+    
+    def get_by_ids(self, chunk_ids: List[str]) -> List[Dict]:
+        """Documents and metadata for `chunk_ids`, in the same order (missing ids skipped)."""
+        if not chunk_ids:
+            return []
+        
+        results = self.collection.get(ids=list(chunk_ids), include=["documents", "metadatas"])
+        by_id = {
+            chunk_id: {'id': chunk_id, 'document': document, 'metadata': metadata}
+            for chunk_id, document, metadata in zip(results['ids'], results['documents'], results['metadatas'])
+        }
+        return [by_id[chunk_id] for chunk_id in chunk_ids if chunk_id in by_id]
+    
+    def get_by_codes(self, codes: List[str]) -> List[Dict]:
+        """All chunks whose primary code is in `codes`."""
+        if not codes:
+            return []
+        
+        results = self.collection.get(
+            where={"primary_code": {"$in": list(codes)}},
+            include=["documents", "metadatas"]
+        )
+        return [
+            {'id': chunk_id, 'document': document, 'metadata': metadata}
+            for chunk_id, document, metadata in zip(results['ids'], results['documents'], results['metadatas'])
+        ]
+    
+    def get_all(self, include_embeddings: bool = False) -> Dict:
+        include = ["documents", "metadatas"] + (["embeddings"] if include_embeddings else [])
+        return self.collection.get(include=include)
+    
+    def import_records(self, ids: List[str], documents: List[str], metadatas: List[Dict], embeddings):
+        """Replace the collection contents with already prepared records (snapshot import)."""
+        self.clear()
+        
+        batch_size = 1000
+        for i in range(0, len(ids), batch_size):
+            self.collection.add(
+                ids=ids[i:i + batch_size],
+                documents=documents[i:i + batch_size],
+                embeddings=[list(map(float, e)) for e in embeddings[i:i + batch_size]],
+                metadatas=metadatas[i:i + batch_size]
+            )
+        print(f" Imported {self.collection.count()} records")
+    
     def count(self) -> int:
         return self.collection.count()
     
@@ -156,4 +408,5 @@ class VectorStore:
             name=self.collection_name,
             metadata={"description": "CIM-10 CoCoA codes and rules"}
         )
+        self._index_version = None
         print("Vector store cleared")
\ No newline at end of file
@@ -0,0 +1,24 @@
+from typing import Optional
+
+from ..config import settings
+
+
+def create_vector_store(backend: Optional[str] = None):
+    """Return the vector store selected by VECTOR_STORE_BACKEND (or VECTOR_STORE_SNAPSHOT)."""
+    if backend is None and settings.vector_store_snapshot:
+        from .mmap_vector_store import MmapVectorStore
+        return MmapVectorStore.from_snapshot(settings.vector_store_snapshot)
+
+    backend = backend or settings.vector_store_backend
+
+    if backend == "chroma":
+        from .vector_store import VectorStore
+        return VectorStore()
+    if backend == "mmap":
+        from .mmap_vector_store import MmapVectorStore
+        return MmapVectorStore()
+    if backend == "ivf":
+        from .ivf_vector_store import IVFVectorStore
+        return IVFVectorStore()
+
+    raise ValueError(f"Unknown vector store backend: {backend}")
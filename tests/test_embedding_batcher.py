@@ -0,0 +1,112 @@
+"""Test micro-batching of concurrent query embeddings."""
+
+import asyncio
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.infrastructure.embedding_batcher import QueryEmbeddingBatcher, AsyncQueryEmbeddingBatcher
+
+
+class CountingEmbedder:
+
+    def __init__(self):
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def __call__(self, texts):
+        with self._lock:
+            self.calls.append(list(texts))
+        return [[float(len(text)), float(ord(text[0]))] for text in texts]
+
+
+def test_concurrent_queries_share_one_call():
+    embedder = CountingEmbedder()
+    texts = ["sepsis", "toux", "fièvre", "dyspnée", "toux", "angine"]
+    # The batch is full once every caller has queued, well before the window ends
+    batcher = QueryEmbeddingBatcher(embedder, max_batch_size=len(texts), max_wait_ms=2000)
+    barrier = threading.Barrier(len(texts))
+
+    def query(text):
+        barrier.wait()
+        return batcher.embed(text)
+
+    with ThreadPoolExecutor(max_workers=len(texts)) as pool:
+        vectors = list(pool.map(query, texts))
+
+    assert len(embedder.calls) == 1
+    # Duplicates are embedded once, every caller gets the vector of its own text
+    assert sorted(embedder.calls[0]) == sorted(set(texts))
+    assert vectors == [[float(len(t)), float(ord(t[0]))] for t in texts]
+    assert batcher.stats()['batches'] == 1
+
+
+def test_provider_error_reaches_every_caller():
+    def failing(texts):
+        raise RuntimeError("provider down")
+
+    batcher = QueryEmbeddingBatcher(failing, max_batch_size=2, max_wait_ms=2000)
+    futures = [batcher.submit("a"), batcher.submit("b")]
+
+    for future in futures:
+        try:
+            future.result(timeout=5)
+        except RuntimeError as e:
+            assert str(e) == "provider down"
+        else:
+            raise AssertionError("expected the provider error")
+
+
+def test_concurrent_async_queries_share_one_call():
+    embedder = CountingEmbedder()
+
+    async def embed_async(texts):
+        await asyncio.sleep(0)
+        return embedder(texts)
+
+    texts = ["sepsis", "toux", "fièvre", "dyspnée", "toux", "angine"]
+    batcher = AsyncQueryEmbeddingBatcher(embed_async, max_batch_size=len(texts), max_wait_ms=2000)
+
+    async def main():
+        return await asyncio.gather(*[batcher.embed(text) for text in texts])
+
+    vectors = asyncio.run(main())
+
+    assert len(embedder.calls) == 1
+    assert sorted(embedder.calls[0]) == sorted(set(texts))
+    assert vectors == [[float(len(t)), float(ord(t[0]))] for t in texts]
+    assert batcher.stats()['batches'] == 1
+
+
+def test_async_batches_flush_after_the_window():
+    embedder = CountingEmbedder()
+
+    async def embed_async(texts):
+        return embedder(texts)
+
+    batcher = AsyncQueryEmbeddingBatcher(embed_async, max_batch_size=32, max_wait_ms=5)
+
+    async def main():
+        first = await batcher.embed("toux")
+        second = await asyncio.gather(batcher.embed("a"), batcher.embed("b"))
+        return first, second
+
+    first, second = asyncio.run(main())
+    assert first == [4.0, float(ord("t"))]
+    assert len(second) == 2
+    assert embedder.calls == [["toux"], ["a", "b"]]
+
+    # A new event loop gets its own queue and worker; an error reaches every caller
+    async def failing(texts):
+        raise RuntimeError("provider down")
+
+    batcher.embed_fn = failing
+
+    async def fail():
+        return await asyncio.gather(batcher.embed("a"), batcher.embed("b"), return_exceptions=True)
+
+    errors = asyncio.run(fail())
+    assert [str(e) for e in errors] == ["provider down", "provider down"]
@@ -0,0 +1,71 @@
+"""Test the persistent SQLite embedding cache."""
+
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.infrastructure.embedding_cache import EmbeddingCache
+
+
+def test_hits_misses_and_text_normalization(tmp_path):
+    cache = EmbeddingCache(path=str(tmp_path / "cache.sqlite"), max_entries=10)
+
+    cache.put("model", 3, "Sepsis  à staphylocoques", [0.1, 0.2, 0.3])
+
+    # Whitespace variants share one entry; model and dimensions are part of the key
+    assert cache.get("model", 3, " Sepsis à\nstaphylocoques ") is not None
+    assert cache.get("other-model", 3, "Sepsis à staphylocoques") is None
+    assert cache.get("model", 2, "Sepsis à staphylocoques") is None
+
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses']) == (1, 2)
+
+
+def test_zero_vectors_are_not_cached(tmp_path):
+    cache = EmbeddingCache(path=str(tmp_path / "cache.sqlite"), max_entries=10)
+
+    cache.put_many("model", 2, ["ok", "failed"], [[1.0, 0.0], [0.0, 0.0]])
+
+    assert cache.get_many("model", 2, ["ok", "failed"])[1] is None
+    assert cache.count() == 1
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = EmbeddingCache(path=str(tmp_path / "cache.sqlite"), max_entries=2)
+
+    cache.put("model", 2, "a", [1.0, 0.0])
+    time.sleep(0.01)
+    cache.put("model", 2, "b", [0.0, 1.0])
+    time.sleep(0.01)
+    cache.get("model", 2, "a")  # "b" is now the least recently used
+    time.sleep(0.01)
+    cache.put("model", 2, "c", [1.0, 1.0])
+
+    assert cache.count() == 2
+    assert cache.stats()['evictions'] == 1
+    assert cache.get("model", 2, "b") is None
+    assert cache.get("model", 2, "a") == [1.0, 0.0]
+    assert cache.get("model", 2, "c") == [1.0, 1.0]
+
+
+def test_row_count_is_tracked_across_replacements_and_reopens(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = EmbeddingCache(path=path, max_entries=3)
+
+    cache.put_many("model", 2, ["a", "b", "a"], [[1.0, 0.0], [0.0, 1.0], [1.0, 0.0]])
+    cache.put("model", 2, "b", [0.5, 0.5])  # replaces, does not add a row
+    cache.put("model", 2, "c", [1.0, 1.0])
+    assert cache.stats()['evictions'] == 0
+
+    # The count of the existing file is picked up on open
+    reopened = EmbeddingCache(path=path, max_entries=3)
+    time.sleep(0.01)
+    reopened.put("model", 2, "d", [1.0, 0.5])
+    assert reopened.count() == 3
+    assert reopened.stats()['evictions'] == 1
+
+    reopened.clear()
+    reopened.put("model", 2, "e", [1.0, 0.0])
+    assert reopened.count() == 1 and reopened.stats()['evictions'] == 1
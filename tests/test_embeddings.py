@@ -0,0 +1,134 @@
+"""Test request packing and bad-input isolation in embedding generation."""
+
+import asyncio
+import sys
+import threading
+from pathlib import Path
+from types import SimpleNamespace
+
+import httpx
+import openai
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.infrastructure.embedding_cache import EmbeddingCache
+from src.infrastructure.embedding_providers import EmbeddingProvider, OpenAIEmbeddingProvider
+from src.infrastructure.embeddings import EmbeddingGenerator
+
+
+class RecordingProvider(EmbeddingProvider):
+    """No token counter: text length stands in for the token count."""
+
+    name = "fake"
+    model = "fake"
+    dimensions = 2
+
+    def __init__(self, max_request_tokens=None, max_batch_inputs=64):
+        self.max_request_tokens = max_request_tokens
+        self.max_batch_inputs = max_batch_inputs
+        self.calls = []
+
+    def embed(self, texts):
+        self.calls.append(list(texts))
+        return [[float(len(text)), 1.0] for text in texts]
+
+
+class FakeEmbeddings:
+    """`client.embeddings` that rejects any batch containing "BAD"."""
+
+    def __init__(self, message="invalid input", body=None):
+        self.message = message
+        self.body = body
+        self.calls = 0
+
+    def create(self, model, input, encoding_format):
+        self.calls += 1
+        if any("BAD" in text for text in input):
+            request = httpx.Request("POST", "https://api.openai.com/v1/embeddings")
+            raise openai.BadRequestError(
+                self.message,
+                response=httpx.Response(400, request=request),
+                body=self.body
+            )
+        return SimpleNamespace(data=[SimpleNamespace(embedding=[1.0, float(len(text))]) for text in input])
+
+
+def test_batches_respect_token_and_input_limits(tmp_path):
+    provider = RecordingProvider(max_request_tokens=10, max_batch_inputs=3)
+    cache = EmbeddingCache(path=str(tmp_path / "cache.sqlite"))
+    generator = EmbeddingGenerator(cache=cache, provider=provider)
+    texts = ["aaaa", "bbbb", "cc", "d", "e", "f", "gggggggggg", "h"]
+
+    embeddings = generator.generate_embeddings_batch(texts)
+
+    assert [e[0] for e in embeddings] == [float(len(t)) for t in texts]
+    assert [t for call in provider.calls for t in call] == texts
+    for call in provider.calls:
+        assert len(call) <= 3
+        assert sum(len(t) for t in call) <= 10
+
+
+def test_rejected_input_only_fails_itself(tmp_path):
+    provider = OpenAIEmbeddingProvider()
+    provider.client = SimpleNamespace(embeddings=FakeEmbeddings())
+    provider.dimensions = 2
+    cache = EmbeddingCache(path=str(tmp_path / "cache.sqlite"))
+    generator = EmbeddingGenerator(cache=cache, provider=provider)
+    texts = ["sepsis", "toux", "BAD input", "fièvre", "dyspnée"]
+
+    embeddings = generator.generate_embeddings_batch(texts)
+
+    assert embeddings[2] == [0.0, 0.0]
+    assert [e[1] for i, e in enumerate(embeddings) if i != 2] == [6.0, 4.0, 6.0, 7.0]
+
+    # The other inputs were cached, the rejected one was not
+    cached = cache.get_many(provider.cache_namespace, 2, texts)
+    assert [c is not None for c in cached] == [True, True, False, True, True]
+
+
+def test_other_bad_requests_are_not_bisected():
+    embeddings = FakeEmbeddings("The model `typo` does not exist", body={"code": "model_not_found"})
+    provider = OpenAIEmbeddingProvider()
+    provider.client = SimpleNamespace(embeddings=embeddings)
+
+    assert provider.embed(["sepsis", "BAD input", "toux", "fièvre"]) == [None] * 4
+    assert embeddings.calls == 1
+
+    # Input errors are still isolated, whether flagged by code or by message
+    embeddings = FakeEmbeddings("Request too large", body={"code": "context_length_exceeded"})
+    provider.client = SimpleNamespace(embeddings=embeddings)
+    assert provider.embed(["sepsis", "BAD input"])[0] == [1.0, 6.0]
+
+
+def test_async_query_embedding_keeps_cache_io_off_the_event_loop(tmp_path):
+    class ThreadRecordingCache(EmbeddingCache):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.threads = []
+
+        def get_many(self, *args):
+            self.threads.append(threading.get_ident())
+            return super().get_many(*args)
+
+        def put_many(self, *args):
+            self.threads.append(threading.get_ident())
+            return super().put_many(*args)
+
+    class AsyncProvider(RecordingProvider):
+        async def embed_async(self, texts):
+            return self.embed(texts)
+
+    cache = ThreadRecordingCache(path=str(tmp_path / "cache.sqlite"))
+    generator = EmbeddingGenerator(cache=cache, provider=AsyncProvider())
+
+    async def main():
+        first = await generator.generate_embedding_async("sepsis")
+        second = await generator.generate_embedding_async("sepsis")
+        return first, second, threading.get_ident()
+
+    first, second, loop_thread = asyncio.run(main())
+
+    assert first == second == [6.0, 1.0]
+    assert len(generator.provider.calls) == 1
+    # Lookup, store, then the cached lookup: none on the event loop thread
+    assert len(cache.threads) == 3 and loop_thread not in cache.threads
@@ -0,0 +1,60 @@
+"""Test the content-keyed diff used by incremental vector store builds."""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.domain.entities import DocumentChunk
+from src.infrastructure.mmap_vector_store import MmapVectorStore
+from src.infrastructure.vector_store import diff_chunks
+
+
+def make_chunks(pages):
+    return [
+        DocumentChunk(f"code_A{i}_{page}_1", f"Code A{i}", page, {'primary_code': f"A{i}"})
+        for i, page in enumerate(pages)
+    ]
+
+
+def build(tmp_path, chunks):
+    store = MmapVectorStore(persist_directory=str(tmp_path), quantization="none", coarse_dimensions=0)
+    embeddings = np.random.default_rng(0).normal(size=(len(chunks), 8)).astype(np.float32)
+    store.add_chunks(chunks, embeddings.tolist())
+    return store
+
+
+def test_pagination_shift_only_moves_chunks(tmp_path):
+    store = build(tmp_path, make_chunks([10, 11, 12]))
+    before = store.get_all(include_embeddings=True)
+
+    # One page inserted before A1: A1 and A2 get new positional ids
+    moved, changed, removed = diff_chunks(store.get_content_keys(), make_chunks([10, 12, 13]))
+
+    assert moved == {"code_A1_11_1": 12, "code_A2_12_1": 13}
+    assert changed == [] and removed == []
+
+    store.update_page_numbers(moved)
+    after = store.get_all(include_embeddings=True)
+    assert after['ids'] == before['ids']
+    assert [m['page_number'] for m in after['metadatas']] == [10, 12, 13]
+    assert np.array_equal(after['embeddings'], before['embeddings'])
+    assert diff_chunks(store.get_content_keys(), make_chunks([10, 12, 13])) == ({}, [], [])
+
+
+def test_changed_content_is_replaced_without_id_clashes(tmp_path):
+    store = build(tmp_path, make_chunks([10, 11]))
+
+    # A0 moves to page 11, a revised A1 now sits where A0 was
+    chunks = [
+        DocumentChunk("code_A0_11_1", "Code A0", 11, {'primary_code': "A0"}),
+        DocumentChunk("code_A0_10_1", "Code A1 revised", 10, {'primary_code': "A1"}),
+    ]
+    moved, changed, removed = diff_chunks(store.get_content_keys(), chunks)
+
+    assert moved == {"code_A0_10_1": 11}
+    assert removed == ["code_A1_11_1"]
+    # The revised chunk's positional id is still used by the kept A0 chunk
+    assert [chunk.chunk_id for chunk in changed] == ["code_A0_10_1_1"]
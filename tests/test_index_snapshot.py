@@ -0,0 +1,93 @@
+"""Test writing, verifying and serving single-file index snapshots."""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.domain.entities import DocumentChunk
+from src.infrastructure import index_snapshot
+from src.infrastructure.index_snapshot import metadata_to_columns, read_header, verify_snapshot, write_snapshot
+from src.infrastructure.lexical_index import LexicalIndex
+from src.infrastructure.mmap_vector_store import MmapVectorStore
+
+
+DIMENSIONS = 16
+SIGNATURE = {'backend': "fake", 'model': "fake", 'dimensions': DIMENSIONS}
+
+
+def build_store(tmp_path, n=50):
+    rng = np.random.default_rng(0)
+    chunks = [
+        DocumentChunk(f"c{i}", f"Sepsis à germe {i}", i, {'primary_code': f"A{i:02d}", 'chapter': "I" if i % 2 else "II"})
+        for i in range(n)
+    ]
+    store = MmapVectorStore(persist_directory=str(tmp_path / "store"), quantization="none", coarse_dimensions=0)
+    store.add_chunks(chunks, rng.normal(size=(n, DIMENSIONS)).tolist())
+    return store
+
+
+def snapshot(store, path, **kwargs):
+    data = store.get_all(include_embeddings=True)
+    return write_snapshot(
+        str(path),
+        data['ids'],
+        data['documents'],
+        metadata_to_columns(data['metadatas']),
+        np.asarray(data['embeddings'], dtype=np.float32),
+        SIGNATURE,
+        lexical=LexicalIndex.build(data['ids'], data['documents']).to_bytes(),
+        **kwargs
+    )
+
+
+def test_snapshot_serves_identical_results(tmp_path):
+    store = build_store(tmp_path)
+    path = tmp_path / "index.snap"
+    snapshot(store, path)
+
+    header = verify_snapshot(str(path))
+    assert header['count'] == 50 and header['dimensions'] == DIMENSIONS
+
+    served = MmapVectorStore.from_snapshot(str(path), quantization="none", coarse_dimensions=0)
+    assert served.lexical_index is not None
+    assert served.get_embedding_signature() == SIGNATURE
+
+    queries = np.random.default_rng(1).normal(size=(5, DIMENSIONS)).tolist()
+    assert served.search_many(queries, top_k=10) == store.search_many(queries, top_k=10)
+    assert served.search(queries[0], top_k=5, filter_dict={"chapter": "I"}) == \
+        store.search(queries[0], top_k=5, filter_dict={"chapter": "I"})
+
+    with pytest.raises(RuntimeError):
+        served.delete_chunks(["c0"])
+
+
+def test_flipped_byte_fails_verification(tmp_path):
+    path = tmp_path / "index.snap"
+    header = snapshot(build_store(tmp_path), path)
+
+    section = header['sections']['embeddings']
+    offset = header['data_start'] + section['offset'] + section['length'] // 2
+    with open(path, "r+b") as f:
+        f.seek(offset)
+        byte = f.read(1)
+        f.seek(offset)
+        f.write(bytes([byte[0] ^ 0x01]))
+
+    with pytest.raises(ValueError, match="checksum mismatch in section 'embeddings'"):
+        verify_snapshot(str(path))
+
+
+def test_other_format_version_is_rejected(tmp_path, monkeypatch):
+    path = tmp_path / "index.snap"
+    monkeypatch.setattr(index_snapshot, "FORMAT_VERSION", index_snapshot.FORMAT_VERSION + 1)
+    snapshot(build_store(tmp_path), path)
+    monkeypatch.undo()
+
+    with pytest.raises(ValueError, match="Unsupported snapshot version"):
+        read_header(str(path))
+    with pytest.raises(ValueError):
+        MmapVectorStore.from_snapshot(str(path))
@@ -0,0 +1,80 @@
+"""Test the IVF approximate vector store."""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.domain.entities import DocumentChunk
+from src.infrastructure.ivf_vector_store import IVFVectorStore
+from src.infrastructure.mmap_vector_store import MmapVectorStore
+
+
+DIMENSIONS = 16
+
+
+def make_chunks(n, seed=0, prefix="c"):
+    rng = np.random.default_rng(seed)
+    chunks = [
+        DocumentChunk(f"{prefix}{i}", f"Document {prefix}{i}", i, {'chapter': "I" if i % 4 == 0 else "II"})
+        for i in range(n)
+    ]
+    return chunks, rng.normal(size=(n, DIMENSIONS)).astype(np.float32)
+
+
+def build(tmp_path, n=300):
+    chunks, embeddings = make_chunks(n)
+    ivf = IVFVectorStore(persist_directory=str(tmp_path / "ivf"), quantization="none", coarse_dimensions=0)
+    ivf.add_chunks(chunks, embeddings.tolist())
+    exact = MmapVectorStore(persist_directory=str(tmp_path / "exact"), quantization="none", coarse_dimensions=0)
+    exact.add_chunks(chunks, embeddings.tolist())
+    return ivf, exact
+
+
+def ids(results):
+    return [[r['id'] for r in hits] for hits in results]
+
+
+def test_probing_every_list_is_exact_search(tmp_path):
+    ivf, exact = build(tmp_path)
+    queries = np.random.default_rng(1).normal(size=(10, DIMENSIONS)).tolist()
+
+    n_lists = len(ivf.centroids)
+    assert n_lists > 1
+    assert ids(ivf.search_many(queries, top_k=10, nprobe=n_lists)) == ids(exact.search_many(queries, top_k=10))
+
+
+def test_filtered_queries_fall_back_to_exact_search(tmp_path):
+    ivf, exact = build(tmp_path)
+    queries = np.random.default_rng(2).normal(size=(10, DIMENSIONS)).tolist()
+
+    # nprobe=1 would miss neighbours, the filter makes the search exact
+    filtered = ivf.search_many(queries, top_k=10, filter_dict={"chapter": "I"}, nprobe=1)
+    assert ids(filtered) == ids(exact.search_many(queries, top_k=10, filter_dict={"chapter": "I"}))
+
+
+def test_small_updates_reuse_the_centroids(tmp_path):
+    ivf, _ = build(tmp_path)
+    trainings = []
+    train = ivf._train_centroids
+    ivf._train_centroids = lambda *args: trainings.append(args) or train(*args)
+    centroids = np.array(ivf.centroids)
+
+    # An incremental rebuild: delete, then upsert a few rows
+    new_chunks, new_embeddings = make_chunks(5, seed=3, prefix="n")
+    ivf.delete_chunks(["c0", "c1"])
+    ivf.upsert_chunks(new_chunks, new_embeddings.tolist())
+
+    assert trainings == []
+    assert np.array_equal(ivf.centroids, centroids)
+    assert ivf.list_offsets[-1] == ivf.count() == 303
+    assert sorted(ivf.list_rows.tolist()) == list(range(ivf.count()))
+    assert ivf.search(new_embeddings[0].tolist(), top_k=1, nprobe=len(centroids))[0]['id'] == "n0"
+
+    # Past the drift threshold the lists are retrained
+    more_chunks, more_embeddings = make_chunks(80, seed=4, prefix="m")
+    ivf.upsert_chunks(more_chunks, more_embeddings.tolist())
+    assert len(trainings) == 1
+    assert ivf.manifest["ivf"]["drift"] == 0
@@ -0,0 +1,40 @@
+"""Test the incremental JSON array parser used by the streaming endpoint."""
+
+import json
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.infrastructure.json_stream import JSONArrayStreamParser
+
+
+DOCUMENT = json.dumps({
+    "suggestions": [
+        {"code": "A41.0", "explanation": "Sepsis {staphylocoque} \"doré\"", "exclusions": ["P36.-", "O85"]},
+        {"code": "A41.9", "explanation": "Sepsis, sans précision ]"}
+    ]
+}, ensure_ascii=False)
+
+
+def test_objects_emitted_as_they_complete():
+    parser = JSONArrayStreamParser("suggestions")
+
+    emitted = []
+    for i, char in enumerate(DOCUMENT):
+        for obj in parser.feed(char):
+            emitted.append((obj["code"], i))
+
+    first_end = DOCUMENT.index("]}") + 1
+    assert [code for code, _ in emitted] == ["A41.0", "A41.9"]
+    assert emitted[0][1] == first_end
+    assert parser.done
+
+
+def test_same_result_for_any_chunking():
+    for size in (1, 3, 7, 50, len(DOCUMENT)):
+        parser = JSONArrayStreamParser("suggestions")
+        objects = []
+        for start in range(0, len(DOCUMENT), size):
+            objects += parser.feed(DOCUMENT[start:start + size])
+        assert objects == json.loads(DOCUMENT)["suggestions"]
@@ -0,0 +1,118 @@
+"""Test BM25F scoring and serialization of the lexical index."""
+
+import math
+import sys
+from collections import Counter
+from pathlib import Path
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.application.retriever import HybridRetriever
+from src.infrastructure.lexical_index import LexicalIndex
+from src.infrastructure.text_analyzer import get_analyzer
+
+
+CORPUS = [
+    "Sepsis à staphylocoque doré",
+    "Sepsis à streptocoque, sepsis sévère",
+    "Pneumopathie bactérienne due au staphylocoque",
+    "Insuffisance respiratoire aiguë",
+    "Infection urinaire à germe non précisé",
+    "Choc septique au cours d'une infection",
+]
+
+
+def bm25_okapi(corpus, query, k1=1.5, b=0.75, epsilon=0.25):
+    """Reference BM25Okapi, as computed by rank_bm25."""
+    analyzer = get_analyzer()
+    docs = [Counter(analyzer.analyze(text)) for text in corpus]
+    lengths = [sum(doc.values()) for doc in docs]
+    avg_length = sum(lengths) / len(docs)
+
+    doc_freqs = Counter(term for doc in docs for term in doc)
+    idf = {term: math.log(len(docs) - n + 0.5) - math.log(n + 0.5) for term, n in doc_freqs.items()}
+    floor = epsilon * sum(idf.values()) / len(idf)
+    idf = {term: value if value >= 0 else floor for term, value in idf.items()}
+
+    scores = []
+    for doc, length in zip(docs, lengths):
+        score = 0.0
+        for term in analyzer.analyze_query(query):
+            tf = doc.get(term, 0)
+            score += idf.get(term, 0.0) * tf * (k1 + 1) / (tf + k1 * (1 - b + b * length / avg_length))
+        scores.append(score)
+    return scores
+
+
+def code_chunk(code, label, exclusions=""):
+    content = f"Code: {code}\nLibellé: {label}"
+    if exclusions:
+        content += f"\nÀ l'exclusion de:\n• {exclusions}"
+    return content
+
+
+def test_single_field_matches_bm25_okapi():
+    index = LexicalIndex.build(
+        [f"d{i}" for i in range(len(CORPUS))], CORPUS, field_weights={"body": 1.0}, k1=1.5, b=0.75
+    )
+
+    for query in ["sepsis staphylocoque", "infection", "sepsis sepsis choc", "inconnu"]:
+        expected = bm25_okapi(CORPUS, query)
+        scores = dict(index.search(query, top_k=len(CORPUS)))
+        for row, score in enumerate(expected):
+            assert scores.get(row, 0.0) == pytest.approx(score, abs=1e-5)
+
+
+def test_field_weights_change_the_ranking():
+    # Unrelated chunks keep the idf of the tested terms positive
+    ids = ["A41", "J15", "N39", "J96", "R57"]
+    documents = [
+        code_chunk("A41", "Autres sepsis", exclusions="pneumopathie"),
+        code_chunk("J15", "Pneumopathie bactérienne"),
+        code_chunk("N39", "Infection urinaire"),
+        code_chunk("J96", "Insuffisance respiratoire"),
+        code_chunk("R57", "Choc septique"),
+    ]
+
+    # Label matches outweigh exclusion matches
+    weighted = LexicalIndex.build(ids, documents, field_weights={"code": 3.0, "label": 2.5, "exclusions": 0.2})
+    assert [row for row, _ in weighted.search("pneumopathie sepsis")][0] == 0
+    assert [row for row, _ in weighted.search("pneumopathie")] == [1, 0]
+
+    flipped = LexicalIndex.build(ids, documents, field_weights={"code": 3.0, "label": 0.2, "exclusions": 2.5})
+    assert [row for row, _ in flipped.search("pneumopathie")] == [0, 1]
+
+    # Fields without a weight are not indexed
+    unindexed = LexicalIndex.build(ids, documents, field_weights={"code": 3.0, "label": 2.5})
+    assert [row for row, _ in unindexed.search("pneumopathie")] == [1]
+
+
+def test_round_trip_and_version_checks():
+    ids = [f"d{i}" for i in range(len(CORPUS))]
+    index = LexicalIndex.build(ids, CORPUS, field_weights={"body": 1.0})
+
+    restored = LexicalIndex.from_bytes(index.to_bytes())
+    assert restored.ids == index.ids and restored.terms == index.terms
+    assert restored.field_weights == index.field_weights
+    assert restored.analyzer_version == get_analyzer().VERSION
+    assert np.array_equal(restored.weights, index.weights)
+    assert restored.search("sepsis staphylocoque") == index.search("sepsis staphylocoque")
+
+    index.FORMAT_VERSION = LexicalIndex.FORMAT_VERSION + 1
+    with pytest.raises(ValueError, match="Unsupported lexical index version"):
+        LexicalIndex.from_bytes(index.to_bytes())
+    with pytest.raises(ValueError, match="Unreadable lexical index"):
+        LexicalIndex.from_bytes(b"not an index")
+
+    # An index built with another analyzer is not used by the retriever
+    stale = LexicalIndex.from_bytes(LexicalIndex(
+        ids, restored.terms, restored.term_offsets, restored.doc_ids, restored.weights,
+        restored.field_weights, analyzer_version="french-0"
+    ).to_bytes())
+    assert stale.analyzer_version == "french-0"
+    retriever = SimpleNamespace(vector_store=SimpleNamespace(lexical_index=stale, get_ids=lambda: ids))
+    assert HybridRetriever._load_lexical_index(retriever) is None
@@ -0,0 +1,147 @@
+"""Test the memory-mapped exact vector store."""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.domain.entities import DocumentChunk
+from src.infrastructure.mmap_vector_store import MmapVectorStore
+
+
+DIMENSIONS = 32
+
+
+def make_chunks(n, seed=0, prefix="c"):
+    rng = np.random.default_rng(seed)
+    chunks = [
+        DocumentChunk(
+            chunk_id=f"{prefix}{i}",
+            content=f"Document {prefix}{i}",
+            page_number=i,
+            metadata={
+                'primary_code': f"A{i:02d}.0",
+                'chapter': "I" if i % 2 == 0 else "II",
+                'priority': str(i % 3)
+            }
+        )
+        for i in range(n)
+    ]
+    return chunks, rng.normal(size=(n, DIMENSIONS)).astype(np.float32)
+
+
+def brute_force(embeddings, query, top_k, rows=None):
+    rows = np.arange(len(embeddings)) if rows is None else np.asarray(rows)
+    vectors = embeddings[rows] / np.linalg.norm(embeddings[rows], axis=1, keepdims=True)
+    scores = vectors @ (query / np.linalg.norm(query))
+    order = np.argsort(-scores)[:top_k]
+    return rows[order], scores[order]
+
+
+def test_exact_search_matches_brute_force_cosine(tmp_path):
+    chunks, embeddings = make_chunks(200)
+    store = MmapVectorStore(persist_directory=str(tmp_path), quantization="none", coarse_dimensions=0)
+    store.add_chunks(chunks, embeddings.tolist())
+
+    queries = np.random.default_rng(1).normal(size=(5, DIMENSIONS)).astype(np.float32)
+    for query, results in zip(queries, store.search_many(queries.tolist(), top_k=10)):
+        rows, scores = brute_force(embeddings, query, 10)
+        assert [r['id'] for r in results] == [f"c{row}" for row in rows]
+        assert np.allclose([r['similarity'] for r in results], scores, atol=1e-5)
+        assert [r['id'] for r in store.search(query.tolist(), top_k=10)] == [r['id'] for r in results]
+
+
+def test_where_filters(tmp_path):
+    chunks, embeddings = make_chunks(30)
+    store = MmapVectorStore(persist_directory=str(tmp_path), quantization="none", coarse_dimensions=0)
+    store.add_chunks(chunks, embeddings.tolist())
+
+    def matching(where):
+        return [store.ids[row] for row in np.flatnonzero(store._where_mask(where))]
+
+    assert matching({"chapter": "I"}) == [f"c{i}" for i in range(0, 30, 2)]
+    assert matching({"primary_code": {"$in": ["A03.0", "A05.0", "Z99"]}}) == ["c3", "c5"]
+    assert matching({"priority": {"$ne": "0"}}) == [f"c{i}" for i in range(30) if i % 3 != 0]
+    assert matching({"$and": [{"chapter": "II"}, {"priority": "0"}]}) == [f"c{i}" for i in range(3, 30, 6)]
+    assert matching({"$or": [{"primary_code": "A01.0"}, {"primary_code": "A02.0"}]}) == ["c1", "c2"]
+
+    query = embeddings[4]
+    rows, _ = brute_force(embeddings, query, 5, rows=range(0, 30, 2))
+    results = store.search(query.tolist(), top_k=5, filter_dict={"chapter": "I"})
+    assert [r['id'] for r in results] == [f"c{row}" for row in rows]
+
+
+def test_int8_coarse_rescoring_is_exact_when_every_row_is_rescored(tmp_path):
+    chunks, embeddings = make_chunks(150)
+    store = MmapVectorStore(
+        persist_directory=str(tmp_path),
+        quantization="int8",
+        coarse_dimensions=8,
+        rescore_candidates=150
+    )
+    store.add_chunks(chunks, embeddings.tolist())
+    assert store.coarse is not None and store.coarse.dtype == np.int8
+
+    for query in np.random.default_rng(2).normal(size=(5, DIMENSIONS)).astype(np.float32):
+        rows, scores = brute_force(embeddings, query, 10)
+        results = store.search(query.tolist(), top_k=10)
+        assert [r['id'] for r in results] == [f"c{row}" for row in rows]
+        assert np.allclose([r['similarity'] for r in results], scores, atol=1e-5)
+
+
+def test_first_pass_copy_is_written_with_the_matrix_and_never_on_read(tmp_path):
+    chunks, embeddings = make_chunks(40)
+    writer = MmapVectorStore(persist_directory=str(tmp_path), quantization="int8", coarse_dimensions=8)
+    writer.add_chunks(chunks, embeddings.tolist())
+    files = {path.name: path.read_bytes() for path in tmp_path.iterdir()}
+    assert "coarse_int8_8.npy" in files and "coarse_int8_8_scale.npy" in files
+
+    # Same configuration maps the stored copy; another one builds its own in memory
+    same = MmapVectorStore(persist_directory=str(tmp_path), quantization="int8", coarse_dimensions=8)
+    assert isinstance(same.coarse, np.memmap)
+    other = MmapVectorStore(persist_directory=str(tmp_path), quantization="none", coarse_dimensions=4)
+    assert other.coarse is not None and not isinstance(other.coarse, np.memmap)
+    assert {path.name: path.read_bytes() for path in tmp_path.iterdir()} == files
+
+    # Block size does not change the int8 scores
+    queries = np.random.default_rng(3).normal(size=(3, DIMENSIONS)).astype(np.float32)
+    assert np.allclose(same._coarse_scores_many(queries, None, block=7), same._coarse_scores_many(queries, None))
+
+
+def test_upsert_and_delete_keep_rows_aligned(tmp_path):
+    chunks, embeddings = make_chunks(10)
+    store = MmapVectorStore(persist_directory=str(tmp_path), quantization="none", coarse_dimensions=0)
+    store.add_chunks(chunks, embeddings.tolist())
+
+    # Replace c3, add n0 and n1, then drop c0 and c7
+    new_chunks, new_embeddings = make_chunks(2, seed=5, prefix="n")
+    changed = DocumentChunk("c3", "Document c3 revised", 3, {'primary_code': "B03.0", 'chapter': "I"})
+    changed_embedding = np.random.default_rng(6).normal(size=DIMENSIONS).astype(np.float32)
+    store.upsert_chunks([changed] + new_chunks, [changed_embedding.tolist()] + new_embeddings.tolist())
+    store.delete_chunks(["c0", "c7", "missing"])
+
+    expected = {chunk.chunk_id: (chunk, vector) for chunk, vector in zip(chunks, embeddings)}
+    expected["c3"] = (changed, changed_embedding)
+    for chunk, vector in zip(new_chunks, new_embeddings):
+        expected[chunk.chunk_id] = (chunk, vector)
+    del expected["c0"], expected["c7"]
+
+    reopened = MmapVectorStore(persist_directory=str(tmp_path), quantization="none", coarse_dimensions=0)
+    everything = reopened.get_all(include_embeddings=True)
+    assert sorted(everything['ids']) == sorted(expected)
+    assert set(reopened.get_content_keys()) == set(expected)
+
+    for chunk_id, document, metadata, vector in zip(
+        everything['ids'], everything['documents'], everything['metadatas'], everything['embeddings']
+    ):
+        chunk, source = expected[chunk_id]
+        assert document == chunk.content
+        assert metadata['primary_code'] == chunk.metadata['primary_code']
+        assert metadata['page_number'] == chunk.page_number
+        assert np.allclose(vector, source / np.linalg.norm(source), atol=1e-6)
+
+    # The replaced chunk is found under its new code only
+    assert reopened.get_by_code("B03.0")['id'] == "c3"
+    assert reopened.get_by_code("A03.0") is None
@@ -0,0 +1,73 @@
+"""Test token-budgeted packing of retrieved chunks into LLM prompts."""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.config import settings
+from src.infrastructure.prompt_builder import PromptBuilder, static_prompt
+
+
+def render(i, candidate, text):
+    return f"--- Code {i+1} ---\n{text}"
+
+
+def candidate(chunk_id, document, token_count=None):
+    metadata = {'primary_code': chunk_id}
+    if token_count is not None:
+        metadata['token_count'] = token_count
+    return {'id': chunk_id, 'document': document, 'metadata': metadata}
+
+
+def test_stored_token_counts_drive_packing():
+    builder = PromptBuilder()
+    overhead = builder.count(render(0, None, ""))
+    candidates = [
+        candidate("a", "sepsis", token_count=50),
+        candidate("b", "toux", token_count=60),
+        candidate("c", "fièvre", token_count=20)
+    ]
+
+    packed, blocks = builder.pack(candidates, budget=50 + 20 + 2 * overhead + 5, render=render)
+
+    # "b" does not fit what is left after "a"; the smaller "c" still does
+    assert [c['id'] for c in packed] == ["a", "c"]
+    assert blocks == ["--- Code 1 ---\nsepsis", "--- Code 2 ---\nfièvre"]
+
+
+def test_first_candidate_is_cut_to_the_budget():
+    builder = PromptBuilder()
+    document = "Sepsis à staphylocoques dorés, à l'exclusion du sepsis néonatal. " * 50
+    candidates = [candidate("a", document), candidate("b", "toux")]
+
+    packed, blocks = builder.pack(candidates, budget=40, render=render, max_items=1)
+
+    assert [c['id'] for c in packed] == ["a"]
+    assert builder.count(blocks[0]) <= 40 + 1
+    # A cut inside a multi-byte character decodes to a replacement character
+    assert document.startswith(blocks[0].split("\n", 1)[1].rstrip("\ufffd"))
+
+
+def test_tiny_budget_still_sends_an_excerpt_of_the_first_candidate():
+    builder = PromptBuilder()
+    document = "Sepsis à staphylocoques dorés, à l'exclusion du sepsis néonatal. " * 50
+    candidates = [candidate("a", document), candidate("b", "toux")]
+
+    # The block overhead alone is over budget
+    packed, blocks = builder.pack(candidates, budget=1, render=render)
+
+    assert [c['id'] for c in packed] == ["a"]
+    excerpt = blocks[0].split("\n", 1)[1]
+    assert builder.count(excerpt) >= settings.prompt_min_excerpt_tokens - 1
+    assert document.startswith(excerpt.rstrip("\ufffd"))
+
+
+def test_static_prompt_is_identical_whatever_the_indentation():
+    nested = """
+            Tu es un expert en codage médical.
+
+            Retourne un JSON.
+        """
+    flat = "\nTu es un expert en codage médical.\n\nRetourne un JSON.\n"
+    assert static_prompt(nested) == static_prompt(flat) == "Tu es un expert en codage médical.\n\nRetourne un JSON."
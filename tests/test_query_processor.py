@@ -0,0 +1,26 @@
+"""Test code extraction and exact-code query detection."""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.application.query_processor import QueryProcessor
+
+
+def test_code_queries_are_bare_codes_and_lookup_words():
+    processor = QueryProcessor()
+
+    def is_code_query(query):
+        return processor.is_code_query(query, processor.extract_codes(query))
+
+    assert processor.extract_codes("a410 ou A41.0, J45") == ["A41.0", "J45"]
+
+    assert is_code_query("A41.0")
+    assert is_code_query("A410 J45")
+    assert is_code_query("code CIM-10 J45 ?")
+
+    # A clinical description next to the code needs hybrid retrieval
+    assert not is_code_query("sepsis A41")
+    assert not is_code_query("A41 à staphylocoque doré")
+    assert not is_code_query("toux fébrile")
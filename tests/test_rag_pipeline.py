@@ -0,0 +1,200 @@
+"""Test that degraded LLM answers are reported and kept out of the caches."""
+
+import asyncio
+import json
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.application.query_processor import QueryProcessor
+from src.application.rag_pipeline import RAGPipeline
+from src.config import settings
+from src.infrastructure.llm_client import LLMClient
+from src.infrastructure.result_cache import ResultCache
+from src.infrastructure.semantic_cache import SemanticResultCache
+from src.infrastructure.single_flight import SingleFlight, AsyncSingleFlight
+
+
+CANDIDATES = [
+    {'id': f"code_{code}_1_1", 'document': f"Code: {code}\nLibellé: {label}",
+     'metadata': {'primary_code': code, 'label': label}, 'hybrid_score': score}
+    for code, label, score in [("R05", "Toux", 0.9), ("R50.9", "Fièvre", 0.8), ("J20.9", "Bronchite", 0.7)]
+]
+
+RANKINGS = json.dumps({"rankings": [{"code": "R50.9", "relevance_score": 0.9}, {"code": "R05", "relevance_score": 0.8}]})
+SUGGESTIONS = json.dumps({"suggestions": [{"code": "R05", "label": "Toux", "explanation": "Toux fébrile."}]})
+
+
+def completion(content):
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))], usage=None)
+
+
+class FakeLLM:
+    """Chat completions answering from `replies`: prompt kind -> content, or an exception to raise."""
+
+    def __init__(self, replies, stream_error=None):
+        self.replies = replies
+        self.stream_error = stream_error
+
+    def _reply(self, messages):
+        kind = "rerank" if "rankings" in messages[0]['content'] else "explain"
+        reply = self.replies[kind]
+        if isinstance(reply, Exception):
+            raise reply
+        return reply
+
+    def create(self, messages, stream=False, **kwargs):
+        return completion(self._reply(messages))
+
+    async def create_async(self, messages, stream=False, **kwargs):
+        content = self._reply(messages)
+        if not stream:
+            return completion(content)
+
+        async def chunks():
+            # Half-way through, the connection drops if `stream_error` is set
+            for i, piece in enumerate([content[:len(content) // 2], content[len(content) // 2:]]):
+                if i == 1 and self.stream_error is not None:
+                    raise self.stream_error
+                yield SimpleNamespace(usage=None, choices=[SimpleNamespace(delta=SimpleNamespace(content=piece))])
+        return chunks()
+
+
+def make_pipeline(monkeypatch, replies, stream_error=None):
+    fake = FakeLLM(replies, stream_error)
+    llm_client = LLMClient()
+    llm_client.client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=fake.create)))
+    async_client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=fake.create_async)))
+    monkeypatch.setattr(LLMClient, 'async_client', property(lambda self: async_client))
+
+    async def run_blocking(fn, *args, **kwargs):
+        return fn(*args, **kwargs)
+
+    async def retrieve_hybrid_async(*args, **kwargs):
+        return [dict(c) for c in CANDIDATES]
+
+    async def generate_embedding_async(text):
+        return [1.0, 0.0]
+
+    pipeline = RAGPipeline.__new__(RAGPipeline)
+    pipeline.vector_store = SimpleNamespace(get_index_version=lambda: "v1")
+    pipeline.embedding_generator = SimpleNamespace(
+        dimensions=2,
+        generate_embedding=lambda text: [1.0, 0.0],
+        generate_embedding_async=generate_embedding_async
+    )
+    pipeline.llm_client = llm_client
+    pipeline.retriever = SimpleNamespace(
+        index_signature={},
+        retrieve_hybrid=lambda *args, **kwargs: [dict(c) for c in CANDIDATES],
+        retrieve_hybrid_async=retrieve_hybrid_async,
+        run_blocking=run_blocking
+    )
+    pipeline.query_processor = QueryProcessor()
+    pipeline.result_cache = ResultCache(shared_backend="none")
+    pipeline.semantic_cache = SemanticResultCache(2, max_entries=8, threshold=0.9, ttl=60)
+    pipeline.in_flight = SingleFlight()
+    pipeline.in_flight_async = AsyncSingleFlight()
+    return pipeline
+
+
+def stream(pipeline, query, **kwargs):
+    async def collect():
+        return [event async for event in pipeline.suggest_codes_stream(query, **kwargs)]
+    return asyncio.run(collect())
+
+
+def cached_entries(pipeline):
+    return len(pipeline.result_cache.memory), pipeline.semantic_cache.stats()['entries']
+
+
+def test_successful_answers_are_cached(monkeypatch):
+    pipeline = make_pipeline(monkeypatch, {"rerank": RANKINGS, "explain": SUGGESTIONS})
+
+    result = pipeline.suggest_codes("toux fébrile")
+
+    assert result.retrieval_metadata['llm_status'] == "ok"
+    assert [s.code for s in result.suggestions] == ["R05"]
+    assert cached_entries(pipeline) == (1, 1)
+    assert pipeline.suggest_codes("toux fébrile").retrieval_metadata['cache'] == "memory"
+
+
+def test_failed_rerank_is_reported_and_not_cached(monkeypatch):
+    pipeline = make_pipeline(monkeypatch, {"rerank": RuntimeError("LLM down"), "explain": SUGGESTIONS})
+
+    result = pipeline.suggest_codes("toux fébrile")
+    assert result.retrieval_metadata['llm_status'] == "error"
+
+    result = asyncio.run(pipeline.suggest_codes_async("toux fébrile"))
+    assert result.retrieval_metadata['llm_status'] == "error"
+    assert cached_entries(pipeline) == (0, 0)
+
+
+def test_single_pass_fallback_is_not_cached(monkeypatch):
+    # The answer only names codes that were not retrieved
+    unknown = json.dumps({"suggestions": [{"code": "Z99.9", "explanation": "?"}]})
+    pipeline = make_pipeline(monkeypatch, {"rerank": RANKINGS, "explain": unknown})
+
+    result = pipeline.suggest_codes("toux fébrile", llm_mode="single_pass")
+    assert result.retrieval_metadata['llm_status'] == "fallback"
+    assert [s.code for s in result.suggestions] == ["R05", "R50.9", "J20.9"]
+
+    done = stream(pipeline, "toux fébrile", llm_mode="single_pass")[-1][1]
+    assert done.retrieval_metadata['llm_status'] == "fallback"
+    assert cached_entries(pipeline) == (0, 0)
+
+
+def test_stream_cut_after_partial_output_is_not_cached(monkeypatch):
+    explained = json.dumps({"suggestions": [
+        {"code": "R05", "label": "Toux", "explanation": "Toux."},
+        {"code": "R50.9", "label": "Fièvre", "explanation": "Fièvre."}
+    ]})
+    pipeline = make_pipeline(
+        monkeypatch, {"rerank": RANKINGS, "explain": explained}, stream_error=ConnectionError("reset")
+    )
+
+    events = stream(pipeline, "toux fébrile")
+
+    # The first suggestion was complete before the cut and is still served
+    assert [p.code for e, p in events if e == "suggestion"] == ["R05"]
+    assert events[-1][1].retrieval_metadata['llm_status'] == "error"
+    assert cached_entries(pipeline) == (0, 0)
+
+
+def test_paraphrases_never_reuse_a_fallback_answer(monkeypatch):
+    unknown = json.dumps({"suggestions": [{"code": "Z99.9", "explanation": "?"}]})
+    pipeline = make_pipeline(monkeypatch, {"rerank": RANKINGS, "explain": unknown})
+
+    # Every query embeds to the same vector: a stored answer would be a semantic hit
+    for query in ["toux fébrile", "toux avec fièvre"]:
+        result = pipeline.suggest_codes(query, llm_mode="single_pass")
+        assert 'cache' not in result.retrieval_metadata
+        result = asyncio.run(pipeline.suggest_codes_async(query, llm_mode="single_pass"))
+        assert 'cache' not in result.retrieval_metadata
+        done = stream(pipeline, query, llm_mode="single_pass")[-1][1]
+        assert 'cache' not in done.retrieval_metadata
+
+    assert pipeline.semantic_cache.stats()['entries'] == 0
+    assert pipeline.semantic_cache.stats()['hits'] == 0
+
+    # Once the LLM answers properly, the paraphrase is served from the semantic cache
+    pipeline.llm_client.client.chat.completions.create = FakeLLM({"rerank": RANKINGS, "explain": SUGGESTIONS}).create
+    pipeline.suggest_codes("toux fébrile", llm_mode="single_pass")
+    assert pipeline.suggest_codes("toux et fièvre", llm_mode="single_pass").retrieval_metadata['cache'] == "semantic"
+
+
+def test_sources_are_the_chunks_sent_to_the_llm(monkeypatch):
+    pipeline = make_pipeline(monkeypatch, {"rerank": RANKINGS, "explain": SUGGESTIONS})
+
+    result = pipeline.suggest_codes("toux fébrile", use_reranking=False)
+    assert result.suggestions[0].source_chunks == [c['id'] for c in CANDIDATES]
+
+    # With no room left, only the best candidate is sent (cut to fit)
+    monkeypatch.setattr(settings, "prompt_context_budget_tokens", 1)
+    pipeline.semantic_cache.clear()
+    result = pipeline.suggest_codes("toux", use_reranking=False)
+    assert 'cache' not in result.retrieval_metadata
+    assert result.suggestions[0].source_chunks == [CANDIDATES[0]['id']]
+    assert result.retrieval_metadata['llm_status'] == "ok"
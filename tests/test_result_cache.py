@@ -0,0 +1,78 @@
+"""Test the two-tier query result cache."""
+
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from scripts.build_vector_store import publish_index_version
+from src.application.query_processor import QueryProcessor
+from src.config import settings
+from src.infrastructure.mmap_vector_store import MmapVectorStore
+from src.infrastructure.result_cache import ResultCache
+
+
+def key(query, index_version="v1", **options):
+    return ResultCache.make_key(QueryProcessor().canonical_query(query), index_version, top_k=5, **options)
+
+
+def shared_cache(monkeypatch, tmp_path, **kwargs):
+    monkeypatch.setattr(settings, "result_cache_path", str(tmp_path / "results.sqlite"))
+    return ResultCache(shared_backend="sqlite", **kwargs)
+
+
+def test_keys_use_the_canonical_query():
+    assert key("Sepsis à  Staphylocoques") == key("sepsis a staphylocoques ")
+    assert key("sepsis") != key("sepsis", index_version="v2")
+    assert key("sepsis") != key("sepsis", explain=True)
+
+
+def test_entries_expire(monkeypatch, tmp_path):
+    cache = shared_cache(monkeypatch, tmp_path, ttl=0.05, shared_ttl=0.05)
+    cache.set("k", {"answer": 1})
+    assert cache.get("k") == ({"answer": 1}, "memory")
+
+    time.sleep(0.1)
+    assert cache.get("k") == (None, None)
+
+
+def test_shared_hits_are_promoted_to_memory(monkeypatch, tmp_path):
+    writer = shared_cache(monkeypatch, tmp_path)
+    writer.set("k", {"answer": 1})
+
+    # Another worker: memory miss, shared hit, then served from memory
+    reader = shared_cache(monkeypatch, tmp_path)
+    assert reader.get("k") == ({"answer": 1}, "shared")
+    assert reader.get("k") == ({"answer": 1}, "memory")
+    stats = reader.stats()
+    assert (stats['shared_hits'], stats['memory_hits'], stats['misses']) == (1, 1, 0)
+
+
+def test_publishing_an_index_version_invalidates_results(monkeypatch, tmp_path):
+    cache = shared_cache(monkeypatch, tmp_path)
+    store = MmapVectorStore(persist_directory=str(tmp_path / "store"), quantization="none", coarse_dimensions=0)
+    store.set_index_version("v1")
+    old_key = key("sepsis", store.get_index_version())
+    cache.set(old_key, {"answer": 1})
+
+    monkeypatch.setattr(settings, "result_cache_enabled", True)
+    publish_index_version(store)
+
+    # New keys for the new version, and the shared tier was purged
+    assert key("sepsis", store.get_index_version()) != old_key
+    assert shared_cache(monkeypatch, tmp_path).get(old_key) == (None, None)
+
+
+def test_chroma_index_version_follows_another_writer(monkeypatch, tmp_path):
+    from src.infrastructure.vector_store import VectorStore
+
+    monkeypatch.setattr(VectorStore, "INDEX_VERSION_TTL", 0.0)
+    reader = VectorStore(persist_directory=str(tmp_path / "chroma"))
+    reader.set_index_version("v1")
+    assert reader.get_index_version() == "v1"
+
+    # A rebuild in another process publishes a new version on the same collection
+    writer = VectorStore(persist_directory=str(tmp_path / "chroma"))
+    writer.set_index_version("v2")
+    assert reader.get_index_version() == "v2"
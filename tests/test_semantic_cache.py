@@ -0,0 +1,54 @@
+"""Test the near-duplicate query cache."""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.infrastructure.semantic_cache import SemanticResultCache
+
+
+def test_threshold_is_inclusive():
+    cache = SemanticResultCache(2, max_entries=4, threshold=0.99, ttl=60)
+    cache.set([1.0, 0.0], "options", {"answer": 1})
+
+    value, similarity = cache.get([0.8, 0.6], "options")
+    assert value is None and abs(similarity - 0.8) < 1e-6
+
+    cache.threshold = similarity
+    assert cache.get([0.8, 0.6], "options") == ({"answer": 1}, similarity)
+
+    cache.threshold = float(np.nextafter(similarity, 1.0))
+    assert cache.get([0.8, 0.6], "options")[0] is None
+
+    # Entries only answer queries with the same options
+    assert cache.get([1.0, 0.0], "other options") == (None, None)
+
+
+def test_oldest_entry_is_overwritten_when_full():
+    cache = SemanticResultCache(3, max_entries=2, threshold=0.99, ttl=60)
+    for i, vector in enumerate([[1.0, 0.0, 0.0], [0.0, 1.0, 0.0], [0.0, 0.0, 1.0]]):
+        cache.set(vector, "options", {"answer": i})
+
+    assert cache.stats()['entries'] == 2
+    assert cache.get([1.0, 0.0, 0.0], "options")[0] is None
+    assert cache.get([0.0, 1.0, 0.0], "options")[0] == {"answer": 1}
+    assert cache.get([0.0, 0.0, 1.0], "options")[0] == {"answer": 2}
+
+
+def test_similarity_histogram():
+    cache = SemanticResultCache(2, max_entries=4, threshold=0.97, ttl=60)
+    cache.get([1.0, 0.0], "options")  # empty cache: counted as similarity 0
+    cache.set([1.0, 0.0], "options", {"answer": 1})
+    cache.get([1.0, 0.0], "options")  # 1.0
+    cache.get([0.91, np.sqrt(1 - 0.91 ** 2)], "options")  # 0.91
+    cache.get([0.0, 1.0], "options")  # 0.0
+
+    stats = cache.stats()
+    assert stats['similarity_histogram'] == {
+        "<0.80": 2, "0.80-0.85": 0, "0.85-0.90": 0, "0.90-0.93": 1,
+        "0.93-0.95": 0, "0.95-0.97": 0, "0.97-0.99": 0, ">=0.99": 1
+    }
+    assert (stats['hits'], stats['misses']) == (1, 3)
@@ -0,0 +1,117 @@
+"""Test coalescing of concurrent identical calls."""
+
+import asyncio
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.infrastructure.single_flight import SingleFlight, AsyncSingleFlight
+
+
+N_CALLERS = 8
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.001)
+
+
+def run_threads(flight, fn):
+    with ThreadPoolExecutor(max_workers=N_CALLERS) as pool:
+        futures = [pool.submit(flight.do, "key", fn) for _ in range(N_CALLERS)]
+        return [f.exception() or f.result() for f in futures]
+
+
+def test_concurrent_callers_share_one_run():
+    flight = SingleFlight()
+    runs = []
+
+    def compute():
+        runs.append(1)
+        # Hold the run until every other caller is waiting on it
+        wait_until(lambda: flight.coalesced == N_CALLERS - 1)
+        return "answer"
+
+    results = run_threads(flight, compute)
+
+    assert len(runs) == 1
+    assert sorted(results) == [("answer", False)] + [("answer", True)] * (N_CALLERS - 1)
+    assert flight.stats() == {'calls': 1, 'coalesced': N_CALLERS - 1, 'in_flight': 0}
+
+
+def test_leader_exception_reaches_every_caller():
+    flight = SingleFlight()
+
+    def compute():
+        wait_until(lambda: flight.coalesced == N_CALLERS - 1)
+        raise RuntimeError("LLM down")
+
+    errors = run_threads(flight, compute)
+
+    assert all(isinstance(e, RuntimeError) and str(e) == "LLM down" for e in errors)
+    assert flight.in_flight() == 0
+    # The failure is not remembered
+    assert flight.do("key", lambda: "answer") == ("answer", False)
+
+
+def test_async_callers_share_one_run_and_its_exception():
+    flight = AsyncSingleFlight()
+    runs = []
+
+    async def compute():
+        runs.append(1)
+        await asyncio.sleep(0.01)
+        if len(runs) > 1:
+            raise RuntimeError("LLM down")
+        return "answer"
+
+    async def main():
+        first = await asyncio.gather(*[flight.do("key", compute) for _ in range(N_CALLERS)])
+        second = await asyncio.gather(*[flight.do("key", compute) for _ in range(N_CALLERS)], return_exceptions=True)
+        return first, second
+
+    first, second = asyncio.run(main())
+
+    assert len(runs) == 2
+    assert first == [("answer", False)] + [("answer", True)] * (N_CALLERS - 1)
+    assert all(isinstance(e, RuntimeError) and str(e) == "LLM down" for e in second)
+    assert flight.stats() == {'calls': 2, 'coalesced': 2 * (N_CALLERS - 1), 'in_flight': 0}
+
+
+def test_cancelled_awaiter_does_not_cancel_the_shared_run():
+    flight = AsyncSingleFlight()
+    release = None
+
+    async def compute():
+        await release.wait()
+        return "answer"
+
+    async def main():
+        nonlocal release
+        release = asyncio.Event()
+        leader = asyncio.ensure_future(flight.do("key", compute))
+        duplicate = asyncio.ensure_future(flight.do("key", compute))
+        await asyncio.sleep(0)
+
+        # Both the leader and a duplicate give up; the run goes on for the others
+        leader.cancel()
+        duplicate.cancel()
+        remaining = asyncio.ensure_future(flight.do("key", compute))
+        await asyncio.sleep(0)
+        release.set()
+
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        with pytest.raises(asyncio.CancelledError):
+            await duplicate
+        return await remaining
+
+    assert asyncio.run(main()) == ("answer", True)
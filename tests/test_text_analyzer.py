@@ -0,0 +1,49 @@
+"""Test the French text analyzer and the BM25F lexical index."""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.infrastructure.text_analyzer import FrenchAnalyzer
+from src.infrastructure.lexical_index import LexicalIndex
+
+
+def test_accents_inflections_and_elision():
+    analyzer = FrenchAnalyzer()
+
+    assert analyzer.analyze("dyspnee a effort") == analyzer.analyze("Dyspnées à l'effort")
+    assert analyzer.analyze("insuffisance rénale aiguë") == analyzer.analyze("Insuffisances rénales aiguës")
+    assert analyzer.analyze("hôpitaux") == analyzer.analyze("hôpital")
+    assert analyzer.analyze("d'origine") == analyzer.analyze("origine")
+
+
+def test_codes_stay_whole():
+    analyzer = FrenchAnalyzer()
+
+    terms = analyzer.analyze("Sepsis à streptocoque (A41.0)")
+    assert "a41.0" in terms
+    assert "a41" in terms
+
+
+def test_query_cache():
+    analyzer = FrenchAnalyzer()
+
+    analyzer.analyze_query("douleur thoracique")
+    analyzer.analyze_query("douleur thoracique")
+    assert analyzer.cache_info().hits == 1
+
+
+def test_label_outranks_exclusion():
+    documents = [
+        "Code: J46\nLibellé: Etat de mal asthmatique\n\nComprend:\n  • asthme aigu grave",
+        "Code: J20.9\nLibellé: Bronchite aiguë\n\nÀ l'exclusion de:\n  • asthme\n  • asthme aigu grave",
+    ]
+    # Unrelated chunks so idf behaves as on the real corpus
+    documents += [f"Code: K{i:02d}\nLibellé: Maladie digestive {i}" for i in range(40)]
+    ids = [f"chunk_{i}" for i in range(len(documents))]
+
+    index = LexicalIndex.build(ids, documents)
+    hits = index.search("asthme aigu grave", top_k=2)
+
+    assert [ids[row] for row, _ in hits] == ["chunk_0", "chunk_1"]